@@ -1,12 +1,28 @@
 """Homework checker module."""
 
 name = "ipb_homework_checker"
+__version__ = "0.0.6"
 
-__all__ = ("check_homework",
+__all__ = ("async_executor",
+           "benchmark",
+           "build_cache",
+           "check_homework",
            "checker",
+           "configure_cache",
+           "daemon",
+           "distributed",
+           "jobserver",
            "md_writer",
+           "plan",
+           "prebuilt",
+           "protocol",
+           "result_store",
+           "result_writers",
+           "scheduler",
            "schema_manager",
            "schema_tags",
-           "tasks"
-           "tools"
+           "style_checker",
+           "tasks",
+           "tools",
+           "workspace",
            "tests")
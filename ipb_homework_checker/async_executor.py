@@ -0,0 +1,73 @@
+"""Run coroutines on an event loop through an executor-like interface."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class LoopFuture:
+    """A future of a coroutine that drives the event loop while waited for."""
+
+    def __init__(self, loop, task):
+        """Wrap an asyncio task scheduled on a loop."""
+        self._loop = loop
+        self._task = task
+
+    def result(self):
+        """Run the loop until the task is done and return its result.
+
+        All other scheduled coroutines make progress in the meantime.
+        """
+        return self._loop.run_until_complete(self._task)
+
+
+class AsyncioExecutor:
+    """Schedule coroutines on a private event loop.
+
+    The loop runs in the thread that waits for the results, so any number of
+    commands can be in flight at the same time while blocking steps, like
+    building the code, run in a pool of jobs threads.
+    """
+
+    def __init__(self, jobs, tests_in_flight):
+        """Create the event loop.
+
+        Args:
+            jobs (int): number of threads for blocking steps
+            tests_in_flight (int): number of tests that run at the same time
+        """
+        self._loop = asyncio.new_event_loop()
+        self._threads = ThreadPoolExecutor(max_workers=jobs)
+        self._loop.set_default_executor(self._threads)
+        self._limit = self._loop.run_until_complete(
+            AsyncioExecutor.__create_limit(tests_in_flight))
+
+    @property
+    def limit(self):
+        """Get the semaphore that limits the number of tests in flight."""
+        return self._limit
+
+    def submit(self, coroutine_function, *args):
+        """Schedule a coroutine and return a future of its result."""
+        task = self._loop.create_task(coroutine_function(*args))
+        return LoopFuture(self._loop, task)
+
+    def shutdown(self):
+        """Wait for all scheduled coroutines and close the loop."""
+        pending = asyncio.all_tasks(self._loop)
+        if pending:
+            self._loop.run_until_complete(asyncio.wait(pending))
+        self._loop.close()
+        self._threads.shutdown()
+
+    def __enter__(self):
+        """Use the executor as a context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Shut the executor down."""
+        self.shutdown()
+
+    @staticmethod
+    async def __create_limit(tests_in_flight):
+        # Create the semaphore within the loop it is used in.
+        return asyncio.Semaphore(tests_in_flight)
@@ -0,0 +1,330 @@
+#!/usr/bin/python3
+"""Benchmark the throughput of the checker on synthetic jobs.
+
+A synthetic job has N homeworks with M Tasks of K tests each. The Tasks cycle
+through a mix of kinds: bash scripts, simple C++ builds, CMake builds and
+CMake builds with google tests. Every student gets a copy of the same code, so
+all tests are expected to pass.
+
+The benchmark measures the end-to-end throughput, the latency of every phase
+of checking and the peak memory. The metrics can be stored as a baseline and
+later runs are compared to it to catch performance regressions.
+"""
+import argparse
+import json
+import logging
+import resource
+import sys
+import tempfile
+import time
+from os import path
+from shutil import rmtree
+
+from . import tools
+from .checker import Checker
+
+logging.basicConfig()
+log = logging.getLogger("GHC")
+log.setLevel(logging.INFO)
+
+BASH_KIND = 'bash'
+SIMPLE_KIND = 'simple'
+CMAKE_KIND = 'cmake'
+GTEST_KIND = 'gtest'
+KINDS = [BASH_KIND, SIMPLE_KIND, CMAKE_KIND, GTEST_KIND]
+
+# A regression is a metric that got worse than this fraction of the baseline.
+DEFAULT_TOLERANCE = 0.1
+# Metrics that differ by less than this from the baseline are noise, which
+# matters for phases that take next to no time.
+NOISE_LEVEL = 0.01
+
+SUM_CPP = """// Copyright 2019 Benchmark
+#include <cstdio>
+#include <cstdlib>
+
+int main(int argc, char const *argv[]) {
+  fprintf(stdout, "%d\\n", atoi(argv[1]) + atoi(argv[2]));
+  return 0;
+}
+"""
+SUM_SH = """echo $(( $1 + $2 ))
+"""
+CMAKE_LISTS = """cmake_minimum_required(VERSION 3.1)
+project(benchmark_{name})
+
+add_executable(main main.cpp)
+"""
+GTEST_CMAKE_LISTS = """project(benchmark_{name})
+cmake_minimum_required(VERSION 3.1)
+
+enable_testing()
+add_subdirectory(tests)
+"""
+GTEST_TESTS_CMAKE_LISTS = """add_subdirectory({gtest_folder}
+                 ${{PROJECT_BINARY_DIR}}/gtest)
+include(CTest)
+
+add_executable(sum_tests test_sum.cpp)
+target_link_libraries(sum_tests gtest gtest_main)
+
+add_test(sum_tests ${{PROJECT_BINARY_DIR}}/tests/sum_tests)
+"""
+GTEST_TEST_CPP = """// Copyright 2019 Benchmark
+#include <gtest/gtest.h>
+
+int Sum(int a, int b) {{ return a + b; }}
+
+{tests}"""
+GTEST_CASE = """TEST(TestSum, Sum{number}) {{
+  EXPECT_EQ({number} + 1, Sum({number}, 1));
+}}
+"""
+
+JOB_HEADER = """---
+folder: {folder}
+{prebuilt}homeworks:
+"""
+PREBUILT_TEMPLATE = """prebuilt:
+  gtest_folder: {gtest_folder}
+"""
+HOMEWORK_TEMPLATE = """  - name: "Homework {number}"
+    folder: "homework_{number}"
+    tasks:
+"""
+TASK_TEMPLATE = """      - name: "Task {number}"
+        language: {language}
+        folder: task_{number}
+        output_type: {output_type}
+        build_type: {build_type}
+        binary_name: main
+        tests:
+"""
+TEST_TEMPLATE = """          - name: "Test {number}"
+            input_args: "{number} 1"
+            expected_output: {expected}
+"""
+GTEST_TEST_TEMPLATE = """          - name: "Test {number}"
+            run_google_tests: true
+"""
+
+
+def generate(root_folder, homeworks, tasks, tests, students, kinds=None,
+             gtest_folder='/usr/src/gtest', prebuilt=False):
+    """Generate a synthetic job file along with the code of all students.
+
+    Args:
+        root_folder (str): folder to generate everything in
+        homeworks (int): number of homeworks
+        tasks (int): number of Tasks in every homework
+        tests (int): number of tests of every Task
+        students (int): number of students
+        kinds (list): kinds of Tasks to cycle through, all KINDS by default
+        gtest_folder (str): folder with the GoogleTest sources
+        prebuilt (bool): build GoogleTest once for all students
+
+    Returns:
+        (str, list): path to the job file along with the student folders
+    """
+    kinds = kinds or KINDS
+    student_folders = [path.join(root_folder, 'students',
+                                 'student_{}'.format(number))
+                       for number in range(students)]
+    job = JOB_HEADER.format(
+        folder=student_folders[0],
+        prebuilt=PREBUILT_TEMPLATE.format(gtest_folder=gtest_folder)
+        if prebuilt else '')
+    task_count = 0
+    for hw_number in range(homeworks):
+        job += HOMEWORK_TEMPLATE.format(number=hw_number)
+        for task_number in range(tasks):
+            kind = kinds[task_count % len(kinds)]
+            task_count += 1
+            job += _task_node(kind, task_number, tests)
+            for student_folder in student_folders:
+                _write_task_code(
+                    path.join(student_folder,
+                              'homework_{}'.format(hw_number),
+                              'task_{}'.format(task_number)),
+                    kind, task_number, tests, gtest_folder)
+    job_file = path.join(root_folder, 'job.yml')
+    with open(job_file, 'w') as stream:
+        stream.write(job)
+    return job_file, student_folders
+
+
+def _task_node(kind, number, tests):
+    """Create the job node of a Task of some kind."""
+    node = TASK_TEMPLATE.format(
+        number=number,
+        language='bash' if kind == BASH_KIND else 'cpp',
+        output_type='number',
+        build_type='simple' if kind == SIMPLE_KIND else 'cmake')
+    for test_number in range(tests):
+        if kind == GTEST_KIND:
+            node += GTEST_TEST_TEMPLATE.format(number=test_number)
+        else:
+            node += TEST_TEMPLATE.format(number=test_number,
+                                         expected=test_number + 1)
+    return node
+
+
+def _write_task_code(task_folder, kind, number, tests, gtest_folder):
+    """Write the code of a Task of some kind."""
+    files = {}
+    if kind == BASH_KIND:
+        files['main.sh'] = SUM_SH
+    elif kind == SIMPLE_KIND:
+        files['main.cpp'] = SUM_CPP
+    elif kind == CMAKE_KIND:
+        files['main.cpp'] = SUM_CPP
+        files['CMakeLists.txt'] = CMAKE_LISTS.format(name=number)
+    else:
+        files['CMakeLists.txt'] = GTEST_CMAKE_LISTS.format(name=number)
+        files[path.join('tests', 'CMakeLists.txt')] = \
+            GTEST_TESTS_CMAKE_LISTS.format(gtest_folder=gtest_folder)
+        files[path.join('tests', 'test_sum.cpp')] = GTEST_TEST_CPP.format(
+            tests=''.join(GTEST_CASE.format(number=test_number)
+                          for test_number in range(tests)))
+    for file_name, contents in files.items():
+        file_path = path.join(task_folder, file_name)
+        tools.create_folder_if_needed(path.dirname(file_path))
+        with open(file_path, 'w') as stream:
+            stream.write(contents)
+
+
+def run(job_file, student_folders, **checker_args):
+    """Check all students and measure the checker.
+
+    Args:
+        job_file (str): path to the job file
+        student_folders (list): folders with the code of every student
+        checker_args: arguments of the Checker
+
+    Returns:
+        dict: metrics of the run
+    """
+    started = time.monotonic()
+    checker = Checker(job_file, **checker_args)
+    test_count = 0
+    failed_count = 0
+    task_count = 0
+    phase_times = {phase: [] for phase in tools.PhaseTimer.ALL}
+    for _, results, timings in checker.check_students(student_folders):
+        for hw_dict in results.values():
+            for task_name, task_dict in hw_dict.items():
+                if task_name == tools.EXPIRED_TAG:
+                    continue
+                task_count += 1
+                for test_result in task_dict.values():
+                    test_count += 1
+                    failed_count += not test_result.succeeded()
+        for hw_timings in timings.values():
+            for task_timings in hw_timings.values():
+                for phase, seconds in task_timings['phases'].items():
+                    phase_times[phase].append(seconds)
+    wall_time = time.monotonic() - started
+    metrics = {
+        'wall_time': wall_time,
+        'tests_per_second': test_count / wall_time,
+        'tasks_per_second': task_count / wall_time,
+        'failed_tests': failed_count,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'children_peak_rss_kb': resource.getrusage(
+            resource.RUSAGE_CHILDREN).ru_maxrss,
+    }
+    for phase, times in phase_times.items():
+        if not times:
+            continue
+        times.sort()
+        metrics[phase + '_mean'] = sum(times) / len(times)
+        metrics[phase + '_p95'] = times[int(0.95 * (len(times) - 1))]
+    return metrics
+
+
+def compare(metrics, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Compare the metrics to a baseline.
+
+    Throughput is better when higher, all other metrics when lower.
+
+    Args:
+        metrics (dict): metrics of this run
+        baseline (dict): metrics of the baseline run
+        tolerance (float): fraction of the baseline a metric may get worse by
+
+    Returns:
+        list: descriptions of all regressions
+    """
+    regressions = []
+    for name, baseline_value in sorted(baseline.items()):
+        if name not in metrics:
+            continue
+        value = metrics[name]
+        if abs(value - baseline_value) < NOISE_LEVEL:
+            continue
+        if name.endswith('_per_second'):
+            regressed = value < baseline_value * (1 - tolerance)
+        else:
+            regressed = value > baseline_value * (1 + tolerance)
+        if regressed:
+            regressions.append("{}: {:.3f} vs {:.3f} in the baseline".format(
+                name, value, baseline_value))
+    return regressions
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--homeworks', type=int, default=2)
+    parser.add_argument('--tasks', type=int, default=4,
+                        help='Number of Tasks in every homework.')
+    parser.add_argument('--tests', type=int, default=3,
+                        help='Number of tests of every Task.')
+    parser.add_argument('--students', type=int, default=2)
+    parser.add_argument('--kinds', nargs='+', choices=KINDS, default=KINDS,
+                        help='Kinds of Tasks to cycle through.')
+    parser.add_argument('--gtest-folder', default='/usr/src/gtest')
+    parser.add_argument('--prebuilt', action='store_true',
+                        help='Build GoogleTest once for all students.')
+    parser.add_argument('-j', '--jobs', type=int, default=1)
+    parser.add_argument('-e', '--engine', choices=Checker.ENGINES,
+                        default=Checker.THREADS_ENGINE)
+    parser.add_argument('-b', '--baseline',
+                        help='A json file with the metrics to compare to.')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Store the metrics of this run as the baseline.')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Fraction of the baseline a metric may get '
+                        'worse by.')
+    args = parser.parse_args()
+    root_folder = tempfile.mkdtemp(prefix='benchmark_',
+                                   dir=tools.get_temp_dir())
+    try:
+        job_file, student_folders = generate(
+            root_folder, args.homeworks, args.tasks, args.tests,
+            args.students, args.kinds, args.gtest_folder, args.prebuilt)
+        metrics = run(job_file, student_folders, jobs=args.jobs,
+                      engine=args.engine)
+    finally:
+        rmtree(root_folder, ignore_errors=True)
+    for name, value in sorted(metrics.items()):
+        log.info("%s: %.3f", name, value)
+    if not args.baseline:
+        return
+    if args.save_baseline:
+        with open(args.baseline, 'w') as stream:
+            json.dump(metrics, stream, indent=2, sort_keys=True)
+        log.info("Stored the baseline in '%s'.", args.baseline)
+        return
+    with open(args.baseline, 'r') as stream:
+        baseline = json.load(stream)
+    regressions = compare(metrics, baseline, args.tolerance)
+    for regression in regressions:
+        log.error("Regression of %s", regression)
+    if regressions:
+        sys.exit(1)
+    log.info("No regressions compared to '%s'.", args.baseline)
+
+
+if __name__ == "__main__":
+    main()
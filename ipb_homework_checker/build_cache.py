@@ -0,0 +1,147 @@
+"""Cache the results of building C++ Tasks on disk."""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from functools import lru_cache
+from os import path, rename
+from shutil import copy2, copytree, rmtree
+
+from . import __version__
+from . import tools
+from .schema_tags import BuildTags
+from .workspace import IGNORED_FOLDERS
+
+log = logging.getLogger("GHC")
+
+VERSION_CMDS = {
+    BuildTags.CMAKE: "cmake --version && ${CXX:-c++} --version",
+    BuildTags.SIMPLE: "clang++ --version",
+}
+SOURCE_PLACEHOLDER = '@GHC_SOURCE_FOLDER@'
+
+
+@lru_cache(maxsize=None)
+def compiler_version(build_type):
+    """Get the version string of the tools used for a build type."""
+    result = tools.run_command(VERSION_CMDS[build_type])
+    return "{}{}".format(result.stdout, result.stderr)
+
+
+class BuildCache:
+    """A persistent cache of built binaries keyed by all the build inputs.
+
+    Every entry is a folder named by the hash of the inputs that holds the
+    CmdResult of the build along with the built binary or, for CMake builds,
+    the whole build folder. Only successful builds are stored.
+
+    The google tests run from the build folder of a CMake build, so it is
+    restored as a whole. The source folder is replaced by a placeholder in
+    all its text files, as cmake writes absolute paths all over the place.
+    """
+    RESULT_FILE = 'result.json'
+    BINARY_FILE = 'binary'
+    BUILD_FOLDER = 'build'
+
+    def __init__(self, cache_folder):
+        """Initialize the cache in a given folder."""
+        self._cache_folder = cache_folder
+        tools.create_folder_if_needed(cache_folder)
+
+    def key(self, source_folder, binary_name, build_type, compiler_flags,
+            cmake_args=''):
+        """Compute a key for a build of the code in the source folder.
+
+        The source folder must already contain all the injected folders.
+        """
+        hasher = hashlib.sha256()
+        ignored_names = IGNORED_FOLDERS + [binary_name]
+        for value in [tools.hash_folder(source_folder, ignored_names),
+                      binary_name,
+                      build_type,
+                      compiler_flags,
+                      cmake_args,
+                      compiler_version(build_type),
+                      __version__]:
+            hasher.update(value.encode('utf-8'))
+            hasher.update(b'\0')
+        return hasher.hexdigest()
+
+    def load(self, key, binary_path, build_folder=None, source_folder=None):
+        """Restore the binary for a key and return the cached build result.
+
+        If the entry holds a build folder, it is restored into the build_folder
+        instead, with the placeholder replaced by the source_folder.
+
+        Returns:
+            CmdResult: the cached result or None if there is no such entry.
+        """
+        entry_folder = path.join(self._cache_folder, key)
+        result_file = path.join(entry_folder, BuildCache.RESULT_FILE)
+        if not path.exists(result_file):
+            return None
+        with open(result_file, 'r') as stream:
+            build_result = tools.CmdResult.from_dict(json.load(stream))
+        cached_build_folder = path.join(entry_folder, BuildCache.BUILD_FOLDER)
+        cached_binary = path.join(entry_folder, BuildCache.BINARY_FILE)
+        if build_folder and path.isdir(cached_build_folder):
+            BuildCache.__copy_build_folder(
+                cached_build_folder, build_folder,
+                SOURCE_PLACEHOLDER, source_folder)
+        elif path.exists(cached_binary):
+            tools.create_folder_if_needed(path.dirname(binary_path))
+            copy2(cached_binary, binary_path)
+        log.debug("Restored build '%s' from cache.", key)
+        return build_result
+
+    def store(self, key, build_result, binary_path, build_folder=None,
+              source_folder=None):
+        """Store the build result along with the binary if it exists.
+
+        If a build_folder is given, it is stored as a whole instead of the
+        binary, with the source_folder replaced by the placeholder.
+        """
+        if not build_result.succeeded():
+            return
+        entry_folder = path.join(self._cache_folder, key)
+        if path.exists(entry_folder):
+            return
+        # Prepare the entry aside and move it in place at once, so that other
+        # checkers never see a half-written entry.
+        temp_folder = tempfile.mkdtemp(prefix='.tmp_', dir=self._cache_folder)
+        if build_folder:
+            BuildCache.__copy_build_folder(
+                build_folder,
+                path.join(temp_folder, BuildCache.BUILD_FOLDER),
+                source_folder, SOURCE_PLACEHOLDER)
+        elif path.exists(binary_path):
+            copy2(binary_path, path.join(temp_folder, BuildCache.BINARY_FILE))
+        with open(path.join(temp_folder, BuildCache.RESULT_FILE), 'w') as out:
+            json.dump(build_result.to_dict(), out)
+        try:
+            rename(temp_folder, entry_folder)
+        except OSError:
+            # Somebody else has stored the same build in the meantime.
+            rmtree(temp_folder, ignore_errors=True)
+
+    @staticmethod
+    def __copy_build_folder(source, dest, old_folder, new_folder):
+        """Copy a build folder replacing a folder in all its text files."""
+        copytree(source, dest, symlinks=True, dirs_exist_ok=True)
+        old_bytes = old_folder.encode('utf-8')
+        new_bytes = new_folder.encode('utf-8')
+        for root, _, files in os.walk(dest):
+            for file_name in files:
+                file_path = path.join(root, file_name)
+                if path.islink(file_path):
+                    continue
+                with open(file_path, 'rb') as stream:
+                    contents = stream.read()
+                if old_bytes not in contents or b'\0' in contents:
+                    # Binary files keep their paths, changing their length
+                    # would break them.
+                    continue
+                with open(file_path, 'wb') as stream:
+                    stream.write(contents.replace(old_bytes, new_bytes))
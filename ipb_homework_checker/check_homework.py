@@ -1,16 +1,26 @@
 #!/usr/bin/python3
 """Script to check this homework."""
 import argparse
+import glob
+import json
 import logging
+import os
+from os import path
 
+from . import tools
+from . import daemon
+from . import distributed
 from .checker import Checker
-from .md_writer import MdWriter
+from .md_writer import MdWriter, SummaryMdWriter, MAX_ERROR_SIZE
+from .result_writers import WRITERS, SqliteWriter
 
 
 logging.basicConfig()
 log = logging.getLogger("GHC")
 log.setLevel(logging.INFO)
 
+TOKEN_ENV_VAR = 'GHC_TOKEN'
+
 
 def main():
     """Run this script."""
@@ -21,25 +31,286 @@ def main():
         action='store_true')
     parser.add_argument(
         '-i', '--input',
-        help='An input *.yml file with the job definition.',
-        required=True)
+        help='An input *.yml file with the job definition.')
     parser.add_argument(
         '-o', '--output',
-        help='An output *.md file with the results.',
-        required=True)
+        help='An output *.md file with the results. '
+        'A folder for all the reports when checking many students.')
+    parser.add_argument(
+        '-s', '--students',
+        help='Folders or glob patterns of folders with the code of students '
+        'to check instead of the folder given in the job file.',
+        nargs='+')
+    parser.add_argument(
+        '-j', '--jobs',
+        help='Number of Tasks to check at the same time.',
+        type=int,
+        default=1)
+    parser.add_argument(
+        '-e', '--engine',
+        help='Check every Task in a thread of its own, run the tests of '
+        'all Tasks on one asyncio event loop or pipeline the builds and tests '
+        'of all Tasks, building with --jobs and testing with --test-jobs.',
+        choices=Checker.ENGINES,
+        default=Checker.THREADS_ENGINE)
+    parser.add_argument(
+        '--tests-in-flight',
+        help='Number of tests to run at the same time with the asyncio '
+        'engine.',
+        type=int,
+        default=64)
+    parser.add_argument(
+        '--test-jobs',
+        help='Number of tests to run at the same time with the pipeline '
+        'engine. Same as --jobs by default.',
+        type=int)
+    parser.add_argument(
+        '--build-jobs',
+        help='Number of compile jobs that all builds share. Same as the '
+        'number of cores by default.',
+        type=int)
+    parser.add_argument(
+        '--scratch',
+        help='A folder to check all Tasks in, such as /dev/shm, to keep the '
+        'files of builds and tests in memory.')
+    parser.add_argument(
+        '--scratch-mb',
+        help='Number of megabytes the Tasks may take in the scratch folder at '
+        'once. Tasks are checked on disk once it is full.',
+        type=int)
+    parser.add_argument(
+        '-t', '--timing',
+        help='Add the time spent in every phase to the report and write it '
+        'to a *_timing.json file next to the report.',
+        action='store_true')
+    parser.add_argument(
+        '-c', '--cache',
+        help='A folder to keep caches in between runs.')
+    parser.add_argument(
+        '--incremental',
+        help='Reuse the results of the Tasks that did not change since the '
+        'last run. Needs a cache folder.',
+        action='store_true')
+    parser.add_argument(
+        '--max-error-size',
+        help='Number of characters to keep of the output of every failed '
+        'test in the report.',
+        type=int,
+        default=MAX_ERROR_SIZE)
+    parser.add_argument(
+        '--error-logs',
+        help='Write the full output that is cut from the report to a *_logs '
+        'folder next to the report and link it.',
+        action='store_true')
+    parser.add_argument(
+        '-f', '--formats',
+        help='Also write the results in these formats next to every report.',
+        nargs='+',
+        choices=sorted(WRITERS),
+        default=[])
+    parser.add_argument(
+        '--database',
+        help='A SQLite database to add the results of this run to.')
+    parser.add_argument(
+        '--serve',
+        help='Run as a daemon listening on this Unix socket. It keeps every '
+        'job and its caches loaded and checks the students sent to it with '
+        '--connect. Loads the job given with --input right away.')
+    parser.add_argument(
+        '--connect',
+        help='Check with the daemon listening on this Unix socket instead of '
+        'checking here. The options of checking are the ones of the daemon.')
+    parser.add_argument(
+        '--coordinate',
+        help='Hand out the Tasks of all students to the workers started with '
+        '--work that connect to this host:port instead of checking here. '
+        'The options of checking are the ones of the workers. Listens on '
+        'the loopback interface only if no host is given.')
+    parser.add_argument(
+        '--retries',
+        help='Number of times the coordinator hands out a Task again if its '
+        'worker fails.',
+        type=int,
+        default=distributed.DEFAULT_RETRIES)
+    parser.add_argument(
+        '--work',
+        help='Run as a worker of the coordinator at this host:port checking '
+        'as many Tasks at the same time as --jobs. The job file and the '
+        'student folders must have the same paths here as for the '
+        'coordinator.')
+    parser.add_argument(
+        '--token',
+        help='Secret token shared by the coordinator and its workers, the '
+        'value of the {} environment variable by default. Prefer the '
+        'variable, as other users can see the command line.'.format(
+            TOKEN_ENV_VAR),
+        default=os.environ.get(TOKEN_ENV_VAR))
     args = parser.parse_args()
     if args.verbose:
         log.setLevel(logging.DEBUG)
         log.debug('Enable DEBUG logging.')
-    # Read the job file.
-    log.debug('Reading from file "%s"', args.input)
-    checker = Checker(args.input)
+    checker_args = dict(jobs=args.jobs,
+                        cache_folder=args.cache,
+                        engine=args.engine,
+                        tests_in_flight=args.tests_in_flight,
+                        incremental=args.incremental,
+                        test_jobs=args.test_jobs,
+                        build_jobs=args.build_jobs,
+                        scratch_folder=args.scratch,
+                        scratch_mb=args.scratch_mb)
+    if args.serve:
+        daemon.serve(args.serve, [args.input] if args.input else [],
+                     **checker_args)
+        return
+    if (args.work or args.coordinate) and not args.token:
+        parser.error('the argument --token or the {} environment variable is '
+                     'required with --work and --coordinate'.format(
+                         TOKEN_ENV_VAR))
+    if args.work:
+        workers = checker_args.pop('jobs')
+        distributed.work(distributed.parse_address(args.work), args.token,
+                         workers, **checker_args)
+        return
+    if not args.input or not args.output:
+        parser.error('the arguments -i/--input and -o/--output are required')
+    if args.connect:
+        checker = daemon.DaemonClient(args.connect, args.input)
+    elif args.coordinate:
+        checker = distributed.Coordinator(
+            args.input, args.token, distributed.parse_address(args.coordinate),
+            retries=args.retries, cache_folder=args.cache)
+    else:
+        # Read the job file.
+        log.debug('Reading from file "%s"', args.input)
+        checker = Checker(args.input, **checker_args)
+    try:
+        check(checker, args)
+    finally:
+        # The coordinator must disconnect its workers even on failures.
+        if not args.connect:
+            checker.close()
+
+
+def check(checker, args):
+    """Check the students or the folder of the job and write the reports."""
+    if args.students:
+        check_students(checker, args.students, args.output, args.timing,
+                       args.max_error_size, args.error_logs, args.formats,
+                       args.database)
+        return
     results = checker.check_homework()
-    md_writer = MdWriter()
-    md_writer.update(results)
+    write_report(args.output, results, checker.timings, args.timing,
+                 args.max_error_size, args.error_logs, args.formats)
+    if args.database:
+        sqlite_writer = SqliteWriter(args.database)
+        sqlite_writer.update(
+            path.basename(path.normpath(checker.checked_code_folder)),
+            results)
+        sqlite_writer.close()
+
+
+def find_student_folders(patterns):
+    """Expand glob patterns into a sorted list of unique student folders."""
+    student_folders = set()
+    for pattern in patterns:
+        # Paths on the command line are relative to the working directory.
+        pattern = path.abspath(path.expanduser(pattern))
+        matches = [folder for folder in glob.glob(pattern)
+                   if path.isdir(folder)]
+        if not matches:
+            log.warning("No student folders match '%s'. Skipping.", pattern)
+        student_folders.update(path.normpath(folder) for folder in matches)
+    return sorted(student_folders)
+
+
+def student_names(student_folders):
+    """Name every student folder uniquely for the reports.
+
+    A student is named by the folder name unless another student folder has
+    the same name, e.g. for 'students/*/repo'. Then the path relative to the
+    folder common to all students is used instead.
+
+    Returns:
+        dict: unique name of every student folder
+    """
+    base_names = [path.basename(folder) for folder in student_folders]
+    common_folder = None
+    if len(student_folders) > 1:
+        common_folder = path.commonpath(student_folders)
+    names = {}
+    used_names = set()
+    for folder, base_name in zip(student_folders, base_names):
+        name = base_name
+        if base_names.count(base_name) > 1 and common_folder:
+            name = path.relpath(folder, common_folder).replace(os.sep, '_')
+        unique_name = name
+        suffix = 1
+        while unique_name in used_names:
+            suffix += 1
+            unique_name = '{}_{}'.format(name, suffix)
+        used_names.add(unique_name)
+        names[folder] = unique_name
+    return names
+
+
+def write_report(md_file_path, results, timings, with_timing,
+                 max_error_size=MAX_ERROR_SIZE, with_logs=False, formats=()):
+    """Write the markdown report and the timing sidecar file if needed.
+
+    With logs, the full output cut from the report goes to a *_logs folder.
+    The results are also written in every one of the formats next to the
+    report, see result_writers.WRITERS.
+    """
+    logs_folder = None
+    if with_logs:
+        logs_folder = path.splitext(md_file_path)[0] + '_logs'
+    md_writer = MdWriter(max_error_size, logs_folder)
+    md_writer.update(results, timings if with_timing else None)
     # Write the resulting markdown file.
-    log.debug('Writing to file "%s"', args.output)
-    md_writer.write_md_file(args.output)
+    log.debug('Writing to file "%s"', md_file_path)
+    md_writer.write_md_file(md_file_path)
+    for result_format in formats:
+        writer = WRITERS[result_format]()
+        writer.update(results)
+        file_path = path.splitext(md_file_path)[0] + writer.EXTENSION
+        log.debug('Writing %s results to file "%s"', result_format, file_path)
+        writer.write_file(file_path)
+    if not with_timing:
+        return
+    timing_file_path = path.splitext(md_file_path)[0] + '_timing.json'
+    log.debug('Writing timings to file "%s"', timing_file_path)
+    with open(timing_file_path, 'w') as timing_file:
+        json.dump(timings, timing_file, indent=2, sort_keys=True)
+
+
+def check_students(checker, patterns, output_folder, with_timing=False,
+                   max_error_size=MAX_ERROR_SIZE, with_logs=False, formats=(),
+                   database=None):
+    """Check many students and write a report for each one with a summary.
+
+    Every report is written as soon as the student is checked, so only the
+    results of the students that are still being checked are kept in memory.
+    """
+    output_folder = path.abspath(path.expanduser(output_folder))
+    tools.create_folder_if_needed(output_folder)
+    student_folders = find_student_folders(patterns)
+    names = student_names(student_folders)
+    log.info("Checking %s students.", len(student_folders))
+    summary_writer = SummaryMdWriter()
+    sqlite_writer = SqliteWriter(database) if database else None
+    for student_folder, results, timings in checker.check_students(
+            student_folders):
+        student_name = names[student_folder]
+        report_name = student_name + '.md'
+        write_report(path.join(output_folder, report_name),
+                     results, timings, with_timing, max_error_size,
+                     with_logs, formats)
+        summary_writer.update(student_name, results, report_name)
+        if sqlite_writer:
+            sqlite_writer.update(student_name, results)
+    summary_writer.write_md_file(path.join(output_folder, 'summary.md'))
+    if sqlite_writer:
+        sqlite_writer.close()
 
 
 if __name__ == "__main__":
@@ -2,13 +2,27 @@
 
 from os import path
 
+import asyncio
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
+from itertools import islice
 
 from . import tools
+from .async_executor import AsyncioExecutor
+from .build_cache import BuildCache
+from .configure_cache import ConfigureCache
+from .jobserver import JobServer, default_jobserver
+from .plan import compile_job
+from .prebuilt import Prebuilt
+from .result_store import ResultStore
+from .scheduler import PipelineExecutor, TimeBudget
 from .schema_manager import SchemaManager
-from .schema_tags import Tags
+from .style_checker import StyleChecker
 from .tasks import Task
+from .workspace import ScratchSpace
 
 
 log = logging.getLogger("GHC")
@@ -18,39 +32,403 @@ class Checker:
     """Check homework."""
     TESTS_TAG = 'tests'
 
-    def __init__(self, job_file_path):
-        """Initialize the checker from file."""
+    BUILD_CACHE_FOLDER = 'build'
+    RESULT_STORE_FOLDER = 'results'
+    JOB_CACHE_FOLDER = 'jobs'
+    STYLE_CACHE_FOLDER = 'style'
+    PREBUILT_FOLDER = 'prebuilt'
+    CONFIGURE_CACHE_FOLDER = 'configure'
+
+    THREADS_ENGINE = 'threads'
+    ASYNCIO_ENGINE = 'asyncio'
+    PIPELINE_ENGINE = 'pipeline'
+    ENGINES = [THREADS_ENGINE, ASYNCIO_ENGINE, PIPELINE_ENGINE]
+
+    # The number of students per job whose Tasks are submitted ahead of the
+    # student that is reported next.
+    STUDENTS_AHEAD_PER_JOB = 2
+
+    def __init__(self, job_file_path, jobs=1, cache_folder=None,
+                 engine=THREADS_ENGINE, tests_in_flight=64,
+                 incremental=False, test_jobs=None, build_jobs=None,
+                 scratch_folder=None, scratch_mb=None):
+        """Initialize the checker from file.
+
+        Args:
+            job_file_path (str): path to the *.yml job file
+            jobs (int): number of Tasks to check at the same time
+            cache_folder (str): folder to keep caches between runs in
+            engine (str): run every Task in a thread of its own, run the
+                tests of all Tasks as coroutines on one event loop or run the
+                builds and tests of all Tasks under separate budgets
+            tests_in_flight (int): number of tests that run at the same time
+                with the asyncio engine
+            incremental (bool): reuse the results of the Tasks whose inputs
+                did not change since they were checked, needs a cache folder
+            test_jobs (int): number of tests that run at the same time with
+                the pipeline engine, which runs jobs builds at the same time,
+                same as jobs by default
+            build_jobs (int): number of compile jobs that all builds run at
+                the same time, the number of cores by default
+            scratch_folder (str): folder to create the workspaces of all Tasks
+                in, meant to be on a RAM-backed file system like /dev/shm,
+                the temporary folder of this package by default
+            scratch_mb (int): number of megabytes the workspaces may take in
+                the scratch folder at once, all free space by default
+        """
         self._job_file_path = tools.expand_if_needed(job_file_path)
-        schema_manager = SchemaManager(self._job_file_path)
+        if cache_folder:
+            cache_folder = tools.expand_if_needed(cache_folder)
+        schema_manager = SchemaManager(
+            self._job_file_path,
+            cache_folder=path.join(cache_folder, Checker.JOB_CACHE_FOLDER)
+            if cache_folder else None)
         self._base_node = schema_manager.validated_yaml
-        self._checked_code_folder = tools.expand_if_needed(
-            self._base_node[Tags.FOLDER_TAG])
+        self._plan = compile_job(self._base_node, self._job_file_path)
+        self._checked_code_folder = self._plan.checked_code_folder
+        self._jobs = max(1, jobs)
+        self._engine = engine
+        self._tests_in_flight = max(1, tests_in_flight)
+        self._test_jobs = max(1, test_jobs) if test_jobs else self._jobs
+        self._build_cache = None
+        self._result_store = None
+        # All builds share one compile budget.
+        self._own_jobserver = bool(build_jobs)
+        self._jobserver = JobServer(build_jobs) if build_jobs \
+            else default_jobserver()
+        # Shared dependencies are built once when the first build needs them.
+        self._prebuilt = None
+        if self._plan.prebuilt:
+            self._prebuilt = Prebuilt(
+                self._plan.prebuilt,
+                folder=path.join(cache_folder, Checker.PREBUILT_FOLDER)
+                if cache_folder else None,
+                jobserver=self._jobserver)
+        # All Tasks share the style checker, so the number of cpplint
+        # processes is bounded and linted files are reused between Tasks.
+        self._style_checker = StyleChecker(
+            cache_folder=path.join(cache_folder, Checker.STYLE_CACHE_FOLDER)
+            if cache_folder else None)
+        # CMake build folders are seeded from the ones configured before.
+        self._configure_cache = ConfigureCache(
+            folder=path.join(cache_folder, Checker.CONFIGURE_CACHE_FOLDER)
+            if cache_folder else None)
+        self._scratch = None
+        if scratch_folder:
+            self._scratch = ScratchSpace(
+                tools.expand_if_needed(scratch_folder),
+                max_bytes=scratch_mb * 1024 * 1024 if scratch_mb else None)
+        if cache_folder:
+            self._build_cache = BuildCache(path.join(
+                cache_folder, Checker.BUILD_CACHE_FOLDER))
+            if incremental:
+                self._result_store = ResultStore(path.join(
+                    cache_folder, Checker.RESULT_STORE_FOLDER))
+        elif incremental:
+            log.warning("Incremental checking needs a cache folder.")
         # The results of all tests will be kept here.
         self._results = {}
+        # The timings of the last check of the homework.
+        self._timings = {}
+
+    def check_homework(self, checked_code_folder=None):
+        """Run over all Tasks in all homeworks.
+
+        With more than one job, Tasks of all homeworks are checked at the same
+        time. Every Task works in its own workspace, so the results are the
+        same as for a serial run.
+
+        Args:
+            checked_code_folder (str): check the code in this folder instead
+                of the one given in the job file
+        """
+        if not checked_code_folder:
+            checked_code_folder = self._checked_code_folder
+        with self._create_executor() as executor:
+            results, self._timings = Checker._collect(
+                *self._submit(executor, checked_code_folder))
+        return results
+
+    @property
+    def checked_code_folder(self):
+        """Get the folder with the code to check given in the job file."""
+        return self._checked_code_folder
+
+    @property
+    def timings(self):
+        """Get the timings of every Task from the last check_homework call.
+
+        Returns:
+            dict: the timings of every Task of every homework as given by
+                Task.timings
+        """
+        return self._timings
+
+    def check_students(self, student_folders):
+        """Check the homeworks of many students with one validated job.
+
+        All Tasks of all students share one pool of jobs. Only the Tasks of a
+        few students per job are submitted ahead of the student that is
+        reported next, so the pending Tasks of a large class never pile up.
+
+        Args:
+            student_folders (iterable): folders with the code of every student
+
+        Yields:
+            (str, dict, dict): student folder along with its results and
+                timings in the order of student folders
+        """
+        window = self._jobs * Checker.STUDENTS_AHEAD_PER_JOB
+        student_folders = iter(student_folders)
+        with self._create_executor() as executor:
+            scheduled = deque()
+            while True:
+                for folder in islice(student_folders,
+                                     window - len(scheduled)):
+                    scheduled.append((folder, self._submit(executor, folder)))
+                if not scheduled:
+                    return
+                # Forget about the students that are reported to free memory.
+                folder, (results, futures) = scheduled.popleft()
+                results, timings = Checker._collect(results, futures)
+                yield folder, results, timings
+
+    def close(self):
+        """Free the threads and the jobserver of this Checker.
+
+        The Checker cannot check anything afterwards.
+        """
+        self._style_checker.close()
+        if self._own_jobserver:
+            self._jobserver.close()
+
+    def _create_executor(self):
+        """Create an executor for the Tasks that fits the engine."""
+        if self._engine == Checker.ASYNCIO_ENGINE:
+            return AsyncioExecutor(self._jobs, self._tests_in_flight)
+        if self._engine == Checker.PIPELINE_ENGINE:
+            return PipelineExecutor(self._jobs, self._test_jobs)
+        return ThreadPoolExecutor(max_workers=self._jobs)
+
+    def split(self, checked_code_folder):
+        """Split the check of a folder into the checks of its Tasks.
+
+        Args:
+            checked_code_folder (str): folder with the code to check
+
+        Returns:
+            (dict, list): results without the Task results yet along with
+                the names of the homework and the Task of every Task to check
+        """
+        results, tasks = self._find_tasks(checked_code_folder)
+        return results, [(hw_name, task_plan.name)
+                         for hw_name, _, task_plan, _ in tasks]
+
+    def check_task(self, checked_code_folder, hw_name, task_name):
+        """Check a single Task of a homework, see split.
+
+        The time budget of the homework only applies to this Task.
 
-    def check_homework(self):
-        """Run over all Tasks in all homeworks."""
+        Returns:
+            (dict, dict): results of the Task along with its timings or None
+        """
+        for homework_plan in self._plan.homeworks:
+            if homework_plan.name != hw_name:
+                continue
+            for task_plan in homework_plan.tasks:
+                if task_plan.name != task_name:
+                    continue
+                return self._check_task(
+                    task_plan,
+                    path.join(checked_code_folder, homework_plan.folder),
+                    time_budget=TimeBudget(homework_plan.time_budget))
+        raise ValueError("No Task '{}' in homework '{}'.".format(
+            task_name, hw_name))
+
+    def _find_tasks(self, checked_code_folder):
+        """Find all Tasks to check in a folder.
+
+        Returns:
+            (dict, list): results without the Task results yet along with the
+                homework name, homework folder, TaskPlan and TimeBudget of
+                every Task
+        """
         results = {}
-        for homework_node in self._base_node[Tags.HOMEWORKS_TAG]:
+        tasks = []
+        for homework_plan in self._plan.homeworks:
             current_folder = path.join(
-                self._checked_code_folder, homework_node[Tags.FOLDER_TAG])
+                checked_code_folder, homework_plan.folder)
             if not path.exists(current_folder):
                 log.warning("Folder '%s' does not exist. Skiping.",
                             current_folder)
                 continue
-            hw_name = homework_node[Tags.NAME_TAG]
+            hw_name = homework_plan.name
             results[hw_name] = {}
-            deadline_str = homework_node[Tags.DEADLINE_TAG]
-            deadline_datetime = datetime.strptime(deadline_str,
-                                                  tools.DATE_PATTERN)
-            if datetime.now() > deadline_datetime:
+            if datetime.now() > homework_plan.deadline:
                 results[hw_name][tools.EXPIRED_TAG] = True
-            for task_node in homework_node[Tags.TASKS_TAG]:
-                task = Task.from_yaml_node(task_node=task_node,
-                                           student_hw_folder=current_folder,
-                                           job_file=self._job_file_path)
-                if not task:
-                    continue
-                results[hw_name][task.name] = task.check_all_tests()
+            # All Tasks of the homework of this student share the budget.
+            time_budget = TimeBudget(homework_plan.time_budget)
+            for task_plan in homework_plan.tasks:
+                tasks.append((hw_name, current_folder, task_plan,
+                              time_budget))
+        return results, tasks
 
-        return results
+    def _submit(self, executor, checked_code_folder):
+        """Submit all Tasks found in a folder for checking.
+
+        Returns:
+            (dict, list): results without the Task results yet along with
+                the futures of the Task results
+        """
+        results, tasks = self._find_tasks(checked_code_folder)
+        futures = []
+        for hw_name, current_folder, task_plan, time_budget in tasks:
+            if isinstance(executor, AsyncioExecutor):
+                future = executor.submit(self._check_task_async,
+                                         task_plan, current_folder,
+                                         executor.limit, time_budget)
+            elif isinstance(executor, PipelineExecutor):
+                future = executor.submit(self._start_task, self._finish_task,
+                                         task_plan, current_folder,
+                                         executor.budgets, time_budget)
+            else:
+                future = executor.submit(self._check_task,
+                                         task_plan, current_folder,
+                                         time_budget=time_budget)
+            futures.append((hw_name, task_plan.name, future))
+        return results, futures
+
+    @staticmethod
+    def _collect(results, futures):
+        """Wait for the Task results in the same order as a serial run.
+
+        Returns:
+            (dict, dict): results along with the timings of all Tasks
+        """
+        timings = {}
+        for hw_name, task_name, future in futures:
+            checked_task = future.result()
+            if checked_task is None:
+                continue
+            task_result, task_timings = checked_task
+            results[hw_name][task_name] = task_result
+            timings.setdefault(hw_name, {})[task_name] = task_timings
+        return results, timings
+
+    def _check_task(self, task_plan, student_hw_folder, budgets=None,
+                    time_budget=None):
+        """Check a single Task if it exists.
+
+        Args:
+            task_plan (TaskPlan): plan of the Task
+            student_hw_folder (str): folder with the homework of a student
+            budgets (StageBudgets): budgets of the builds and tests if any
+            time_budget (TimeBudget): time budget of the homework if any
+
+        Returns:
+            (dict, dict): results of the Task along with its timings or None
+        """
+        return self._finish_task(self._start_task(
+            task_plan, student_hw_folder, budgets, time_budget))
+
+    def _start_task(self, task_plan, student_hw_folder, budgets=None,
+                    time_budget=None):
+        """Create a Task and build it, the first stage of _check_task.
+
+        Returns:
+            (Task, str, dict): the built Task along with its key in the result
+                store and its results so far, or None along with the final
+                result of _check_task if there is nothing left to check
+        """
+        store_key, stored_results = self._restore_task(task_plan,
+                                                       student_hw_folder)
+        if stored_results is not None:
+            return None, None, (stored_results, tools.PhaseTimer().to_dict())
+        task = Task.from_plan(task_plan=task_plan,
+                              student_hw_folder=student_hw_folder,
+                              job_file=self._job_file_path,
+                              build_cache=self._build_cache,
+                              style_checker=self._style_checker,
+                              budgets=budgets,
+                              jobserver=self._jobserver,
+                              prebuilt=self._prebuilt,
+                              time_budget=time_budget,
+                              scratch=self._scratch,
+                              configure_cache=self._configure_cache)
+        if not task:
+            return None, None, None
+        try:
+            return task, store_key, task.check_build()
+        except BaseException:
+            task.cleanup()
+            raise
+
+    def _finish_task(self, started_task):
+        """Test a Task built by _start_task, the second stage of _check_task.
+
+        Returns:
+            (dict, dict): results of the Task along with its timings or None
+        """
+        task, store_key, results = started_task
+        if not task:
+            return results
+        try:
+            results = task.check_tests(results)
+            self._store_task(store_key, results)
+            return results, task.timings
+        finally:
+            task.cleanup()
+
+    async def _check_task_async(self, task_plan, student_hw_folder, limit,
+                                time_budget=None):
+        """Check a single Task with the asyncio engine."""
+        loop = asyncio.get_event_loop()
+        store_key, stored_results = await loop.run_in_executor(
+            None, self._restore_task, task_plan, student_hw_folder)
+        if stored_results is not None:
+            return stored_results, tools.PhaseTimer().to_dict()
+        task = await loop.run_in_executor(None, partial(
+            Task.from_plan,
+            task_plan=task_plan,
+            student_hw_folder=student_hw_folder,
+            job_file=self._job_file_path,
+            build_cache=self._build_cache,
+            style_checker=self._style_checker,
+            jobserver=self._jobserver,
+            prebuilt=self._prebuilt,
+            time_budget=time_budget,
+            scratch=self._scratch,
+            configure_cache=self._configure_cache))
+        if not task:
+            return None
+        try:
+            results = await task.check_all_tests_async(limit)
+            await loop.run_in_executor(
+                None, self._store_task, store_key, results)
+            return results, task.timings
+        finally:
+            await loop.run_in_executor(None, task.cleanup)
+
+    def _restore_task(self, task_plan, student_hw_folder):
+        """Get the stored results of a Task if its inputs did not change.
+
+        Returns:
+            (str, dict): key of the Task in the result store along with the
+                stored results, both are None if there is nothing to reuse
+        """
+        student_task_folder = path.join(student_hw_folder, task_plan.folder)
+        if not self._result_store or not path.exists(student_task_folder):
+            return None, None
+        store_key = self._result_store.key(task_plan, student_task_folder)
+        return store_key, self._result_store.load(store_key)
+
+    def _store_task(self, store_key, results):
+        """Store the results of a Task for the next runs if needed.
+
+        Results with skipped tests depend on more than the inputs of the Task,
+        so they are never reused.
+        """
+        if any(result.skipped for result in results.values()):
+            return
+        if self._result_store and store_key:
+            self._result_store.store(store_key, results)
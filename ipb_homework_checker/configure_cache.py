@@ -0,0 +1,161 @@
+"""Reuse the configured CMake build folders between students.
+
+Most students never change the CMakeLists.txt they are given, yet a fresh
+build folder makes cmake detect the compilers and check the system all over
+again for every one of them. A configured build folder is stored once per
+fingerprint of the CMake inputs and every new build folder with the same
+fingerprint is seeded from it:
+
+- CMakeCache.txt with the source folder replaced by a placeholder, as it is
+  the only file that holds the absolute paths of the student.
+- The compiler information in CMakeFiles/<cmake version>.
+
+cmake still runs on a seeded build folder, but only to generate the build
+files, so the result is the same as for a fresh one.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import weakref
+from os import path
+from shutil import copy2, rmtree
+
+from . import __version__
+from . import tools
+from .build_cache import SOURCE_PLACEHOLDER, compiler_version
+from .schema_tags import BuildTags
+from .workspace import IGNORED_FOLDERS
+
+log = logging.getLogger("GHC")
+
+CACHE_FILE = 'CMakeCache.txt'
+FILES_FOLDER = 'CMakeFiles'
+# The build files only exist once cmake has configured the build folder.
+GENERATED_FILE = 'Makefile'
+# Files whose contents matter to cmake. Other files only matter by name.
+CMAKE_INPUT_NAMES = ['CMakeLists.txt']
+CMAKE_INPUT_EXTENSIONS = ['.cmake', '.in']
+
+
+class ConfigureCache:
+    """A cache of configured CMake build folders keyed by the CMake inputs."""
+
+    def __init__(self, folder=None):
+        """Initialize the cache.
+
+        Args:
+            folder (str): folder to keep the configured build folders in
+                between runs, a temporary folder removed with this object by
+                default
+        """
+        if folder:
+            tools.create_folder_if_needed(folder)
+        else:
+            folder = tempfile.mkdtemp(prefix='configure_',
+                                      dir=tools.get_temp_dir())
+            weakref.finalize(self, rmtree, folder, True)
+        self._folder = folder
+
+    def key(self, source_folder, cmake_args):
+        """Compute a fingerprint of the CMake inputs in the source folder.
+
+        The fingerprint covers the names of all files, as cmake checks that
+        the sources exist, and the contents of the CMake files only, so that
+        changes to the code of the students keep the same fingerprint.
+        """
+        hasher = hashlib.sha256()
+        for root, dirs, files in os.walk(source_folder):
+            rel_root = path.relpath(root, source_folder)
+            if rel_root == path.curdir:
+                dirs[:] = [d for d in dirs if d not in IGNORED_FOLDERS]
+            dirs.sort()
+            for file_name in sorted(files):
+                hasher.update(path.join(rel_root, file_name).encode('utf-8'))
+                hasher.update(b'\0')
+                if not ConfigureCache.__is_cmake_input(file_name):
+                    continue
+                with open(path.join(root, file_name), 'rb') as stream:
+                    hasher.update(stream.read())
+                hasher.update(b'\0')
+        for value in [cmake_args,
+                      compiler_version(BuildTags.CMAKE),
+                      __version__]:
+            hasher.update(value.encode('utf-8'))
+            hasher.update(b'\0')
+        return hasher.hexdigest()
+
+    def load(self, key, source_folder, build_folder):
+        """Seed an empty build folder from the cache.
+
+        Returns:
+            bool: True if the build folder was seeded
+        """
+        entry_folder = path.join(self._folder, key)
+        if not path.exists(path.join(entry_folder, CACHE_FILE)):
+            return False
+        if path.exists(path.join(build_folder, CACHE_FILE)):
+            return False
+        ConfigureCache.__copy_cache_file(
+            path.join(entry_folder, CACHE_FILE),
+            path.join(build_folder, CACHE_FILE),
+            SOURCE_PLACEHOLDER, source_folder)
+        ConfigureCache.__copy_compiler_files(entry_folder, build_folder)
+        log.debug("Seeded '%s' from configure cache '%s'.", build_folder, key)
+        return True
+
+    def store(self, key, source_folder, build_folder):
+        """Store a build folder if cmake has configured it."""
+        entry_folder = path.join(self._folder, key)
+        if path.exists(entry_folder):
+            return
+        if not path.exists(path.join(build_folder, CACHE_FILE)) or \
+                not path.exists(path.join(build_folder, GENERATED_FILE)):
+            return
+        # Prepare the entry aside and move it in place at once, so that other
+        # checkers never see a half-written entry.
+        temp_folder = tempfile.mkdtemp(prefix='.tmp_', dir=self._folder)
+        ConfigureCache.__copy_compiler_files(build_folder, temp_folder)
+        ConfigureCache.__copy_cache_file(
+            path.join(build_folder, CACHE_FILE),
+            path.join(temp_folder, CACHE_FILE),
+            source_folder, SOURCE_PLACEHOLDER)
+        try:
+            os.rename(temp_folder, entry_folder)
+        except OSError:
+            # Somebody else has stored the same configuration in the meantime.
+            rmtree(temp_folder, ignore_errors=True)
+
+    @staticmethod
+    def __is_cmake_input(file_name):
+        return file_name in CMAKE_INPUT_NAMES or \
+            path.splitext(file_name)[1] in CMAKE_INPUT_EXTENSIONS
+
+    @staticmethod
+    def __copy_cache_file(source_file, dest_file, old_folder, new_folder):
+        with open(source_file, 'r') as stream:
+            contents = stream.read()
+        with open(dest_file, 'w') as stream:
+            stream.write(contents.replace(old_folder, new_folder))
+
+    @staticmethod
+    def __copy_compiler_files(source_folder, dest_folder):
+        """Copy the compiler information of every cmake version.
+
+        Only the files on top of the version folders are needed, the compiler
+        identification projects next to them are not.
+        """
+        files_folder = path.join(source_folder, FILES_FOLDER)
+        if not path.isdir(files_folder):
+            return
+        for version in os.listdir(files_folder):
+            version_folder = path.join(files_folder, version)
+            if not version[:1].isdigit() or not path.isdir(version_folder):
+                continue
+            dest_version_folder = path.join(dest_folder, FILES_FOLDER, version)
+            tools.create_folder_if_needed(dest_version_folder)
+            for file_name in os.listdir(version_folder):
+                file_path = path.join(version_folder, file_name)
+                if path.isfile(file_path):
+                    copy2(file_path, dest_version_folder)
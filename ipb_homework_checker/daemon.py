@@ -0,0 +1,284 @@
+"""Check students on request in a daemon that keeps the jobs loaded.
+
+A new checker process validates the job file and starts with cold caches
+every time. The daemon keeps a Checker for every job file it was asked about
+along with all of its caches and checks the students sent to it over a Unix
+socket. A job file is loaded again once it changes. Only the user running
+the daemon may connect to its socket.
+
+A request is a message with the path to the job file and the folders of the
+students to check, none for the folder given in the job file. The results of
+every student are sent back as soon as the student is checked, see
+protocol.py for the format of the messages.
+"""
+
+import logging
+import os
+import signal
+import socket
+import socketserver
+import stat
+import threading
+from contextlib import contextmanager
+from os import path
+
+from . import tools
+from .checker import Checker
+from .protocol import read_message, send_message
+from .result_writers import results_from_dict, results_to_dict
+
+log = logging.getLogger("GHC")
+
+JOB_KEY = 'job'
+STUDENTS_KEY = 'students'
+STUDENT_KEY = 'student'
+RESULTS_KEY = 'results'
+TIMINGS_KEY = 'timings'
+DONE_KEY = 'done'
+ERROR_KEY = 'error'
+
+
+class DaemonError(Exception):
+    """An error reported by the daemon."""
+
+
+class JobCheckers:
+    """The Checkers of job files, loaded again once a job file changes.
+
+    A Checker replaced by the one of the changed job file is closed as soon
+    as nobody uses it anymore.
+    """
+
+    def __init__(self, **checker_args):
+        """Initialize without any Checkers loaded yet.
+
+        Args:
+            checker_args: arguments of every Checker
+        """
+        self._checker_args = checker_args
+        # Every job file maps to its modification time and its Checker.
+        self._checkers = {}
+        # Every Checker in use maps to the number of its users.
+        self._users = {}
+        # Replaced Checkers wait here until nobody uses them.
+        self._replaced = []
+        self._lock = threading.Lock()
+
+    def checker(self, job_file):
+        """Get the Checker of a job, loading it if the job file changed.
+
+        The Checker is closed once the job file changes, so it must only be
+        used through use(...) if the job file may change meanwhile.
+        """
+        with self.use(job_file) as checker:
+            return checker
+
+    @contextmanager
+    def use(self, job_file):
+        """Use the Checker of a job within the context.
+
+        The Checker is loaded again if the job file changed and is not closed
+        before the context is left.
+        """
+        job_file = tools.expand_if_needed(job_file)
+        modified = os.stat(job_file).st_mtime_ns
+        with self._lock:
+            loaded = self._checkers.get(job_file)
+            if not loaded or loaded[0] != modified:
+                log.info("Loading job '%s'.", job_file)
+                if loaded:
+                    self._replaced.append(loaded[1])
+                loaded = (modified, Checker(job_file, **self._checker_args))
+                self._checkers[job_file] = loaded
+            checker = loaded[1]
+            self._users[checker] = self._users.get(checker, 0) + 1
+        try:
+            yield checker
+        finally:
+            with self._lock:
+                self._users[checker] -= 1
+                if not self._users[checker]:
+                    del self._users[checker]
+                self.__close_unused()
+
+    def close(self):
+        """Close all Checkers, none of them may be in use."""
+        with self._lock:
+            self._replaced.extend(
+                checker for _, checker in self._checkers.values())
+            self._checkers = {}
+            self.__close_unused()
+
+    def __close_unused(self):
+        """Close the replaced Checkers that nobody uses anymore."""
+        in_use = []
+        for checker in self._replaced:
+            if checker in self._users:
+                in_use.append(checker)
+            else:
+                checker.close()
+        self._replaced = in_use
+
+
+class CheckerDaemon(socketserver.ThreadingUnixStreamServer):
+    """A server that checks students with the Checkers of their jobs."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, job_files=(), **checker_args):
+        """Listen on a Unix socket.
+
+        Args:
+            socket_path (str): path to the Unix socket to listen on, a stale
+                socket left by another daemon is replaced, but no other file
+            job_files (list): job files to load right away
+            checker_args: arguments of every Checker
+        """
+        socket_path = tools.expand_if_needed(socket_path)
+        if path.lexists(socket_path):
+            if not stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+                raise FileExistsError(
+                    "Cannot listen on '{}' as it is not a socket.".format(
+                        socket_path))
+            os.remove(socket_path)
+        self._jobs = JobCheckers(**checker_args)
+        # Requests are checked one at a time as every Checker already uses
+        # all the jobs it is given.
+        self._check_lock = threading.Lock()
+        super().__init__(socket_path, _RequestHandler)
+        for job_file in job_files:
+            self.checker(job_file)
+
+    def checker(self, job_file):
+        """Get the Checker of a job, loading it if the job file changed."""
+        return self._jobs.checker(job_file)
+
+    def server_bind(self):
+        """Bind the socket so that only the user of the daemon can connect.
+
+        Nobody can connect before the daemon listens, so this leaves no time
+        for other users to connect.
+        """
+        super().server_bind()
+        os.chmod(self.server_address, stat.S_IRUSR | stat.S_IWUSR)
+
+    def check(self, request, stream):
+        """Check the students of a request and stream back their results."""
+        with self._jobs.use(request[JOB_KEY]) as checker:
+            student_folders = request.get(STUDENTS_KEY)
+            if student_folders is None:
+                student_folders = [checker.checked_code_folder]
+            with self._check_lock:
+                for student_folder, results, timings in \
+                        checker.check_students(student_folders):
+                    send_message(stream, {
+                        STUDENT_KEY: student_folder,
+                        RESULTS_KEY: results_to_dict(results),
+                        TIMINGS_KEY: timings})
+            send_message(stream, {DONE_KEY: checker.checked_code_folder})
+
+    def server_close(self):
+        """Stop listening, remove the socket and close all Checkers."""
+        super().server_close()
+        if path.lexists(self.server_address) and stat.S_ISSOCK(
+                os.lstat(self.server_address).st_mode):
+            os.remove(self.server_address)
+        self._jobs.close()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Handle a single request to the daemon."""
+
+    def handle(self):
+        request = read_message(self.rfile)
+        if request is None:
+            return
+        try:
+            self.server.check(request, self.wfile)
+        except ConnectionError:
+            log.warning("The client of job '%s' went away.",
+                        request.get(JOB_KEY))
+        except Exception as error:  # Any failure is reported to the client.
+            log.exception("Cannot check job '%s'.", request.get(JOB_KEY))
+            send_message(self.wfile, {ERROR_KEY: str(error)})
+
+
+class DaemonClient:
+    """Check students with a CheckerDaemon.
+
+    Checks the same way as a Checker of the job file would, so it can be used
+    in its place.
+    """
+
+    def __init__(self, socket_path, job_file_path):
+        """Initialize the client of the daemon listening on a socket."""
+        self._socket_path = tools.expand_if_needed(socket_path)
+        self._job_file_path = tools.expand_if_needed(job_file_path)
+        self._checked_code_folder = None
+        self._timings = {}
+
+    def check_homework(self, checked_code_folder=None):
+        """Check the code in a folder, the one in the job file by default."""
+        student_folders = [checked_code_folder] if checked_code_folder \
+            else None
+        results = {}
+        for _, results, self._timings in self.__request(student_folders):
+            pass
+        return results
+
+    @property
+    def checked_code_folder(self):
+        """Get the folder checked by the last call of check_homework."""
+        return self._checked_code_folder
+
+    @property
+    def timings(self):
+        """Get the timings of every Task from the last check_homework call."""
+        return self._timings
+
+    def check_students(self, student_folders):
+        """Check the homeworks of many students.
+
+        Yields:
+            (str, dict, dict): student folder along with its results and
+                timings in the order of student folders
+        """
+        return self.__request([tools.expand_if_needed(folder)
+                               for folder in student_folders])
+
+    def __request(self, student_folders):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self._socket_path)
+            with sock.makefile('rwb') as stream:
+                send_message(stream, {JOB_KEY: self._job_file_path,
+                                      STUDENTS_KEY: student_folders})
+                while True:
+                    message = read_message(stream)
+                    if message is None:
+                        raise DaemonError("The daemon closed the connection.")
+                    if ERROR_KEY in message:
+                        raise DaemonError(message[ERROR_KEY])
+                    if DONE_KEY in message:
+                        self._checked_code_folder = message[DONE_KEY]
+                        return
+                    yield (message[STUDENT_KEY],
+                           results_from_dict(message[RESULTS_KEY]),
+                           message[TIMINGS_KEY])
+
+
+def serve(socket_path, job_files=(), **checker_args):
+    """Run the daemon until it is interrupted or terminated."""
+    daemon = CheckerDaemon(socket_path, job_files, **checker_args)
+    signal.signal(signal.SIGTERM, __interrupt)
+    log.info("Serving checks on '%s'.", daemon.server_address)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        log.info("Stopping the daemon.")
+    finally:
+        daemon.server_close()
+
+
+def __interrupt(signal_number, frame):
+    """Stop the daemon the same way on SIGTERM as on SIGINT."""
+    raise KeyboardInterrupt()
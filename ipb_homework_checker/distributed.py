@@ -0,0 +1,386 @@
+"""Distribute checking the students between many worker processes.
+
+The coordinator splits the check of every student into the checks of single
+Tasks and hands them out to the workers connected to it over TCP. Workers may
+run on any host that sees the job file and the student folders under the same
+paths, including the host of the coordinator.
+
+Every worker checks one Task at a time and sends a heartbeat while it does.
+A Task is handed out again if its worker fails to check it, goes silent or
+disconnects. After the given number of retries the Task is reported as failed
+instead. Workers connect to the coordinator again once it goes away, so they
+can serve one coordinator run after the other.
+
+Workers run any command the job files handed out to them contain, so the
+coordinator and its workers share a secret token. Workers without the token
+are turned away and the coordinator only listens on the loopback interface
+unless told otherwise.
+
+All messages are sent as described in protocol.py.
+"""
+
+import hmac
+import itertools
+import logging
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+
+from . import tools
+from .checker import Checker
+from .daemon import JobCheckers
+from .protocol import read_message, send_message
+
+log = logging.getLogger("GHC")
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 7373
+DEFAULT_RETRIES = 2
+# Workers send a heartbeat this often while they check a Task.
+HEARTBEAT_INTERVAL = 5
+# Workers are lost if they do not send anything for this long.
+HEARTBEAT_TIMEOUT = 30
+# Waiting workers check if the coordinator is closed this often.
+POLL_INTERVAL = 0.5
+# Workers connect to the coordinator again after this delay.
+RECONNECT_DELAY = 1
+
+CHECK_FAILED_TAG = "0. Check failed"
+CHECK_FAILED_TEMPLATE = "Cannot check the Task after {attempts} attempts: " \
+    "{error}"
+
+WORKER_KEY = 'worker'
+TOKEN_KEY = 'token'
+UNIT_KEY = 'unit'
+JOB_KEY = 'job'
+STUDENT_KEY = 'student'
+HOMEWORK_KEY = 'homework'
+TASK_KEY = 'task'
+HEARTBEAT_KEY = 'heartbeat'
+RESULTS_KEY = 'results'
+TIMINGS_KEY = 'timings'
+ERROR_KEY = 'error'
+
+
+def parse_address(address):
+    """Parse an address given as host:port.
+
+    Returns:
+        (str, int): host along with the port, DEFAULT_HOST and DEFAULT_PORT
+            if not given
+    """
+    host, separator, port = address.rpartition(':')
+    if not separator:
+        return address or DEFAULT_HOST, DEFAULT_PORT
+    return host or DEFAULT_HOST, int(port)
+
+
+class Coordinator:
+    """Check the students with the workers connected to this coordinator.
+
+    Checks the same way as a Checker of the job file would, so it can be used
+    in its place. The time budgets of homeworks apply to every Task on its
+    own as the Tasks of a homework are checked by different workers.
+    """
+
+    def __init__(self, job_file_path, token,
+                 address=(DEFAULT_HOST, DEFAULT_PORT),
+                 retries=DEFAULT_RETRIES, heartbeat_timeout=HEARTBEAT_TIMEOUT,
+                 cache_folder=None):
+        """Load the job and wait for the workers to connect.
+
+        Args:
+            job_file_path (str): path to the *.yml job file
+            token (str): secret token the workers must know
+            address (tuple): host and port to listen on, any free port if the
+                port is 0
+            retries (int): number of times a Task is handed out again
+            heartbeat_timeout (float): seconds after which a silent worker is
+                lost
+            cache_folder (str): folder to keep the validated job in
+        """
+        self._job_file_path = tools.expand_if_needed(job_file_path)
+        # The Checker of the coordinator only splits the students into Tasks.
+        self._checker = Checker(self._job_file_path,
+                                cache_folder=cache_folder)
+        self._token = token
+        self._retries = retries
+        self._heartbeat_timeout = heartbeat_timeout
+        self._units = queue.Queue()
+        self._unit_ids = itertools.count()
+        # Every handed out unit maps to its future and number of attempts.
+        self._futures = {}
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._timings = {}
+        self._server = _CoordinatorServer(address, self)
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        log.info("Coordinating workers on %s:%s.", *self.address)
+
+    @property
+    def address(self):
+        """Get the host and port the workers connect to."""
+        return self._server.server_address
+
+    @property
+    def checked_code_folder(self):
+        """Get the folder with the code to check given in the job file."""
+        return self._checker.checked_code_folder
+
+    @property
+    def timings(self):
+        """Get the timings of every Task from the last check_homework call."""
+        return self._timings
+
+    def check_homework(self, checked_code_folder=None):
+        """Check the code in a folder, the one in the job file by default."""
+        if not checked_code_folder:
+            checked_code_folder = self.checked_code_folder
+        for _, results, self._timings in self.check_students(
+                [checked_code_folder]):
+            return results
+
+    def check_students(self, student_folders):
+        """Check the homeworks of many students with the workers.
+
+        The Tasks of all students are handed out at once.
+
+        Yields:
+            (str, dict, dict): student folder along with its results and
+                timings in the order of student folders
+        """
+        scheduled = []
+        for student_folder in student_folders:
+            student_folder = tools.expand_if_needed(student_folder)
+            results, tasks = self._checker.split(student_folder)
+            futures = [(hw_name, task_name,
+                        self.__submit(student_folder, hw_name, task_name))
+                       for hw_name, task_name in tasks]
+            scheduled.append((student_folder, results, futures))
+        for student_folder, results, futures in scheduled:
+            results, timings = Checker._collect(results, futures)
+            yield student_folder, results, timings
+
+    def close(self):
+        """Stop handing out Tasks and disconnect all workers."""
+        self._closed.set()
+        self._server.shutdown()
+        self._server.server_close()
+        self._checker.close()
+
+    def __submit(self, student_folder, hw_name, task_name):
+        unit = {UNIT_KEY: next(self._unit_ids),
+                JOB_KEY: self._job_file_path,
+                STUDENT_KEY: student_folder,
+                HOMEWORK_KEY: hw_name,
+                TASK_KEY: task_name}
+        future = Future()
+        with self._lock:
+            self._futures[unit[UNIT_KEY]] = future
+            self._attempts[unit[UNIT_KEY]] = 0
+        self._units.put(unit)
+        return future
+
+    def _serve_worker(self, handler):
+        """Hand out Tasks to a connected worker until either one is gone."""
+        handler.request.settimeout(self._heartbeat_timeout)
+        try:
+            hello = read_message(handler.rfile)
+        except (OSError, ValueError):
+            return
+        if not isinstance(hello, dict) or not self.__authorized(hello):
+            log.warning("Turning away %s:%s without the token.",
+                        *handler.client_address)
+            return
+        worker = '{}@{}:{}'.format(hello.get(WORKER_KEY),
+                                   *handler.client_address)
+        log.info("Worker '%s' connected.", worker)
+        while True:
+            unit = self.__next_unit()
+            if unit is None:
+                return
+            try:
+                outcome = self.__check_unit(handler, unit)
+            except (OSError, ValueError) as error:
+                log.warning("Worker '%s' is lost: %s", worker, error)
+                self.__retry(unit, "worker '{}' is lost".format(worker))
+                return
+            if ERROR_KEY in outcome:
+                self.__retry(unit, outcome[ERROR_KEY])
+                continue
+            self.__finish(unit, outcome)
+
+    def __authorized(self, hello):
+        """Check the token of a worker in constant time."""
+        token = hello.get(TOKEN_KEY)
+        if not isinstance(token, str):
+            return False
+        return hmac.compare_digest(token.encode('utf-8'),
+                                   self._token.encode('utf-8'))
+
+    def __next_unit(self):
+        """Wait for the next unit to hand out, None once closed."""
+        while not self._closed.is_set():
+            try:
+                return self._units.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return None
+
+    @staticmethod
+    def __check_unit(handler, unit):
+        send_message(handler.wfile, unit)
+        while True:
+            message = read_message(handler.rfile)
+            if message is None:
+                raise ConnectionError("the connection is closed")
+            if HEARTBEAT_KEY not in message:
+                return message
+
+    def __retry(self, unit, error):
+        with self._lock:
+            self._attempts[unit[UNIT_KEY]] += 1
+            attempts = self._attempts[unit[UNIT_KEY]]
+        if attempts <= self._retries:
+            log.warning("Checking '%s' of '%s' again: %s", unit[TASK_KEY],
+                        unit[STUDENT_KEY], error)
+            self._units.put(unit)
+            return
+        failed = tools.CmdResult(
+            returncode=1,
+            stderr=CHECK_FAILED_TEMPLATE.format(attempts=attempts,
+                                                error=error))
+        self.__finish(unit, {RESULTS_KEY: {CHECK_FAILED_TAG:
+                                           failed.to_dict()},
+                             TIMINGS_KEY: tools.PhaseTimer().to_dict()})
+
+    def __finish(self, unit, outcome):
+        with self._lock:
+            future = self._futures.pop(unit[UNIT_KEY])
+            del self._attempts[unit[UNIT_KEY]]
+        if outcome[RESULTS_KEY] is None:
+            future.set_result(None)
+            return
+        future.set_result((
+            {test_name: tools.CmdResult.from_dict(cmd_dict)
+             for test_name, cmd_dict in outcome[RESULTS_KEY].items()},
+            outcome[TIMINGS_KEY]))
+
+
+class _CoordinatorServer(socketserver.ThreadingTCPServer):
+    """A server that hands the connected workers to the coordinator."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, coordinator):
+        super().__init__(address, _WorkerHandler)
+        self.coordinator = coordinator
+
+
+class _WorkerHandler(socketserver.StreamRequestHandler):
+    """Handle the connection of a single worker."""
+
+    def handle(self):
+        self.server.coordinator._serve_worker(self)
+
+
+class Worker:
+    """Check the Tasks handed out by a coordinator."""
+
+    def __init__(self, address, token, jobs=None,
+                 heartbeat_interval=HEARTBEAT_INTERVAL):
+        """Initialize the worker of a coordinator.
+
+        Args:
+            address (tuple): host and port of the coordinator
+            token (str): secret token of the coordinator
+            jobs (JobCheckers): Checkers of the jobs, meant to be shared by
+                all workers of a process
+            heartbeat_interval (float): seconds between the heartbeats
+        """
+        self._address = address
+        self._token = token
+        if not jobs:
+            jobs = JobCheckers()
+        self._jobs = jobs
+        self._heartbeat_interval = heartbeat_interval
+
+    def work(self):
+        """Check the Tasks handed out until the coordinator disconnects."""
+        with socket.create_connection(self._address) as sock:
+            with sock.makefile('rwb') as stream:
+                send_message(stream, {WORKER_KEY: socket.gethostname(),
+                                      TOKEN_KEY: self._token})
+                while True:
+                    unit = read_message(stream)
+                    if unit is None:
+                        return
+                    send_message(stream, self.__check(unit, stream))
+
+    def __check(self, unit, stream):
+        """Check a Task sending heartbeats until it is checked."""
+        outcome = {UNIT_KEY: unit[UNIT_KEY]}
+        thread = threading.Thread(target=self.__run, args=(unit, outcome))
+        thread.start()
+        thread.join(self._heartbeat_interval)
+        while thread.is_alive():
+            send_message(stream, {HEARTBEAT_KEY: unit[UNIT_KEY]})
+            thread.join(self._heartbeat_interval)
+        return outcome
+
+    def __run(self, unit, outcome):
+        try:
+            with self._jobs.use(unit[JOB_KEY]) as checker:
+                checked_task = checker.check_task(
+                    unit[STUDENT_KEY], unit[HOMEWORK_KEY], unit[TASK_KEY])
+        except Exception as error:  # Any failure is reported back.
+            log.exception("Cannot check '%s' of '%s'.", unit[TASK_KEY],
+                          unit[STUDENT_KEY])
+            outcome[ERROR_KEY] = str(error)
+            return
+        if checked_task is None:
+            outcome[RESULTS_KEY] = None
+            return
+        task_results, task_timings = checked_task
+        outcome[RESULTS_KEY] = {
+            test_name: test_result.to_dict()
+            for test_name, test_result in task_results.items()}
+        outcome[TIMINGS_KEY] = task_timings
+
+
+def work(address, token, workers=1, **checker_args):
+    """Run workers until interrupted, connecting again whenever needed.
+
+    Args:
+        address (tuple): host and port of the coordinator
+        token (str): secret token of the coordinator
+        workers (int): number of Tasks to check at the same time
+        checker_args: arguments of the Checkers of all jobs
+    """
+    jobs = JobCheckers(**checker_args)
+
+    def work_forever():
+        worker = Worker(address, token, jobs)
+        while True:
+            try:
+                worker.work()
+            except OSError as error:
+                log.debug("Cannot reach the coordinator: %s", error)
+            time.sleep(RECONNECT_DELAY)
+
+    for _ in range(max(1, workers)):
+        threading.Thread(target=work_forever, daemon=True).start()
+    log.info("Running %s workers of the coordinator on %s:%s.", workers,
+             *address)
+    try:
+        while True:
+            time.sleep(RECONNECT_DELAY)
+    except KeyboardInterrupt:
+        log.info("Stopping the workers.")
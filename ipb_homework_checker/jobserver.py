@@ -0,0 +1,229 @@
+"""Share one compile budget between all builds through a GNU make jobserver.
+
+A jobserver is a pipe filled with tokens. Every job that make starts beyond
+its first one needs a token read from the pipe and writes it back once done.
+All builds of the checker take their tokens from the same pipe, so together
+they never run more compile jobs than there are tokens. The checker acts as
+the top level make: it takes a token for the first job of a build before
+starting it.
+
+Make never sees the shared pipe itself. Every build gets a private pipe that
+a thread of the checker feeds with tokens of the shared pipe, so the checker
+knows how many tokens every build holds. A make killed on a timeout never
+writes its tokens back, but its slot still puts them back into the shared
+pipe once the build is done.
+"""
+
+import array
+import fcntl
+import logging
+import os
+import select
+import termios
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+from . import tools
+
+log = logging.getLogger("GHC")
+
+TOKEN = b'+'
+MAKEFLAGS_TEMPLATE = " -j --jobserver-auth={read_fd},{write_fd}"
+# Seconds between the checks of a private pipe for the tokens make needs or
+# has written back.
+POLL_SECONDS = 0.01
+
+
+def _available_tokens(read_fd):
+    """Count the tokens in a pipe."""
+    available = array.array('i', [0])
+    fcntl.ioctl(read_fd, termios.FIONREAD, available)
+    return available[0]
+
+
+def _take_token(read_fd, timeout=None):
+    """Wait for a token and take it from a non-blocking pipe.
+
+    Returns:
+        bytes: the token or None if there was none within the timeout
+    """
+    while True:
+        readable, _, _ = select.select([read_fd], [], [], timeout)
+        if not readable:
+            return None
+        try:
+            token = os.read(read_fd, 1)
+        except BlockingIOError:
+            # Another thread took the token first.
+            continue
+        if token:
+            return token
+
+
+class JobServer:
+    """A GNU make compatible jobserver backed by a pipe of tokens."""
+
+    def __init__(self, jobs=None):
+        """Create the pipe and fill it with tokens.
+
+        Args:
+            jobs (int): number of compile jobs running at the same time, the
+                number of cores by default
+        """
+        self._jobs = max(1, jobs or os.cpu_count() or 1)
+        self._read_fd, self._write_fd = os.pipe()
+        # Only the threads of the checker read the shared pipe.
+        os.set_blocking(self._read_fd, False)
+        os.write(self._write_fd, TOKEN * self._jobs)
+        self._lock = threading.Lock()
+        # Number of builds waiting for the token of their first job.
+        self._waiting = 0
+
+    @property
+    def jobs(self):
+        """Get the number of compile jobs running at the same time."""
+        return self._jobs
+
+    def close(self):
+        """Close the pipe once no build uses this jobserver anymore."""
+        os.close(self._read_fd)
+        os.close(self._write_fd)
+
+    def run(self, command, cwd, timeout=20):
+        """Run a build command holding a token of this jobserver.
+
+        The token stands for the first compile job, make takes the tokens for
+        all other jobs from the jobserver on its own.
+        """
+        with self.slot() as job_slot:
+            return tools.run_command(command,
+                                     cwd=cwd,
+                                     env=job_slot.env(),
+                                     timeout=timeout,
+                                     pass_fds=job_slot.pass_fds)
+
+    @contextmanager
+    def slot(self):
+        """Hold a token for the first job of a build within the context.
+
+        Yields:
+            JobSlot: the private jobserver of the build
+        """
+        with self._lock:
+            self._waiting += 1
+        try:
+            token = _take_token(self._read_fd)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        try:
+            job_slot = JobSlot(self)
+            try:
+                yield job_slot
+            finally:
+                job_slot.close()
+        finally:
+            self.give_back(token)
+
+    def has_waiting_builds(self):
+        """Check if any build waits for the token of its first job."""
+        return self._waiting > 0
+
+    def lend(self, timeout):
+        """Take a token for a job beyond the first one of a build.
+
+        Returns:
+            bytes: the token or None if there was none within the timeout
+        """
+        return _take_token(self._read_fd, timeout)
+
+    def give_back(self, tokens):
+        """Put tokens back into the pipe."""
+        os.write(self._write_fd, tokens)
+
+
+class JobSlot:
+    """A private jobserver of one build fed with the tokens of a JobServer.
+
+    A thread lends a token of the JobServer to the private pipe whenever make
+    has taken the last one, and gives back the tokens make writes back. So a
+    build holds at most one token its make has not asked for yet, and none
+    while other builds wait for the token of their first job. Every token
+    lent to the build is counted and given back once the slot is closed, even
+    if make never wrote it back.
+    """
+
+    def __init__(self, jobserver):
+        """Create the private pipe and start lending tokens to it."""
+        self._jobserver = jobserver
+        self._read_fd, self._write_fd = os.pipe()
+        # Make may use the pipe in blocking mode, so reclaim the tokens through
+        # a non-blocking file description of our own.
+        self._reclaim_fd = os.open('/proc/self/fd/{}'.format(self._read_fd),
+                                   os.O_RDONLY | os.O_NONBLOCK)
+        # Number of tokens of the JobServer the build holds.
+        self._lent = 0
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self.__lend_tokens,
+                                        daemon=True)
+        self._thread.start()
+
+    @property
+    def pass_fds(self):
+        """Get the file descriptors a build must inherit."""
+        return (self._read_fd, self._write_fd)
+
+    def env(self, base_env=None):
+        """Get an environment that points make to this jobserver.
+
+        Args:
+            base_env (dict): environment to extend, os.environ by default
+        """
+        env = dict(os.environ if base_env is None else base_env)
+        env['MAKEFLAGS'] = MAKEFLAGS_TEMPLATE.format(read_fd=self._read_fd,
+                                                     write_fd=self._write_fd)
+        return env
+
+    def close(self):
+        """Give back all tokens lent to the build once it is done."""
+        self._closed.set()
+        self._thread.join()
+        if self._lent:
+            log.debug("Giving back %s jobserver tokens.", self._lent)
+            self._jobserver.give_back(TOKEN * self._lent)
+            self._lent = 0
+        for fd in [self._reclaim_fd, self._read_fd, self._write_fd]:
+            os.close(fd)
+
+    def __lend_tokens(self):
+        while not self._closed.is_set():
+            available = _available_tokens(self._read_fd)
+            waiting = self._jobserver.has_waiting_builds()
+            # Keep no spare token while another build cannot start.
+            spare = available if waiting else available - 1
+            if spare > 0:
+                self.__reclaim_tokens(spare)
+            elif not available and not waiting:
+                token = self._jobserver.lend(POLL_SECONDS)
+                if token:
+                    os.write(self._write_fd, token)
+                    self._lent += 1
+                continue
+            self._closed.wait(POLL_SECONDS)
+
+    def __reclaim_tokens(self, count):
+        """Give back the tokens in the private pipe that make does not need."""
+        try:
+            tokens = os.read(self._reclaim_fd, count)
+        except BlockingIOError:
+            # Make took them first.
+            return
+        self._jobserver.give_back(tokens)
+        self._lent -= len(tokens)
+
+
+@lru_cache(maxsize=None)
+def default_jobserver():
+    """Get the jobserver shared by all builds without one of their own."""
+    return JobServer()
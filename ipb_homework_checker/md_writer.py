@@ -1,6 +1,12 @@
 """Write test results into a markdown file."""
 
-from .tools import EXPIRED_TAG
+import hashlib
+import re
+import tempfile
+from os import path
+from shutil import copyfileobj
+
+from .tools import EXPIRED_TAG, PhaseTimer, create_folder_if_needed
 
 TABLE_TEMPLATE = "| {hw_name} | {task_name} | {test_name} | {result_sign} |\n"
 TABLE_SEPARATOR = "|---|---|---|:---:|\n"
@@ -11,10 +17,17 @@ ERROR_TEMPLATE = """### `[{hw_name}][{task_name}][{test_name}]:`
 ```apiblueprint
 {stderr}
 ```
-*stdout*:
+{stderr_note}*stdout*:
 ```
 {stdout}
 ```
+{stdout_note}--------
+"""
+
+SKIPPED_TEMPLATE = """### `[{hw_name}][{task_name}][{test_name}]:`
+
+*{reason}*
+
 --------
 """
 
@@ -24,27 +37,72 @@ EXPIRED_TEMPLATE = """
 
 """
 
+TIMING_TEMPLATE = "| {hw_name} | {task_name} | {test_name} | {phases} |\n"
+TIMING_SEPARATOR = "|---|---|---|" + "---:|" * len(PhaseTimer.ALL) + "\n"
+
+SUMMARY_TEMPLATE = \
+    "| {student} | {passed} | {failed} | {skipped} | {report} |\n"
+SUMMARY_SEPARATOR = "|---|:---:|:---:|:---:|---|\n"
+
+TRUNCATED_TEMPLATE = "*Truncated {count} more characters.*\n"
+TRUNCATED_LOG_TEMPLATE = \
+    "*Truncated {count} more characters, see the [full log]({link}).*\n"
+LOG_FILE_TEMPLATE = \
+    "{hw_name}_{task_name}_{test_name}_{digest}.{stream_name}.txt"
+
+# Keep this many characters of stdout and stderr of every failed test.
+MAX_ERROR_SIZE = 16 * 1024
+
 SEPARATOR = "--------\n"
 FINISHING_NOTE = "With 💙 from homework bot 🤖\n"
 
 SUCCESS_TAG = "✔"
 FAILED_TAG = "✘"
+SKIPPED_TAG = "⏭"
 
 
 class MdWriter:
-    """Write given tests results into a markdown file."""
+    """Write given tests results into a markdown file.
 
-    def __init__(self):
-        """Initialize the writer."""
-        self._md_table = TABLE_TEMPLATE.format(hw_name='Homework Name',
-                                               task_name='Task Name',
-                                               test_name='Test Name',
-                                               result_sign='Result')
-        self._md_table += TABLE_SEPARATOR
-        self._errors = ''  # Markdown part with errors.
-
-    def update(self, hw_results):
-        """Update the table of completion."""
+    Rows of the tables are collected as lists of lines and the sections with
+    errors are streamed to a temporary file right away, so building a report
+    takes time and memory linear in its size. The output of every failed test
+    is cut to max_error_size characters. If logs_folder is given, the full
+    output that was cut is written there and linked from the report.
+    """
+
+    def __init__(self, max_error_size=MAX_ERROR_SIZE, logs_folder=None):
+        """Initialize the writer.
+
+        Args:
+            max_error_size (int): number of characters to keep of stdout and
+                stderr of every failed test, None to keep everything
+            logs_folder (str): folder to write the full output that is cut
+                into, it is linked relative to its parent folder, so it is
+                meant to be next to the md file
+        """
+        self._md_table = [TABLE_TEMPLATE.format(hw_name='Homework Name',
+                                                task_name='Task Name',
+                                                test_name='Test Name',
+                                                result_sign='Result'),
+                          TABLE_SEPARATOR]
+        # Markdown part with errors.
+        self._errors = tempfile.TemporaryFile('w+', encoding='utf-8')
+        self._has_errors = False
+        self._timing_table = []  # Markdown part with timings if needed.
+        self._max_error_size = max_error_size
+        self._logs_folder = logs_folder
+
+    def update(self, hw_results, timings=None):
+        """Update the table of completion.
+
+        Args:
+            hw_results (dict): results of the Tasks of all homeworks
+            timings (dict): add a table with these timings of the Tasks if
+                given, see Checker.timings
+        """
+        if timings:
+            self._add_timings(timings)
         for hw_name, hw_dict in sorted(hw_results.items()):
             need_hw_name = True
             expired = False
@@ -58,16 +116,14 @@ class MdWriter:
                     continue
                 need_task_name = True
                 for test_name, test_result in sorted(ex_dict.items()):
-                    result_sign = SUCCESS_TAG \
-                        if test_result.succeeded() \
-                        else FAILED_TAG
+                    result_sign = MdWriter.__result_sign(test_result)
                     extended_hw_name = hw_name + " `[PAST DEADLINE]`" \
                         if expired else hw_name
-                    self._md_table += TABLE_TEMPLATE.format(
+                    self._md_table.append(TABLE_TEMPLATE.format(
                         hw_name=extended_hw_name if need_hw_name else '',
                         task_name=task_name if need_task_name else '',
                         test_name=test_name,
-                        result_sign=result_sign)
+                        result_sign=result_sign))
                     self._add_error(hw_name,
                                     task_name,
                                     test_name,
@@ -77,26 +133,170 @@ class MdWriter:
                     need_task_name = False  # We only print Task name once.
 
     def write_md_file(self, md_file_path):
-        """Write all the added content to the md file."""
-        md_file_content = '# Test results\n'
-        md_file_content += self._md_table
-        if self._errors:
-            md_file_content += '\n## Encountered errors\n'
-            md_file_content += self._errors
-        md_file_content += SEPARATOR
-        md_file_content += FINISHING_NOTE
-        with open(md_file_path, 'w') as md_file:
-            md_file.write(md_file_content)
+        """Write all the added content to the md file.
+
+        This closes the temporary file with the errors, so the writer cannot
+        be updated afterwards.
+        """
+        with open(md_file_path, 'w', encoding='utf-8') as md_file:
+            md_file.write('# Test results\n')
+            md_file.writelines(self._md_table)
+            if self._timing_table:
+                md_file.write('\n## Timing in seconds\n')
+                md_file.write(TIMING_TEMPLATE.format(
+                    hw_name='Homework Name',
+                    task_name='Task Name',
+                    test_name='Test Name',
+                    phases=' | '.join(PhaseTimer.ALL)))
+                md_file.write(TIMING_SEPARATOR)
+                md_file.writelines(self._timing_table)
+            if self._has_errors:
+                md_file.write('\n## Encountered errors\n')
+                self._errors.seek(0)
+                copyfileobj(self._errors, md_file)
+            md_file.write(SEPARATOR)
+            md_file.write(FINISHING_NOTE)
+        self._errors.close()
+
+    def _add_timings(self, timings):
+        """Add rows with the timings of Tasks and their tests."""
+        for hw_name, hw_timings in sorted(timings.items()):
+            need_hw_name = True
+            for task_name, task_timings in sorted(hw_timings.items()):
+                rows = [('', task_timings['phases'])]
+                rows += sorted(task_timings['tests'].items())
+                for test_name, phases in rows:
+                    self._timing_table.append(TIMING_TEMPLATE.format(
+                        hw_name=hw_name if need_hw_name else '',
+                        task_name=task_name if not test_name else '',
+                        test_name=test_name,
+                        phases=' | '.join(
+                            '{:.2f}'.format(phases[phase])
+                            if phase in phases else ''
+                            for phase in PhaseTimer.ALL)))
+                    need_hw_name = False
 
     def _add_error(self, hw_name, task_name, test_name, test_result, expired):
         """Add a section of errors to the md file."""
         if test_result.succeeded():
             return
+        self._has_errors = True
         if expired:
-            self._errors += EXPIRED_TEMPLATE.format(hw_name=hw_name)
+            self._errors.write(EXPIRED_TEMPLATE.format(hw_name=hw_name))
             return
-        self._errors += ERROR_TEMPLATE.format(hw_name=hw_name,
-                                              task_name=task_name,
-                                              test_name=test_name,
-                                              stderr=test_result.stderr,
-                                              stdout=test_result.stdout)
+        if test_result.skipped:
+            self._errors.write(SKIPPED_TEMPLATE.format(
+                hw_name=hw_name,
+                task_name=task_name,
+                test_name=test_name,
+                reason=test_result.stderr))
+            return
+        names = [hw_name, task_name, test_name]
+        stderr, stderr_note = self._truncate(
+            test_result.stderr, names, 'stderr')
+        stdout, stdout_note = self._truncate(
+            test_result.stdout, names, 'stdout')
+        self._errors.write(ERROR_TEMPLATE.format(hw_name=hw_name,
+                                                 task_name=task_name,
+                                                 test_name=test_name,
+                                                 stderr=stderr,
+                                                 stderr_note=stderr_note,
+                                                 stdout=stdout,
+                                                 stdout_note=stdout_note))
+
+    def _truncate(self, output, names, stream_name):
+        """Cut the output to the maximum size, writing it in full if needed.
+
+        Args:
+            output (str): stdout or stderr of a test
+            names (list): names of the homework, Task and test
+            stream_name (str): name of the stream of the output
+
+        Returns:
+            (str, str): the output to show along with a note about the part
+                that is cut away, which is empty if nothing is cut
+        """
+        if not isinstance(output, str) or self._max_error_size is None or \
+                len(output) <= self._max_error_size:
+            return output, ''
+        count = len(output) - self._max_error_size
+        kept = output[:self._max_error_size]
+        if not self._logs_folder:
+            return kept, TRUNCATED_TEMPLATE.format(count=count)
+        create_folder_if_needed(self._logs_folder)
+        log_name = LOG_FILE_TEMPLATE.format(
+            hw_name=MdWriter.__file_name(names[0]),
+            task_name=MdWriter.__file_name(names[1]),
+            test_name=MdWriter.__file_name(names[2]),
+            digest=MdWriter.__digest(names),
+            stream_name=stream_name)
+        with open(path.join(self._logs_folder, log_name), 'w',
+                  encoding='utf-8') as log_file:
+            log_file.write(output)
+        link = '/'.join([path.basename(path.normpath(self._logs_folder)),
+                         log_name])
+        return kept, TRUNCATED_LOG_TEMPLATE.format(count=count, link=link)
+
+    @staticmethod
+    def __result_sign(test_result):
+        if test_result.skipped:
+            return SKIPPED_TAG
+        if test_result.succeeded():
+            return SUCCESS_TAG
+        return FAILED_TAG
+
+    @staticmethod
+    def __file_name(name):
+        """Make a name safe to use in a file name."""
+        return re.sub(r'[^A-Za-z0-9_.-]+', '_', name)
+
+    @staticmethod
+    def __digest(names):
+        """Hash the names, as distinct names may be the same in a file name."""
+        hasher = hashlib.sha256('\0'.join(names).encode('utf-8'))
+        return hasher.hexdigest()[:8]
+
+
+class SummaryMdWriter:
+    """Write a summary of the results of many students into a markdown file."""
+
+    def __init__(self):
+        """Initialize the writer."""
+        self._rows = [SUMMARY_TEMPLATE.format(student='Student',
+                                              passed='Passed',
+                                              failed='Failed',
+                                              skipped='Skipped',
+                                              report='Report'),
+                      SUMMARY_SEPARATOR]
+
+    def update(self, student_name, hw_results, report_link):
+        """Add a row with the number of passed, failed and skipped tests."""
+        passed = 0
+        failed = 0
+        skipped = 0
+        for hw_dict in hw_results.values():
+            for task_name, ex_dict in hw_dict.items():
+                if task_name == EXPIRED_TAG:
+                    continue
+                for test_result in ex_dict.values():
+                    if test_result.skipped:
+                        skipped += 1
+                    elif test_result.succeeded():
+                        passed += 1
+                    else:
+                        failed += 1
+        self._rows.append(SUMMARY_TEMPLATE.format(
+            student=student_name,
+            passed=passed,
+            failed=failed,
+            skipped=skipped,
+            report='[{name}]({link})'.format(name=student_name,
+                                             link=report_link)))
+
+    def write_md_file(self, md_file_path):
+        """Write the summary table to the md file."""
+        with open(md_file_path, 'w') as md_file:
+            md_file.write('# Summary\n')
+            md_file.writelines(self._rows)
+            md_file.write(SEPARATOR)
+            md_file.write(FINISHING_NOTE)
@@ -0,0 +1,257 @@
+"""Compile a validated job into an immutable plan of what to check.
+
+A plan holds everything that does not depend on the checked code: resolved
+paths of the folders to inject, ready commands, converted expected outputs and
+so on. It is compiled once per job and reused for every student.
+"""
+
+import hashlib
+import json
+from collections import namedtuple
+from datetime import datetime
+from os import path
+
+from . import tools
+from .schema_tags import Tags, LangTags, PrebuiltTags
+
+# Commands that run the binary of a Task for every language.
+TEST_COMMANDS = {
+    LangTags.CPP: "./{binary_name} {args}",
+    LangTags.BASH: "sh {binary_name}.sh {args}",
+}
+
+
+class TestPlan(namedtuple('TestPlan', [
+        'name',
+        'input_str',
+        'command',
+        'expected_output',
+        'run_google_tests',
+        'inject_folders',
+        'limits'])):
+    """A precompiled test of a Task.
+
+    Attributes:
+        name (str): name of the test
+        input_str (str): input arguments of the binary
+        command (str): shell command that runs the test
+        expected_output (str|float): expected output converted to the output
+            type of the Task, None if not given or not convertible
+        run_google_tests (bool): run the google tests instead of the binary
+        inject_folders (tuple): pairs of the name of the folder to replace in
+            the Task folder and the absolute path of the folder to inject
+        limits (tuple): pairs of LimitTags and values including the ones
+            inherited from the Task
+    """
+    __slots__ = ()
+
+
+class TaskPlan(namedtuple('TaskPlan', [
+        'name',
+        'language',
+        'folder',
+        'output_type',
+        'binary_name',
+        'build_type',
+        'compiler_flags',
+        'inject_folders',
+        'tests',
+        'stream_output',
+        'fail_fast',
+        'skip_on_crash',
+        'time_budget',
+        'all_inject_folders',
+        'node_hash'])):
+    """A precompiled Task.
+
+    Attributes:
+        name (str): name of the Task
+        language (str): one of LangTags
+        folder (str): folder of the Task relative to the homework folder
+        output_type (str): one of OutputTags
+        binary_name (str): name of the binary to run
+        build_type (str): one of BuildTags
+        compiler_flags (str): flags to build the code with
+        inject_folders (tuple): folders injected for the build, same as in
+            TestPlan
+        tests (tuple): TestPlan of every test in the order of the job
+        stream_output (bool): compare the output of the tests while they run
+            and stop them as soon as it diverges from the expected output
+        fail_fast (int): skip the remaining tests after this many tests have
+            failed, None to run all tests
+        skip_on_crash (bool): skip the remaining tests of the binary after it
+            has crashed or timed out
+        time_budget (float): skip the tests that did not start within this
+            many seconds since the Task started, None if not bounded
+        all_inject_folders (tuple): absolute paths of all injected folders
+        node_hash (str): hash of the validated job node of the Task
+    """
+    __slots__ = ()
+
+
+class HomeworkPlan(namedtuple('HomeworkPlan', [
+        'name',
+        'folder',
+        'deadline',
+        'time_budget',
+        'tasks'])):
+    """A precompiled homework.
+
+    Attributes:
+        name (str): name of the homework
+        folder (str): folder of the homework relative to the checked code
+        deadline (datetime): the homework has expired after this time
+        time_budget (float): seconds all Tasks of a student may spend on this
+            homework together, None if not bounded
+        tasks (tuple): TaskPlan of every Task
+    """
+    __slots__ = ()
+
+
+class PrebuiltPlan(namedtuple('PrebuiltPlan', [
+        'gtest_folder',
+        'headers',
+        'header_flags'])):
+    """Dependencies built once for all students.
+
+    Attributes:
+        gtest_folder (str): real path to the GoogleTest source folder, None if
+            GoogleTest is not prebuilt
+        headers (tuple): headers to precompile for the targets that link
+            the prebuilt GoogleTest
+        header_flags (str): flags to precompile the headers with
+    """
+    __slots__ = ()
+
+
+class JobPlan(namedtuple('JobPlan', [
+        'job_file',
+        'checked_code_folder',
+        'homeworks',
+        'prebuilt'])):
+    """A precompiled job.
+
+    Attributes:
+        job_file (str): absolute path to the job file
+        checked_code_folder (str): absolute path to the code from the job file
+        homeworks (tuple): HomeworkPlan of every homework
+        prebuilt (PrebuiltPlan): dependencies to build once, None if there are
+            none
+    """
+    __slots__ = ()
+
+
+def compile_job(validated_yaml, job_file):
+    """Compile a validated job into a plan.
+
+    Args:
+        validated_yaml (dict): job validated by the SchemaManager
+        job_file (str): absolute path to the job file
+
+    Returns:
+        JobPlan: plan of the whole job
+    """
+    return JobPlan(
+        job_file=job_file,
+        checked_code_folder=tools.expand_if_needed(
+            validated_yaml[Tags.FOLDER_TAG]),
+        homeworks=tuple(
+            HomeworkPlan(
+                name=homework_node[Tags.NAME_TAG],
+                folder=homework_node[Tags.FOLDER_TAG],
+                deadline=datetime.strptime(homework_node[Tags.DEADLINE_TAG],
+                                           tools.DATE_PATTERN),
+                time_budget=homework_node.get(Tags.TIME_BUDGET_TAG),
+                tasks=tuple(compile_task(task_node, job_file)
+                            for task_node in homework_node[Tags.TASKS_TAG]))
+            for homework_node in validated_yaml[Tags.HOMEWORKS_TAG]),
+        prebuilt=compile_prebuilt(validated_yaml.get(Tags.PREBUILT_TAG),
+                                  job_file))
+
+
+def compile_prebuilt(prebuilt_node, job_file):
+    """Compile the validated job node of the prebuilt dependencies.
+
+    Args:
+        prebuilt_node (dict): validated job node, may be None
+        job_file (str): absolute path to the job file
+
+    Returns:
+        PrebuiltPlan: plan of the dependencies or None if there are none
+    """
+    if not prebuilt_node:
+        return None
+    gtest_folder = prebuilt_node.get(PrebuiltTags.GTEST_FOLDER)
+    if gtest_folder:
+        # Compare to the real path as CMake does to find it in student code.
+        gtest_folder = path.realpath(path.join(
+            path.dirname(job_file), path.expanduser(gtest_folder)))
+    return PrebuiltPlan(
+        gtest_folder=gtest_folder,
+        headers=tuple(prebuilt_node.get(PrebuiltTags.HEADERS, [])),
+        header_flags=prebuilt_node.get(PrebuiltTags.HEADER_FLAGS, ''))
+
+
+def compile_task(task_node, job_file):
+    """Compile a validated job node of a Task into a plan.
+
+    Args:
+        task_node (dict): validated job node of a Task
+        job_file (str): absolute path to the job file
+
+    Returns:
+        TaskPlan: plan of the Task
+    """
+    job_folder = path.dirname(job_file)
+    task_limits = task_node.get(Tags.LIMITS_TAG, {})
+    tests = []
+    for test_node in task_node.get(Tags.TESTS_TAG, []):
+        input_str = test_node.get(Tags.INPUT_TAG, '')
+        command = TEST_COMMANDS[task_node[Tags.LANGUAGE_TAG]].format(
+            binary_name=task_node[Tags.BINARY_NAME_TAG], args=input_str)
+        if task_node[Tags.PIPE_TAG]:
+            command += ' ' + task_node[Tags.PIPE_TAG]
+        expected_output = None
+        if Tags.EXPECTED_OUTPUT_TAG in test_node:
+            expected_output, _ = tools.convert_to(
+                task_node[Tags.OUTPUT_TYPE_TAG],
+                test_node[Tags.EXPECTED_OUTPUT_TAG])
+        limits = dict(task_limits)
+        limits.update(test_node.get(Tags.LIMITS_TAG, {}))
+        tests.append(TestPlan(
+            name=test_node[Tags.NAME_TAG],
+            input_str=input_str,
+            command=command,
+            expected_output=expected_output,
+            run_google_tests=test_node.get(Tags.RUN_GTESTS_TAG, False),
+            inject_folders=_compile_injections(test_node, job_folder),
+            limits=tuple(sorted(limits.items()))))
+    inject_folders = _compile_injections(task_node, job_folder)
+    all_inject_folders = set(
+        folder for _, folder in inject_folders)
+    for test in tests:
+        all_inject_folders.update(folder for _, folder in test.inject_folders)
+    return TaskPlan(
+        name=task_node[Tags.NAME_TAG],
+        language=task_node[Tags.LANGUAGE_TAG],
+        folder=task_node[Tags.FOLDER_TAG],
+        output_type=task_node[Tags.OUTPUT_TYPE_TAG],
+        binary_name=task_node[Tags.BINARY_NAME_TAG],
+        build_type=task_node[Tags.BUILD_TYPE_TAG],
+        compiler_flags=task_node[Tags.COMPILER_FLAGS_TAG],
+        inject_folders=inject_folders,
+        tests=tuple(tests),
+        stream_output=task_node.get(Tags.STREAM_OUTPUT_TAG, False),
+        fail_fast=task_node.get(Tags.FAIL_FAST_TAG),
+        skip_on_crash=task_node.get(Tags.SKIP_ON_CRASH_TAG, False),
+        time_budget=task_node.get(Tags.TIME_BUDGET_TAG),
+        all_inject_folders=tuple(sorted(all_inject_folders)),
+        node_hash=hashlib.sha256(json.dumps(
+            task_node, sort_keys=True).encode('utf-8')).hexdigest())
+
+
+def _compile_injections(node, job_folder):
+    """Resolve the folders to inject for a job node."""
+    return tuple(
+        (path.basename(folder), path.join(job_folder, folder))
+        for folder in node.get(Tags.INJECT_FOLDER_TAG, []))
@@ -0,0 +1,196 @@
+"""Build the dependencies shared by all students once per job run.
+
+GoogleTest and precompiled headers take most of the time of building small
+C++ Tasks. These are built once and every CMake build of a student gets them
+through a CMake script included into its project:
+
+- The targets gtest and gtest_main are imported from the prebuilt libraries,
+  so adding the GoogleTest source folder as a subdirectory is skipped.
+- The precompiled header is included into the translation units of the
+  targets that link GoogleTest only, so it never changes what the code of the
+  students compiles against. The compiler only uses it if the build flags
+  match the ones it is built with and falls back to the plain header
+  otherwise. Without prebuilt GoogleTest no header is precompiled.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import weakref
+from os import path
+from shutil import rmtree
+
+from . import tools
+from .build_cache import compiler_version
+from .schema_tags import BuildTags
+
+log = logging.getLogger("GHC")
+
+CMAKE_INCLUDE_FILE = 'prebuilt.cmake'
+GTEST_FOLDER = 'gtest'
+PCH_FOLDER = 'pch'
+PCH_HEADER = 'ghc_pch.h'
+GTEST_LIBRARIES = ['libgtest.a', 'libgtest_main.a']
+
+GTEST_BUILD_CMD = "cmake {source_folder} && make"
+PCH_BUILD_CMD = "c++ -x c++-header {flags} {header} -o {header}.gch"
+
+# CMake includes the file after every call to project(), but commands must only
+# be redefined once, or add_subdirectory ends up calling itself.
+CMAKE_GUARD = """get_property(_ghc_included GLOBAL PROPERTY GHC_PREBUILT)
+if(_ghc_included)
+  return()
+endif()
+set_property(GLOBAL PROPERTY GHC_PREBUILT TRUE)
+"""
+CMAKE_GTEST_TEMPLATE = """find_package(Threads REQUIRED)
+if(NOT TARGET gtest)
+  add_library(gtest STATIC IMPORTED GLOBAL)
+  set_target_properties(gtest PROPERTIES
+    IMPORTED_LOCATION "{gtest_library}"
+    INTERFACE_LINK_LIBRARIES Threads::Threads)
+  add_library(gtest_main STATIC IMPORTED GLOBAL)
+  set_target_properties(gtest_main PROPERTIES
+    IMPORTED_LOCATION "{gtest_main_library}"
+    INTERFACE_LINK_LIBRARIES gtest)
+{precompiled_header}endif()
+macro(add_subdirectory source_dir)
+  get_filename_component(_ghc_source_dir "${{source_dir}}" REALPATH)
+  if(NOT _ghc_source_dir STREQUAL "{source_folder}")
+    _add_subdirectory(${{ARGV}})
+  endif()
+endmacro()
+"""
+CMAKE_PCH_TEMPLATE = """  set_property(TARGET gtest APPEND PROPERTY
+    INTERFACE_COMPILE_OPTIONS "SHELL:-include {header}")
+"""
+
+
+class Prebuilt:
+    """Dependencies built once and shared by the builds of all students."""
+
+    def __init__(self, prebuilt_plan, folder=None, jobserver=None):
+        """Initialize the dependencies without building them yet.
+
+        Args:
+            prebuilt_plan (PrebuiltPlan): dependencies to build
+            folder (str): folder to keep the built dependencies in between
+                runs, a temporary folder removed with this object by default
+            jobserver (JobServer): jobserver to build with
+        """
+        self._plan = prebuilt_plan
+        if folder:
+            tools.create_folder_if_needed(folder)
+        else:
+            folder = tempfile.mkdtemp(prefix='prebuilt_',
+                                      dir=tools.get_temp_dir())
+            weakref.finalize(self, rmtree, folder, True)
+        self._folder = folder
+        self._jobserver = jobserver
+        self._lock = threading.Lock()
+        self._cmake_args = None
+
+    def cmake_args(self):
+        """Get the arguments of cmake that make a build use the dependencies.
+
+        The dependencies are built on the first call. All other calls wait for
+        this and reuse them.
+
+        Returns:
+            str: arguments of cmake, empty if the dependencies cannot be built
+        """
+        with self._lock:
+            if self._cmake_args is None:
+                self._cmake_args = self.__build()
+        return self._cmake_args
+
+    def __key(self):
+        hasher = hashlib.sha256()
+        for value in [repr(tuple(self._plan)),
+                      compiler_version(BuildTags.CMAKE),
+                      CMAKE_GUARD, CMAKE_GTEST_TEMPLATE, CMAKE_PCH_TEMPLATE]:
+            hasher.update(value.encode('utf-8'))
+            hasher.update(b'\0')
+        return hasher.hexdigest()
+
+    def __build(self):
+        key_folder = path.join(self._folder, self.__key())
+        include_file = path.join(key_folder, CMAKE_INCLUDE_FILE)
+        if not path.exists(include_file):
+            # Build aside and move in place at once, so that other checkers
+            # never use half-built dependencies.
+            build_folder = tempfile.mkdtemp(prefix='.tmp_', dir=self._folder)
+            if not self.__build_all(build_folder):
+                rmtree(build_folder, ignore_errors=True)
+                return ''
+            try:
+                os.rename(build_folder, key_folder)
+            except OSError:
+                # Another checker has built the same dependencies.
+                rmtree(build_folder, ignore_errors=True)
+            self.__write_include_file(key_folder, include_file)
+        log.debug("Using prebuilt dependencies from '%s'.", key_folder)
+        return '-DCMAKE_PROJECT_INCLUDE={}'.format(include_file)
+
+    def __build_all(self, build_folder):
+        commands = []
+        if self._plan.gtest_folder:
+            commands.append((
+                GTEST_BUILD_CMD.format(source_folder=self._plan.gtest_folder),
+                path.join(build_folder, GTEST_FOLDER)))
+        if self._plan.gtest_folder and self._plan.headers:
+            pch_folder = path.join(build_folder, PCH_FOLDER)
+            tools.create_folder_if_needed(pch_folder)
+            with open(path.join(pch_folder, PCH_HEADER), 'w') as header:
+                for included in self._plan.headers:
+                    header.write('#include <{}>\n'.format(included))
+            commands.append((
+                PCH_BUILD_CMD.format(flags=self._plan.header_flags,
+                                     header=PCH_HEADER),
+                pch_folder))
+        for command, cwd in commands:
+            tools.create_folder_if_needed(cwd)
+            if self._jobserver:
+                result = self._jobserver.run(command, cwd=cwd, timeout=300)
+            else:
+                result = tools.run_command(command, cwd=cwd, timeout=300)
+            if not result.succeeded():
+                log.warning("Cannot prebuild dependencies, every student "
+                            "builds them instead: %s", result.stderr)
+                return False
+        if self._plan.gtest_folder and len(Prebuilt.__find_libraries(
+                path.join(build_folder, GTEST_FOLDER))) < len(GTEST_LIBRARIES):
+            log.warning("Cannot find the prebuilt GoogleTest libraries.")
+            return False
+        return True
+
+    def __write_include_file(self, key_folder, include_file):
+        contents = "# Generated by the homework checker.\n" + CMAKE_GUARD
+        if self._plan.gtest_folder:
+            libraries = Prebuilt.__find_libraries(
+                path.join(key_folder, GTEST_FOLDER))
+            precompiled_header = ''
+            if self._plan.headers:
+                precompiled_header = CMAKE_PCH_TEMPLATE.format(
+                    header=path.join(key_folder, PCH_FOLDER, PCH_HEADER))
+            contents += CMAKE_GTEST_TEMPLATE.format(
+                gtest_library=libraries[GTEST_LIBRARIES[0]],
+                gtest_main_library=libraries[GTEST_LIBRARIES[1]],
+                source_folder=self._plan.gtest_folder,
+                precompiled_header=precompiled_header)
+        with tempfile.NamedTemporaryFile('w', prefix='.tmp_', dir=key_folder,
+                                         delete=False) as stream:
+            stream.write(contents)
+        os.replace(stream.name, include_file)
+
+    @staticmethod
+    def __find_libraries(gtest_build_folder):
+        """Find the built libraries as their place differs between versions."""
+        libraries = {}
+        for root, _, files in os.walk(gtest_build_folder):
+            for file_name in files:
+                if file_name in GTEST_LIBRARIES:
+                    libraries[file_name] = path.join(root, file_name)
+        return libraries
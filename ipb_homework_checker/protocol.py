@@ -0,0 +1,32 @@
+"""Exchange messages between the processes of the checker over sockets.
+
+Every message is a json object on a line of its own, so that results can be
+streamed and read one message at a time.
+"""
+
+import json
+
+ENCODING = 'utf-8'
+
+
+def send_message(stream, message):
+    """Write a message to a binary stream and flush it.
+
+    Args:
+        stream: binary file-like object, e.g. from socket.makefile
+        message (dict): message that fits into json
+    """
+    stream.write(json.dumps(message).encode(ENCODING) + b'\n')
+    stream.flush()
+
+
+def read_message(stream):
+    """Read the next message from a binary stream.
+
+    Returns:
+        dict: the message or None once the stream is closed
+    """
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line.decode(ENCODING))
@@ -0,0 +1,88 @@
+"""Store the results of checked Tasks on disk to skip unchanged Tasks."""
+
+import hashlib
+import json
+import logging
+import tempfile
+from os import path, remove, replace
+
+from . import __version__
+from . import tools
+from .build_cache import compiler_version
+from .schema_tags import LangTags
+from .workspace import IGNORED_FOLDERS
+
+log = logging.getLogger("GHC")
+
+
+class ResultStore:
+    """A persistent store of Task results keyed by all the inputs of a Task.
+
+    The inputs of a Task are the contents of the student Task folder, the
+    validated job node of the Task as hashed by its plan, the contents of all
+    the folders it injects, the compiler version for C++ Tasks and the version
+    of this checker. Every entry is a json file named by the hash of these
+    inputs.
+    """
+
+    def __init__(self, store_folder):
+        """Initialize the store in a given folder."""
+        self._store_folder = store_folder
+        tools.create_folder_if_needed(store_folder)
+        # Injected folders belong to the job, so hash them once per run.
+        self._injected_hashes = {}
+
+    def key(self, task_plan, student_task_folder):
+        """Compute a key for the check of a Task.
+
+        Args:
+            task_plan (TaskPlan): plan of the Task
+            student_task_folder (str): folder with the code of the student
+        """
+        hasher = hashlib.sha256()
+        values = [tools.hash_folder(student_task_folder, IGNORED_FOLDERS),
+                  task_plan.node_hash,
+                  __version__]
+        if task_plan.language == LangTags.CPP:
+            values.append(compiler_version(task_plan.build_type))
+        for folder in task_plan.all_inject_folders:
+            values.append(self.__hash_injected(folder))
+        for value in values:
+            hasher.update(value.encode('utf-8'))
+            hasher.update(b'\0')
+        return hasher.hexdigest()
+
+    def load(self, key):
+        """Load the results of a Task.
+
+        Returns:
+            dict: results of the Task or None if there is no such entry.
+        """
+        entry_file = path.join(self._store_folder, key + '.json')
+        if not path.exists(entry_file):
+            return None
+        with open(entry_file, 'r') as stream:
+            results = {name: tools.CmdResult.from_dict(cmd_dict)
+                       for name, cmd_dict in json.load(stream)}
+        log.debug("Restored results '%s' from store.", key)
+        return results
+
+    def store(self, key, results):
+        """Store the results of a Task."""
+        entry_file = path.join(self._store_folder, key + '.json')
+        # Write the entry aside and move it in place at once, so that other
+        # checkers never see a half-written entry.
+        with tempfile.NamedTemporaryFile(
+                'w', prefix='.tmp_', dir=self._store_folder,
+                delete=False) as stream:
+            json.dump([[name, cmd_result.to_dict()]
+                       for name, cmd_result in results.items()], stream)
+        try:
+            replace(stream.name, entry_file)
+        except OSError:
+            remove(stream.name)
+
+    def __hash_injected(self, folder):
+        if folder not in self._injected_hashes:
+            self._injected_hashes[folder] = tools.hash_folder(folder)
+        return self._injected_hashes[folder]
@@ -0,0 +1,268 @@
+"""Write test results in machine readable formats next to the md report.
+
+All writers take the results as returned by Checker.check_homework, that is
+{homework: {Task: {test: CmdResult}}} with the EXPIRED_TAG set for expired
+homeworks.
+"""
+
+import json
+import re
+import sqlite3
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime
+
+from .tools import CmdResult, EXPIRED_TAG
+
+# Characters that are not allowed in XML 1.0.
+XML_INVALID_REGEX = re.compile(
+    r"[^\x09\x0A\x0D\x20-\uD7FF\uE000-\uFFFD\U00010000-\U0010FFFF]")
+
+CREATE_TABLE_QUERY = """CREATE TABLE IF NOT EXISTS results (
+    run_time TEXT NOT NULL,
+    student TEXT NOT NULL,
+    homework TEXT NOT NULL,
+    task TEXT NOT NULL,
+    test TEXT NOT NULL,
+    expired INTEGER NOT NULL,
+    succeeded INTEGER NOT NULL,
+    returncode INTEGER,
+    stdout TEXT,
+    stderr TEXT,
+    truncated INTEGER,
+    wall_time REAL,
+    cpu_time REAL,
+    peak_rss_kb INTEGER,
+    skipped INTEGER)"""
+# Columns added after the table was first created by older versions.
+ADDED_COLUMNS = [('skipped', 'INTEGER')]
+CREATE_INDEX_QUERIES = [
+    "CREATE INDEX IF NOT EXISTS results_by_student "
+    "ON results (student, homework, task, test, run_time)",
+    "CREATE INDEX IF NOT EXISTS results_by_test "
+    "ON results (homework, task, test, run_time)",
+    "CREATE INDEX IF NOT EXISTS results_by_run_time ON results (run_time)",
+]
+INSERT_QUERY = """INSERT INTO results (
+    run_time, student, homework, task, test, expired, succeeded, returncode,
+    stdout, stderr, truncated, wall_time, cpu_time, peak_rss_kb, skipped)
+VALUES (
+    :run_time, :student, :homework, :task, :test, :expired, :succeeded,
+    :returncode, :stdout, :stderr, :truncated, :wall_time, :cpu_time,
+    :peak_rss_kb, :skipped)"""
+COLUMNS = ['run_time', 'student', 'homework', 'task', 'test']
+
+
+def _iterate_tests(hw_results):
+    """Go over all tests of all Tasks in a stable order.
+
+    Yields:
+        (str, str, str, CmdResult, bool): names of the homework, Task and test
+            along with the result of the test and if the homework is expired
+    """
+    for hw_name, hw_dict in sorted(hw_results.items()):
+        expired = EXPIRED_TAG in hw_dict
+        for task_name, task_dict in sorted(hw_dict.items()):
+            if task_name == EXPIRED_TAG:
+                continue
+            for test_name, test_result in sorted(task_dict.items()):
+                yield hw_name, task_name, test_name, test_result, expired
+
+
+def results_to_dict(hw_results):
+    """Convert the results of homeworks to plain dicts that fit into json."""
+    return {hw_name: {
+        task_name: task_dict if task_name == EXPIRED_TAG else {
+            test_name: test_result.to_dict()
+            for test_name, test_result in task_dict.items()}
+        for task_name, task_dict in hw_dict.items()}
+        for hw_name, hw_dict in hw_results.items()}
+
+
+def results_from_dict(json_results):
+    """Convert the results of homeworks back from plain dicts."""
+    return {hw_name: {
+        task_name: task_dict if task_name == EXPIRED_TAG else {
+            test_name: CmdResult.from_dict(cmd_dict)
+            for test_name, cmd_dict in task_dict.items()}
+        for task_name, task_dict in hw_dict.items()}
+        for hw_name, hw_dict in json_results.items()}
+
+
+class JsonWriter:
+    """Write the results into a json file."""
+    EXTENSION = '.json'
+
+    def __init__(self):
+        """Initialize the writer."""
+        self._results = {}
+
+    def update(self, hw_results):
+        """Add the results of homeworks."""
+        for hw_name, json_hw_dict in results_to_dict(hw_results).items():
+            self._results.setdefault(hw_name, {}).update(json_hw_dict)
+
+    def write_file(self, file_path):
+        """Write all the added results to the json file."""
+        with open(file_path, 'w', encoding='utf-8') as json_file:
+            json.dump(self._results, json_file, indent=2, sort_keys=True)
+
+    @staticmethod
+    def read_file(file_path):
+        """Read the results back from a json file.
+
+        Returns:
+            dict: results in the same form as given to update
+        """
+        with open(file_path, 'r', encoding='utf-8') as json_file:
+            return results_from_dict(json.load(json_file))
+
+
+class JUnitWriter:
+    """Write the results into a JUnit XML file for CI dashboards.
+
+    Every Task becomes a test suite and every test a test case of it.
+    """
+    EXTENSION = '.xml'
+
+    def __init__(self):
+        """Initialize the writer."""
+        self._root = ElementTree.Element('testsuites')
+        self._suites = {}
+
+    def update(self, hw_results):
+        """Add the results of homeworks."""
+        for hw_name, task_name, test_name, test_result, expired in \
+                _iterate_tests(hw_results):
+            suite = self.__suite(hw_name, task_name, expired)
+            suite.set('tests', str(int(suite.get('tests')) + 1))
+            case = ElementTree.SubElement(suite, 'testcase', {
+                'classname': '{}.{}'.format(hw_name, task_name),
+                'name': test_name})
+            if test_result.wall_time is not None:
+                case.set('time', '{:.3f}'.format(test_result.wall_time))
+            if test_result.skipped:
+                suite.set('skipped', str(int(suite.get('skipped')) + 1))
+                ElementTree.SubElement(case, 'skipped', {
+                    'message': test_result.stderr})
+            elif not test_result.succeeded():
+                suite.set('failures', str(int(suite.get('failures')) + 1))
+                failure = ElementTree.SubElement(case, 'failure', {
+                    'message': 'returncode: {}'.format(
+                        test_result.returncode)})
+                failure.text = JUnitWriter.__text(test_result.stderr)
+            if test_result.stdout:
+                ElementTree.SubElement(case, 'system-out').text = \
+                    JUnitWriter.__text(test_result.stdout)
+
+    def write_file(self, file_path):
+        """Write all the added results to the xml file."""
+        ElementTree.ElementTree(self._root).write(
+            file_path, encoding='utf-8', xml_declaration=True)
+
+    def __suite(self, hw_name, task_name, expired):
+        key = (hw_name, task_name)
+        if key not in self._suites:
+            suite = ElementTree.SubElement(self._root, 'testsuite', {
+                'name': '{}/{}'.format(hw_name, task_name),
+                'tests': '0',
+                'failures': '0',
+                'skipped': '0'})
+            if expired:
+                properties = ElementTree.SubElement(suite, 'properties')
+                ElementTree.SubElement(properties, 'property', {
+                    'name': EXPIRED_TAG, 'value': 'true'})
+            self._suites[key] = suite
+        return self._suites[key]
+
+    @staticmethod
+    def __text(output):
+        if not output:
+            return ''
+        return XML_INVALID_REGEX.sub('', output)
+
+
+class SqliteWriter:
+    """Add the results of every run into a SQLite database.
+
+    Every test of every student is a row indexed by student, homework, Task,
+    test and the time of the run, so results of many runs can be queried
+    without parsing any reports.
+    """
+
+    def __init__(self, db_file, run_time=None):
+        """Open the database and create the table if needed.
+
+        Args:
+            db_file (str): path to the database file
+            run_time (datetime): time of this run, now by default
+        """
+        if run_time is None:
+            run_time = datetime.now()
+        self._run_time = run_time.isoformat(sep=' ', timespec='seconds')
+        self._connection = sqlite3.connect(db_file)
+        with self._connection:
+            self._connection.execute(CREATE_TABLE_QUERY)
+            columns = [row[1] for row in self._connection.execute(
+                "PRAGMA table_info(results)")]
+            for column, column_type in ADDED_COLUMNS:
+                if column not in columns:
+                    self._connection.execute(
+                        "ALTER TABLE results ADD COLUMN {} {}".format(
+                            column, column_type))
+            for query in CREATE_INDEX_QUERIES:
+                self._connection.execute(query)
+
+    def update(self, student_name, hw_results):
+        """Add the results of a student."""
+        with self._connection:
+            self._connection.executemany(INSERT_QUERY, (
+                {'run_time': self._run_time,
+                 'student': student_name,
+                 'homework': hw_name,
+                 'task': task_name,
+                 'test': test_name,
+                 'expired': expired,
+                 'succeeded': test_result.succeeded(),
+                 'returncode': test_result.returncode,
+                 'stdout': test_result.stdout,
+                 'stderr': test_result.stderr,
+                 'truncated': test_result.truncated,
+                 'wall_time': test_result.wall_time,
+                 'cpu_time': test_result.cpu_time,
+                 'peak_rss_kb': test_result.peak_rss_kb,
+                 'skipped': test_result.skipped}
+                for hw_name, task_name, test_name, test_result, expired
+                in _iterate_tests(hw_results)))
+
+    def find(self, **filters):
+        """Find the rows that match all the filters.
+
+        Args:
+            filters: values of any of the run_time, student, homework, task
+                and test columns
+
+        Returns:
+            list: rows as sqlite3.Row objects ordered by run time
+        """
+        unknown = set(filters) - set(COLUMNS)
+        if unknown:
+            raise ValueError("Cannot filter by {}.".format(sorted(unknown)))
+        query = "SELECT * FROM results"
+        if filters:
+            query += " WHERE " + " AND ".join(
+                "{} = :{}".format(column, column)
+                for column in sorted(filters))
+        query += " ORDER BY run_time, student, homework, task, test"
+        self._connection.row_factory = sqlite3.Row
+        return self._connection.execute(query, filters).fetchall()
+
+    def close(self):
+        """Close the database."""
+        self._connection.close()
+
+
+# Writers of a whole report by the name of the format.
+WRITERS = {
+    'json': JsonWriter,
+    'junit': JUnitWriter,
+}
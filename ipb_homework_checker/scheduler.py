@@ -0,0 +1,156 @@
+"""Schedule the stages of many Tasks under separate budgets."""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from time import monotonic
+
+
+class StageBudgets:
+    """Bound the number of builds and tests that run at the same time.
+
+    The stages of a Task depend on each other: inject, build, test, style and
+    revert. The stages of different Tasks do not, so a Task may build while
+    another one runs its tests. Builds and tests take a slot of their own
+    budget, all other stages are cheap and run right away. A budget of None
+    is not bounded.
+    """
+
+    BUILD = 'build'
+    TEST = 'test'
+
+    def __init__(self, build_jobs=None, test_jobs=None):
+        """Create the budgets.
+
+        Args:
+            build_jobs (int): number of builds running at the same time
+            test_jobs (int): number of tests running at the same time
+        """
+        self._jobs = {StageBudgets.BUILD: build_jobs,
+                      StageBudgets.TEST: test_jobs}
+        self._slots = {
+            stage: threading.BoundedSemaphore(jobs)
+            for stage, jobs in self._jobs.items() if jobs}
+
+    @contextmanager
+    def slot(self, stage):
+        """Wait for a free slot for a stage and hold it within the context."""
+        if stage not in self._slots:
+            yield
+            return
+        with self._slots[stage]:
+            yield
+
+
+class TimeBudget:
+    """Bound the wall time that Tasks or tests may spend together.
+
+    The clock starts when the first one of them starts, so the time spent
+    waiting in a queue does not count. Nothing new should start once the
+    budget is spent. A budget of None is never spent.
+    """
+
+    def __init__(self, seconds=None):
+        """Create the budget.
+
+        Args:
+            seconds (float): number of seconds to spend
+        """
+        self._seconds = seconds
+        self._deadline = None
+        self._lock = threading.Lock()
+
+    @property
+    def seconds(self):
+        """Get the number of seconds to spend."""
+        return self._seconds
+
+    def start(self):
+        """Start the clock if it is not running yet."""
+        with self._lock:
+            if self._deadline is None and self._seconds is not None:
+                self._deadline = monotonic() + self._seconds
+
+    def spent(self):
+        """Check if the budget is spent."""
+        return self._deadline is not None and monotonic() >= self._deadline
+
+    def remaining(self):
+        """Get the number of seconds left, None if the clock is not running."""
+        if self._deadline is None:
+            return None
+        return max(0.0, self._deadline - monotonic())
+
+
+class PipelineExecutor:
+    """Check every Task in two stages, each in a pool of threads of its own.
+
+    A Task is built in a thread of the build pool and then handed over to the
+    queue of the test pool, which runs its tests. The wall time of a check
+    then approaches the critical path through the stages instead of the sum
+    of all of them.
+
+    There are as many threads in every pool as there are slots in its budget.
+    A Task that waits for its tests never holds a build thread, so no build
+    slot stays free while a Task waits to be built. Google tests that rebuild
+    the code wait for a build slot in a test thread, but builds never wait
+    for tests, so this never deadlocks.
+    """
+
+    def __init__(self, build_jobs, test_jobs):
+        """Create the budgets and the pools of threads of both stages."""
+        self._budgets = StageBudgets(build_jobs, test_jobs)
+        self._build_pool = ThreadPoolExecutor(max_workers=build_jobs)
+        self._test_pool = ThreadPoolExecutor(max_workers=test_jobs)
+
+    def __enter__(self):
+        """Use the executor within a context."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Wait for all Tasks to finish."""
+        self.shutdown()
+        return False
+
+    @property
+    def budgets(self):
+        """Get the budgets shared by all Tasks of this executor."""
+        return self._budgets
+
+    def submit(self, build_stage, test_stage, *args, **kwargs):
+        """Run the stages of a Task one after the other.
+
+        Args:
+            build_stage (callable): called with the args in a build thread
+            test_stage (callable): called with the result of the build stage
+                in a test thread
+
+        Returns:
+            Future: the result of the test stage
+        """
+        future = Future()
+
+        def run_test_stage(build_state):
+            try:
+                future.set_result(test_stage(build_state))
+            except BaseException as error:
+                future.set_exception(error)
+
+        def run_build_stage():
+            try:
+                build_state = build_stage(*args, **kwargs)
+            except BaseException as error:
+                future.set_exception(error)
+                return
+            self._test_pool.submit(run_test_stage, build_state)
+
+        self._build_pool.submit(run_build_stage)
+        return future
+
+    def shutdown(self):
+        """Free the threads once all submitted Tasks are done.
+
+        The builds go first, as they hand their Tasks over to the test pool.
+        """
+        self._build_pool.shutdown()
+        self._test_pool.shutdown()
@@ -1,33 +1,65 @@
 """Manage creation of schema."""
 import sys
+import hashlib
+import json
 import logging
 import operator
-from os import path
+import tempfile
+from os import path, environ, makedirs, replace
+from time import monotonic
 from schema import Schema, SchemaError, Or, Optional
 from ruamel.yaml import YAML
 from ruamel.yaml.comments import CommentedMap, CommentedSeq
 
+from . import __version__
 from .tools import MAX_DATE_STR
-from .schema_tags import Tags, OutputTags, BuildTags, LangTags
+from .schema_tags import Tags, OutputTags, BuildTags, LangTags, LimitTags
+from .schema_tags import PrebuiltTags
 
 log = logging.getLogger("GHC")
 
 SCHEMA_FILE = path.join(path.dirname(
     path.dirname(__file__)), "schema", "schema.yml")
 
+# Set this environment variable to keep the schema file up to date.
+DEVELOPER_MODE_ENV = "IPB_HOMEWORK_CHECKER_DEVELOPER"
+
+# Files that define how a job file is validated.
+SCHEMA_SOURCES = [__file__,
+                  path.join(path.dirname(__file__), "schema_tags.py")]
+
 
 class SchemaManager:
     """Manage schema creation."""
 
-    def __init__(self, file_name):
-        """Create a schema for my tests."""
+    def __init__(self, file_name, cache_folder=None, write_schema=None):
+        """Create a schema for my tests and validate the job file with it.
+
+        Args:
+            file_name (str): path to the *.yml job file
+            cache_folder (str): folder to keep validated jobs in, a job file
+                that did not change is not parsed again
+            write_schema (bool): write the schema file, by default only if
+                the developer mode environment variable is set
+        """
+        limits = {
+            Optional(LimitTags.CPU_SECONDS): Or(int, float),
+            Optional(LimitTags.ADDRESS_SPACE_MB): int,
+            Optional(LimitTags.OPEN_FILES): int,
+        }
         self.__schema = Schema({
             Tags.FOLDER_TAG: str,
+            Optional(Tags.PREBUILT_TAG): {
+                Optional(PrebuiltTags.GTEST_FOLDER): str,
+                Optional(PrebuiltTags.HEADERS): [str],
+                Optional(PrebuiltTags.HEADER_FLAGS, default=""): str,
+            },
             Tags.HOMEWORKS_TAG: [{
                 Tags.NAME_TAG: str,
                 Tags.FOLDER_TAG: str,
                 Optional(Tags.DEADLINE_TAG,
                          default=MAX_DATE_STR): str,
+                Optional(Tags.TIME_BUDGET_TAG): Or(int, float),
                 Tags.TASKS_TAG: [{
                     Tags.NAME_TAG: str,
                     Tags.LANGUAGE_TAG: Or(LangTags.CPP, LangTags.BASH),
@@ -42,39 +74,108 @@ class SchemaManager:
                              default=BuildTags.CMAKE): Or(BuildTags.CMAKE,
                                                           BuildTags.SIMPLE),
                     Optional(Tags.INJECT_FOLDER_TAG): [str],
+                    Optional(Tags.LIMITS_TAG): limits,
+                    Optional(Tags.STREAM_OUTPUT_TAG, default=False): bool,
+                    Optional(Tags.FAIL_FAST_TAG): int,
+                    Optional(Tags.SKIP_ON_CRASH_TAG, default=False): bool,
+                    Optional(Tags.TIME_BUDGET_TAG): Or(int, float),
                     Optional(Tags.TESTS_TAG): [{
                         Tags.NAME_TAG: str,
                         Optional(Tags.INPUT_TAG): str,
                         Optional(Tags.INJECT_FOLDER_TAG): [str],
+                        Optional(Tags.LIMITS_TAG): limits,
                         Optional(Tags.RUN_GTESTS_TAG, default=False): bool,
                         Optional(Tags.EXPECTED_OUTPUT_TAG): Or(str, float, int)
                     }]
                 }]
             }]
         })
-        yaml = YAML()
-        yaml.width = 4096  # big enough value to prevent wrapping
-        yaml.explicit_start = True
-        yaml.indent(mapping=2, sequence=4, offset=2)
-        with open(file_name, 'r') as stream:
-            contents = SchemaManager.__to_simple_dict(yaml.load(stream))
-            try:
-                self.__validated_yaml = self.__schema.validate(contents)
-            except SchemaError as exc:
-                sys.exit(exc.code)
-        # Write the schema every time we run this code while developing. We
-        # don't want to run this when the package is installed as this we won't
-        # have the permission. This is intended to keep the schema file up to
-        # date when we add new stuff to it.
+        started = monotonic()
+        with open(file_name, 'rb') as stream:
+            contents = stream.read()
+        cache_file = None
+        if cache_folder:
+            makedirs(cache_folder, exist_ok=True)
+            cache_file = path.join(
+                cache_folder, SchemaManager.__job_key(contents) + '.json')
+        self.__validated_yaml = SchemaManager.__load_cached(cache_file)
+        if self.__validated_yaml is None:
+            self.__validated_yaml = self.__validate(contents)
+            SchemaManager.__store_cached(cache_file, self.__validated_yaml)
+        log.debug("Loaded job '%s' in %.3f seconds.",
+                  file_name, monotonic() - started)
+        if write_schema is None:
+            write_schema = bool(environ.get(DEVELOPER_MODE_ENV))
+        if write_schema:
+            self.write_schema_file()
+
+    def write_schema_file(self):
+        """Write the schema into the schema file of this repository.
+
+        We only do this while developing to keep the schema file up to date
+        when we add new stuff to it. We won't have the permission to do this
+        when the package is installed.
+        """
         try:
             with open(SCHEMA_FILE, 'w') as outfile:
                 str_dict = SchemaManager.__sanitize_value(
                     self.__schema._schema)
-                yaml.dump(str_dict, outfile)
+                SchemaManager.__create_yaml().dump(str_dict, outfile)
         except OSError:
             log.debug(
                 "Cannot write schema file. We only use this while developing.")
 
+    def __validate(self, contents):
+        """Parse the job and validate it against the schema."""
+        yaml = SchemaManager.__create_yaml()
+        yaml_dict = yaml.load(contents.decode('utf-8'))
+        contents = SchemaManager.__to_simple_dict(yaml_dict)
+        try:
+            return self.__schema.validate(contents)
+        except SchemaError as exc:
+            sys.exit(exc.code)
+
+    @staticmethod
+    def __create_yaml():
+        yaml = YAML()
+        yaml.width = 4096  # big enough value to prevent wrapping
+        yaml.explicit_start = True
+        yaml.indent(mapping=2, sequence=4, offset=2)
+        return yaml
+
+    @staticmethod
+    def __job_key(contents):
+        """Compute a key of a validated job.
+
+        The validated job depends on the job file, on the schema and on the
+        code that converts the job, so all of these are part of the key.
+        """
+        hasher = hashlib.sha256(contents)
+        for source_file in SCHEMA_SOURCES:
+            with open(source_file, 'rb') as stream:
+                hasher.update(stream.read())
+        hasher.update(__version__.encode('utf-8'))
+        return hasher.hexdigest()
+
+    @staticmethod
+    def __load_cached(cache_file):
+        if not cache_file or not path.exists(cache_file):
+            return None
+        with open(cache_file, 'r') as stream:
+            return json.load(stream)
+
+    @staticmethod
+    def __store_cached(cache_file, validated_yaml):
+        if not cache_file:
+            return
+        # Write the file aside and move it in place at once, so that other
+        # checkers never read a half-written file.
+        with tempfile.NamedTemporaryFile('w', prefix='.tmp_',
+                                         dir=path.dirname(cache_file),
+                                         delete=False) as stream:
+            json.dump(validated_yaml, stream)
+        replace(stream.name, cache_file)
+
     def __to_simple_list(commented_seq):
         simple_list = []
         for value in commented_seq:
@@ -8,17 +8,23 @@ class Tags:
     COMPILER_FLAGS_TAG = 'compiler_flags'
     DEADLINE_TAG = 'submit_by'
     EXPECTED_OUTPUT_TAG = 'expected_output'
+    FAIL_FAST_TAG = 'fail_fast'
     FOLDER_TAG = 'folder'
     HOMEWORKS_TAG = 'homeworks'
     INJECT_FOLDER_TAG = 'inject_folders'
     INPUT_TAG = 'input_args'
     LANGUAGE_TAG = 'language'
+    LIMITS_TAG = 'limits'
     NAME_TAG = 'name'
     OUTPUT_TYPE_TAG = 'output_type'
     PIPE_TAG = 'pipe_through'
+    PREBUILT_TAG = 'prebuilt'
     RUN_GTESTS_TAG = 'run_google_tests'
+    SKIP_ON_CRASH_TAG = 'skip_on_crash'
+    STREAM_OUTPUT_TAG = 'stream_output'
     TASKS_TAG = 'tasks'
     TESTS_TAG = 'tests'
+    TIME_BUDGET_TAG = 'time_budget_seconds'
 
 
 class OutputTags:
@@ -28,6 +34,21 @@ class OutputTags:
     ALL = [STRING, NUMBER]
 
 
+class LimitTags:
+    """Define tags for resource limits."""
+    CPU_SECONDS = 'cpu_seconds'
+    ADDRESS_SPACE_MB = 'address_space_mb'
+    OPEN_FILES = 'open_files'
+    ALL = [CPU_SECONDS, ADDRESS_SPACE_MB, OPEN_FILES]
+
+
+class PrebuiltTags:
+    """Define tags for dependencies prebuilt for all students."""
+    GTEST_FOLDER = 'gtest_folder'
+    HEADERS = 'precompiled_headers'
+    HEADER_FLAGS = 'precompiled_header_flags'
+
+
 class BuildTags:
     """Define tags for build types."""
     CMAKE = 'cmake'
@@ -0,0 +1,226 @@
+"""Check the code style of C++ files with cpplint."""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from os import path
+
+from . import tools
+from .workspace import IGNORED_FOLDERS
+
+log = logging.getLogger("GHC")
+
+CPPLINT_CMD = "cpplint --counting=detailed --filter={filters} {files}"
+CPPLINT_FILTERS = ["-legal",
+                   "-readability/todo",
+                   "-build/include_order",
+                   "-runtime/threadsafe_fn",
+                   "-runtime/arrays"]
+CPP_EXTENSIONS = (".h", ".cpp")
+# Header guards depend on the path of a header within its repository.
+HEADER_EXTENSIONS = (".h",)
+# Folders that mark the root of a repository for cpplint.
+REPOSITORY_MARKERS = (".git", ".hg", ".svn")
+
+ERROR_REGEX = re.compile(r"^(?P<file>.+?):\d+:\s.*\[(?P<category>[^\]]+)\] "
+                         r"\[\d\]$")
+CATEGORY_TEMPLATE = "Category '{category}' errors found: {count}\n"
+TOTAL_TEMPLATE = "Total errors found: {count}\n"
+DONE_TEMPLATE = "Done processing {file}\n"
+
+
+@lru_cache(maxsize=None)
+def cpplint_version():
+    """Get the version string of cpplint."""
+    result = tools.run_command("cpplint --version")
+    return "{}{}".format(result.stdout, result.stderr)
+
+
+class StyleChecker:
+    """Lint C++ files with cpplint in parallel and cache it for every file.
+
+    Every file is linted on its own, so the errors of a file only depend on
+    its contents, its path and the cpplint setup. The files are fanned out
+    to many cpplint processes and the errors of every file are cached in
+    memory and, if a cache folder is given, on disk.
+    """
+
+    def __init__(self, jobs=None, cache_folder=None):
+        """Initialize the style checker.
+
+        Args:
+            jobs (int): number of cpplint processes to run at the same time,
+                the number of cores by default
+            cache_folder (str): folder to keep the errors of every file in
+        """
+        self._jobs = jobs or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(max_workers=self._jobs)
+        self._cache_folder = cache_folder
+        if cache_folder:
+            tools.create_folder_if_needed(cache_folder)
+        self._cached_errors = {}
+
+    def close(self):
+        """Stop the threads that run cpplint."""
+        self._executor.shutdown()
+
+    def check(self, folder):
+        """Lint all C++ files within a folder.
+
+        The folder must be the original student folder and not a copy of it,
+        as cpplint expects header guards that match the path of a header
+        within its repository.
+
+        Returns:
+            CmdResult: the errors along with the error counts in the same form
+                as a single cpplint run over all the files or None if there
+                are no errors or cpplint cannot be run.
+        """
+        file_names = StyleChecker.__find_files(folder)
+        keys = {file_name: self.__key(folder, file_name)
+                for file_name in file_names}
+        errors = {}
+        for file_name, key in keys.items():
+            cached_errors = self.__load(key)
+            if cached_errors is not None:
+                errors[file_name] = cached_errors
+        not_linted = [file_name for file_name in file_names
+                      if file_name not in errors]
+        chunks = [not_linted[i::self._jobs] for i in range(self._jobs)]
+        futures = [self._executor.submit(StyleChecker.__lint, folder, chunk)
+                   for chunk in chunks if chunk]
+        for future in futures:
+            linted_errors = future.result()
+            if linted_errors is None:
+                return None
+            for file_name, file_errors in linted_errors.items():
+                self.__store(keys[file_name], file_errors)
+                errors[file_name] = file_errors
+        return StyleChecker.__aggregate(file_names, errors)
+
+    @staticmethod
+    def __find_files(folder):
+        """Find C++ files just like 'find .' would name them."""
+        file_names = []
+        for root, dirs, files in os.walk(folder):
+            rel_root = path.relpath(root, folder)
+            if rel_root == path.curdir:
+                dirs[:] = [d for d in dirs if d not in IGNORED_FOLDERS]
+            for file_name in files:
+                if file_name.endswith(CPP_EXTENSIONS):
+                    file_names.append(path.join(
+                        path.curdir, path.normpath(path.join(rel_root,
+                                                             file_name))))
+        return sorted(file_names)
+
+    def __key(self, folder, file_name):
+        hasher = hashlib.sha256()
+        location = file_name
+        if file_name.endswith(HEADER_EXTENSIONS):
+            location = StyleChecker.__repository_name(
+                path.join(folder, file_name))
+        for value in [location,
+                      ','.join(CPPLINT_FILTERS),
+                      cpplint_version()]:
+            hasher.update(value.encode('utf-8'))
+            hasher.update(b'\0')
+        with open(path.join(folder, file_name), 'rb') as stream:
+            hasher.update(stream.read())
+        return hasher.hexdigest()
+
+    @staticmethod
+    def __repository_name(file_path):
+        """Get the path of a file within its repository as cpplint does.
+
+        Just like cpplint, this is the path relative to the outermost folder
+        that holds a repository or the absolute path if there is none.
+        """
+        file_path = path.abspath(file_path)
+        root_folder = None
+        folder = path.dirname(file_path)
+        while folder != path.dirname(folder):
+            if any(path.exists(path.join(folder, marker))
+                   for marker in REPOSITORY_MARKERS):
+                root_folder = folder
+            folder = path.dirname(folder)
+        if not root_folder:
+            return file_path
+        return path.relpath(file_path, root_folder)
+
+    def __load(self, key):
+        if key in self._cached_errors:
+            return self._cached_errors[key]
+        if not self._cache_folder:
+            return None
+        entry_file = path.join(self._cache_folder, key + '.json')
+        if not path.exists(entry_file):
+            return None
+        with open(entry_file, 'r') as stream:
+            file_errors = json.load(stream)
+        self._cached_errors[key] = file_errors
+        return file_errors
+
+    def __store(self, key, file_errors):
+        self._cached_errors[key] = file_errors
+        if not self._cache_folder:
+            return
+        # Write the entry aside and move it in place at once, so that other
+        # checkers never see a half-written entry.
+        with tempfile.NamedTemporaryFile(
+                'w', prefix='.tmp_', dir=self._cache_folder,
+                delete=False) as stream:
+            json.dump(file_errors, stream)
+        os.replace(stream.name, path.join(self._cache_folder, key + '.json'))
+
+    @staticmethod
+    def __lint(folder, file_names):
+        """Run cpplint on some files and get the error lines of every file.
+
+        Returns:
+            dict: error lines of every file or None if cpplint has failed
+        """
+        command = CPPLINT_CMD.format(filters=','.join(CPPLINT_FILTERS),
+                                     files=' '.join(file_names))
+        result = tools.run_command(command, cwd=folder)
+        if result.returncode not in [0, 1]:
+            log.warning("Cannot run cpplint: %s", result.stderr)
+            return None
+        errors = {file_name: [] for file_name in file_names}
+        output = "{}{}".format(result.stdout, result.stderr)
+        for line in output.splitlines():
+            match = ERROR_REGEX.match(line)
+            if match and match.group('file') in errors:
+                errors[match.group('file')].append(line)
+        return errors
+
+    @staticmethod
+    def __aggregate(file_names, errors):
+        """Combine the errors of all files like a single cpplint run does."""
+        category_counts = {}
+        stderr = ''
+        stdout = ''
+        for file_name in file_names:
+            for line in errors[file_name]:
+                stderr += line + '\n'
+                category = ERROR_REGEX.match(line).group('category')
+                category_counts[category] = category_counts.get(category,
+                                                                0) + 1
+            stdout += DONE_TEMPLATE.format(file=file_name)
+        total_count = sum(category_counts.values())
+        if not total_count:
+            return None
+        for category, count in sorted(category_counts.items()):
+            stderr += CATEGORY_TEMPLATE.format(category=category, count=count)
+        stderr += TOTAL_TEMPLATE.format(count=total_count)
+        return tools.CmdResult(returncode=1, stdout=stdout, stderr=stderr)
+
+
+@lru_cache(maxsize=None)
+def default_style_checker():
+    """Get the style checker shared by all Tasks without one of their own."""
+    return StyleChecker()
@@ -1,10 +1,19 @@
 """Different types of Tasks."""
 
+import asyncio
 import logging
+import os
+from itertools import groupby
 from os import path
+from shutil import rmtree
 
 from . import tools
-from .schema_tags import Tags, LangTags, BuildTags
+from .jobserver import default_jobserver
+from .plan import compile_task
+from .scheduler import StageBudgets, TimeBudget
+from .schema_tags import LangTags, BuildTags
+from .style_checker import default_style_checker
+from .workspace import Workspace
 
 
 log = logging.getLogger("GHC")
@@ -14,119 +23,362 @@ OUTPUT_MISMATCH_MESSAGE = """Given input: '{input}'
 Your output '{actual}'
 Expected output: '{expected}'"""
 
+# Seconds a test may run unless the time budgets have less time left.
+TEST_TIMEOUT = 20
+GOOGLE_TESTS_TIMEOUT = 60
+
 BUILD_SUCCESS_TAG = "0. Build succeeded"
 STYLE_ERROR_TAG = "0. Style errors"
 
 
 class Task:
     """Define an abstract Task."""
-    BACKUP_FOLDER = '.backup'
 
     @staticmethod
-    def from_yaml_node(task_node, student_hw_folder, job_file):
-        """Create an Task appropriate for the language."""
-        student_task_folder = path.join(
-            student_hw_folder, task_node[Tags.FOLDER_TAG])
+    def from_yaml_node(task_node, student_hw_folder, job_file,
+                       workspace_root=None, build_cache=None,
+                       style_checker=None, budgets=None, jobserver=None,
+                       prebuilt=None, time_budget=None, scratch=None,
+                       configure_cache=None):
+        """Create an Task appropriate for the language from a job node.
+
+        The node is compiled into a plan first, see Task.from_plan.
+        """
+        return Task.from_plan(compile_task(task_node, job_file),
+                              student_hw_folder, job_file,
+                              workspace_root, build_cache, style_checker,
+                              budgets, jobserver, prebuilt, time_budget,
+                              scratch, configure_cache)
+
+    @staticmethod
+    def from_plan(task_plan, student_hw_folder, job_file,
+                  workspace_root=None, build_cache=None, style_checker=None,
+                  budgets=None, jobserver=None, prebuilt=None,
+                  time_budget=None, scratch=None, configure_cache=None):
+        """Create an Task appropriate for the language.
+
+        The Task works in a private workspace created by the ScratchSpace if
+        given or else within workspace_root, which defaults to the temporary
+        folder of this package. If build_cache
+        is given, builds are restored from it whenever possible. C++ code is
+        linted by style_checker, which is meant to be shared between Tasks,
+        or else by one style checker for all Tasks without one.
+        Builds and tests wait for a slot of the StageBudgets if given. C++
+        builds share the compile jobs of the jobserver and CMake builds use
+        the prebuilt dependencies if given. CMake build folders are seeded
+        from the configure_cache if given. No new tests start once the
+        TimeBudget of the homework is spent if given.
+        """
+        student_task_folder = path.join(student_hw_folder, task_plan.folder)
         if not path.exists(student_task_folder):
             log.warning("Folder '%s' does not exist. Skipping.",
                         student_task_folder)
             return None
-        language_tag = task_node[Tags.LANGUAGE_TAG]
-        if language_tag == LangTags.CPP:
-            return CppTask(task_node, student_task_folder, job_file)
-        elif language_tag == LangTags.BASH:
-            return BashTask(task_node, student_task_folder, job_file)
+        if task_plan.language == LangTags.CPP:
+            return CppTask(task_plan, student_task_folder, job_file,
+                           workspace_root, build_cache, style_checker,
+                           budgets, jobserver, prebuilt, time_budget,
+                           scratch, configure_cache)
+        elif task_plan.language == LangTags.BASH:
+            return BashTask(task_plan, student_task_folder, job_file,
+                            workspace_root, budgets, time_budget, scratch)
         else:
             log.error("Unknown Task language.")
             return None
 
-    def __init__(self, task_node, student_task_folder, job_file):
+    def __init__(self, task_plan, student_task_folder, job_file,
+                 workspace_root=None, budgets=None, time_budget=None,
+                 scratch=None):
         """Initialize a generic Task."""
-        self.name = task_node[Tags.NAME_TAG]
+        self.name = task_plan.name
+        self._scratch = scratch
+        if scratch:
+            self._workspace = scratch.create_workspace(student_task_folder)
+        else:
+            if not workspace_root:
+                workspace_root = tools.get_temp_dir()
+            self._workspace = Workspace(student_task_folder, workspace_root)
+        student_task_folder = self._workspace.folder
         self._job_yaml_folder = path.dirname(job_file)
-        self._output_type = task_node[Tags.OUTPUT_TYPE_TAG]
+        self._output_type = task_plan.output_type
         self._cwd = student_task_folder
         self._student_task_folder = student_task_folder
-        self._binary_name = task_node[Tags.BINARY_NAME_TAG]
-        self._pipe_through = task_node[Tags.PIPE_TAG]
-        self._backup_folder = path.join(
-            student_task_folder, Task.BACKUP_FOLDER)
-        if Tags.TESTS_TAG in task_node:
-            self._test_nodes = task_node[Tags.TESTS_TAG]
-        else:
-            self._test_nodes = []  # Sometimes we don't have tests.
-        self._task_node = task_node
+        self._binary_name = task_plan.binary_name
+        self._tests = task_plan.tests
+        self._task_plan = task_plan
+        self._timer = tools.PhaseTimer()
+        if not budgets:
+            budgets = StageBudgets()
+        self._budgets = budgets
+        # Tests are skipped once any of the time budgets is spent.
+        self._time_budgets = [TimeBudget(task_plan.time_budget)]
+        if time_budget:
+            self._time_budgets.append(time_budget)
+        self._failed_count = 0
+        self._binary_crashed = False
+
+    @property
+    def timings(self):
+        """Get the seconds spent in every phase of checking this Task."""
+        return self._timer.to_dict()
 
     def check_all_tests(self):
         """Iterate over the tests and check them."""
+        return self.check_tests(self.check_build())
+
+    def check_build(self):
+        """Build the code if needed, the first stage of check_all_tests.
+
+        Returns:
+            dict: results with the build result if there was a build
+        """
+        self.__start_time_budgets()
         # Generate empty results.
         results = {}
         # Build the source if this is needed.
-        injected_folders = self.__inject_folders_if_needed(self._task_node)
-        build_result = self._build_if_needed()
-        self.__restore_injected_folders(self._task_node, injected_folders)
+        build_result = self.__build_with_injections()
+        if build_result:
+            results[BUILD_SUCCESS_TAG] = build_result
+        return results
+
+    def check_tests(self, results):
+        """Check the tests once built, the second stage of check_all_tests.
+
+        Args:
+            results (dict): results of check_build
+
+        Returns:
+            dict: all results of the Task
+        """
+        build_result = results.get(BUILD_SUCCESS_TAG)
+        if build_result and not build_result.succeeded():
+            # The build has failed, so no further testing needed.
+            return results
+        # The build is either not needed or succeeded. Continue testing.
+        test_results = {}
+        for test in self._ordered_tests():
+            test_name = test.name
+            skip_reason = self._skip_reason(test)
+            if skip_reason:
+                test_results[test_name] = tools.CmdResult.skip(skip_reason)
+                continue
+            with self._timer.measure(tools.PhaseTimer.INJECT, test_name):
+                injected_folders = self.__inject_folders_if_needed(test)
+            with self._budgets.slot(StageBudgets.TEST), \
+                    self._timer.measure(tools.PhaseTimer.TEST, test_name):
+                test_result = self._run_test(test)
+            with self._timer.measure(tools.PhaseTimer.REVERT, test_name):
+                self.__restore_injected_folders(injected_folders)
+            self._count_result(test, test_result)
+            test_results[test_name] = test_result
+        return self.__report(results, test_results)
+
+    async def check_all_tests_async(self, limit):
+        """Iterate over the tests and check them with the asyncio engine.
+
+        Blocking steps run in the default executor of the event loop. The tests
+        that only run a binary with the same injected folders run at the same
+        time, but no more of them than the limit allows.
+
+        Args:
+            limit (asyncio.Semaphore): limit of tests running at the same time
+        """
+        loop = asyncio.get_event_loop()
+        self.__start_time_budgets()
+        results = {}
+        build_result = await loop.run_in_executor(
+            None, self.__build_with_injections)
         if build_result:
             results[BUILD_SUCCESS_TAG] = build_result
             if not build_result.succeeded():
-                # The build has failed, so no further testing needed.
                 return results
-        # The build is either not needed or succeeded. Continue testing.
-        for test_node in self._test_nodes:
-            injected_folders = self.__inject_folders_if_needed(test_node)
-            test_result = self._run_test(test_node)
-            self.__restore_injected_folders(test_node, injected_folders)
-            results[test_node[Tags.NAME_TAG]] = test_result
-        style_errors = self._code_style_errors()
+        test_results = {}
+        for _, tests in groupby(self._ordered_tests(), key=Task._injections):
+            tests = list(tests)
+            # The injections are shared by the whole group of tests.
+            with self._timer.measure(tools.PhaseTimer.INJECT):
+                injected_folders = await loop.run_in_executor(
+                    None, self.__inject_folders_if_needed, tests[0])
+            binary_tests = [test for test in tests if self._runs_binary(test)]
+            binary_test_results = await asyncio.gather(*[
+                self._run_test_async(test, limit)
+                for test in binary_tests])
+            for test, test_result in zip(binary_tests, binary_test_results):
+                test_results[test.name] = test_result
+            # Other tests share the state of the Task, so run them in turn.
+            for test in tests:
+                if self._runs_binary(test):
+                    continue
+                test_name = test.name
+                skip_reason = self._skip_reason(test)
+                if skip_reason:
+                    test_results[test_name] = tools.CmdResult.skip(skip_reason)
+                    continue
+                with self._timer.measure(tools.PhaseTimer.TEST, test_name):
+                    test_results[test_name] = await loop.run_in_executor(
+                        None, self._run_test, test)
+                self._count_result(test, test_results[test_name])
+            with self._timer.measure(tools.PhaseTimer.REVERT):
+                await loop.run_in_executor(
+                    None, self.__restore_injected_folders, injected_folders)
+        return await loop.run_in_executor(
+            None, self.__report, results, test_results)
+
+    def __start_time_budgets(self):
+        for time_budget in self._time_budgets:
+            time_budget.start()
+
+    def _skip_reason(self, test):
+        """Check if a test must be skipped by the policies of the Task.
+
+        Returns:
+            str: the reason to skip the test, None to run it
+        """
+        fail_fast = self._task_plan.fail_fast
+        if fail_fast and self._failed_count >= fail_fast:
+            return "{} tests have failed before".format(self._failed_count)
+        if self._binary_crashed and self._runs_binary(test):
+            return "the binary has crashed or timed out before"
+        for time_budget in self._time_budgets:
+            if time_budget.spent():
+                return "the time budget of {} seconds is spent".format(
+                    time_budget.seconds)
+        return None
+
+    def _test_timeout(self, timeout):
+        """Cap the timeout of a test at the time left in the time budgets."""
+        for time_budget in self._time_budgets:
+            remaining = time_budget.remaining()
+            if remaining is not None:
+                timeout = min(timeout, remaining)
+        return timeout
+
+    def _count_result(self, test, test_result):
+        """Count the result of a test for the policies of the Task."""
+        if not test_result.succeeded():
+            self._failed_count += 1
+        if self._task_plan.skip_on_crash and self._runs_binary(test) \
+                and test_result.crashed():
+            self._binary_crashed = True
+
+    def __build_with_injections(self):
+        with self._timer.measure(tools.PhaseTimer.INJECT):
+            injected_folders = self.__inject_folders_if_needed(self._task_plan)
+        with self._budgets.slot(StageBudgets.BUILD), \
+                self._timer.measure(tools.PhaseTimer.BUILD):
+            build_result = self._build_if_needed()
+        if self._scratch:
+            # Count the build artifacts in the scratch space.
+            self._scratch.measure(self._workspace)
+        with self._timer.measure(tools.PhaseTimer.REVERT):
+            self.__restore_injected_folders(injected_folders)
+        return build_result
+
+    def __report(self, results, test_results):
+        # Report the tests in the order they are defined in.
+        for test in self._tests:
+            results[test.name] = \
+                test_results[test.name]
+        with self._timer.measure(tools.PhaseTimer.STYLE):
+            style_errors = self._code_style_errors()
         if style_errors:
             results[STYLE_ERROR_TAG] = style_errors
         return results
 
-    def __inject_folders_if_needed(self, node):
+    def cleanup(self):
+        """Remove the private workspace of this Task."""
+        if self._scratch:
+            self._scratch.release(self._workspace)
+        else:
+            self._workspace.cleanup()
+
+    def __inject_folders_if_needed(self, plan):
         injected_folders = []
-        if Tags.INJECT_FOLDER_TAG in node:
-            # Inject all needed folders.
-            for folder in node[Tags.INJECT_FOLDER_TAG]:
-                inject_folder = path.join(self._job_yaml_folder, folder)
-                folder_name = path.basename(folder)
-                self._inject_folder(folder_name, inject_folder)
-                injected_folders.append(folder_name)
+        for folder_name, inject_folder in plan.inject_folders:
+            self._inject_folder(folder_name, inject_folder)
+            injected_folders.append(folder_name)
         return injected_folders
 
-    def __restore_injected_folders(self, node, injected_folders):
-        if Tags.INJECT_FOLDER_TAG in node:
-            for folder in injected_folders:
-                self._revert_injections(folder)
-            from os import rmdir
-            rmdir(self._backup_folder)
+    def __restore_injected_folders(self, injected_folders):
+        # Revert in reverse order in case some folders were injected twice.
+        for folder in reversed(injected_folders):
+            self._revert_injections(folder)
 
     def _inject_folder(self, dest_folder, inject_folder):
         full_path_from = inject_folder
         if not path.isabs(full_path_from):
             full_path_from = path.join(self._job_yaml_folder, full_path_from)
-        full_path_to = path.join(self._student_task_folder, dest_folder)
-        if not path.isdir(self._backup_folder):
-            from os import mkdir
-            mkdir(self._backup_folder)
-        from shutil import copytree, move
-        if path.exists(full_path_to):
-            # Move the existing data to the backup folder if needed.
-            move(full_path_to, self._backup_folder)
-        copytree(full_path_from, full_path_to)
+        self._workspace.inject(full_path_from, dest_folder)
 
     def _revert_injections(self, dest_folder):
-        injected_folder = path.join(self._student_task_folder, dest_folder)
-        backed_up_folder = path.join(self._backup_folder, dest_folder)
-        if path.isdir(injected_folder):
-            from shutil import rmtree
-            rmtree(injected_folder)
-        if not path.isdir(backed_up_folder):
-            # There is no backup, so nothing to restore.
-            return
-        from shutil import move
-        move(backed_up_folder, self._student_task_folder)
-
-    def _run_test(self, test_node):
-        raise NotImplementedError('This method is not implemented.')
+        self._workspace.revert(dest_folder)
+
+    def _ordered_tests(self):
+        """Get the tests in the order in which to run them."""
+        return self._tests
+
+    @staticmethod
+    def _injections(plan):
+        """Get the folders a Task or a test plan injects."""
+        return plan.inject_folders
+
+    def _runs_binary(self, test):
+        """Check if a test only runs the binary and compares its output."""
+        return True
+
+    def _run_test(self, test):
+        run_result = tools.run_command(test.command,
+                                       cwd=self._cwd,
+                                       timeout=self._test_timeout(
+                                           TEST_TIMEOUT),
+                                       limits=dict(test.limits),
+                                       comparator=self._comparator(test))
+        return self._check_output(test, run_result)
+
+    async def _run_test_async(self, test, limit):
+        async with limit:
+            # The policies are checked once the test may start, so the tests
+            # that finished in the meantime are counted.
+            skip_reason = self._skip_reason(test)
+            if skip_reason:
+                return tools.CmdResult.skip(skip_reason)
+            with self._timer.measure(tools.PhaseTimer.TEST, test.name):
+                run_result = await tools.run_command_async(
+                    test.command,
+                    cwd=self._cwd,
+                    timeout=self._test_timeout(TEST_TIMEOUT),
+                    limits=dict(test.limits),
+                    comparator=self._comparator(test))
+        test_result = self._check_output(test, run_result)
+        self._count_result(test, test_result)
+        return test_result
+
+    def _comparator(self, test):
+        """Create a comparator of the output if the Task streams its output.
+
+        Returns:
+            tools.OutputComparator: comparator to stop the test as soon as its
+                output diverges, None to compare once the test has finished
+        """
+        if not self._task_plan.stream_output or test.expected_output is None:
+            return None
+        return tools.OutputComparator(self._output_type, test.expected_output)
+
+    def _check_output(self, test, run_result):
+        """Compare the output of a test run to the expected output."""
+        if not run_result.succeeded():
+            return run_result
+        our_output, error = tools.convert_to(
+            self._output_type, run_result.stdout)
+        if not our_output:
+            # Conversion has failed.
+            run_result.stderr = error
+            return run_result
+        if our_output != test.expected_output:
+            run_result.stderr = OUTPUT_MISMATCH_MESSAGE.format(
+                actual=our_output, input=test.input_str,
+                expected=test.expected_output)
+        return run_result
 
     def _build_if_needed(self):
         return None
@@ -137,104 +389,181 @@ class Task:
 
 class CppTask(Task):
     """Define a C++ Task."""
-    CMAKE_BUILD_CMD = "cmake .. && make -j2"
-    REMAKE_AND_TEST = \
-        "make clean && rm -r * && cmake .. && make -j2 && ctest -VV"
+    # The number of jobs comes from the jobserver in MAKEFLAGS.
+    CMAKE_BUILD_CMD = "cmake {cmake_args} .. && make"
+    TEST_CMD = "ctest -VV"
     BUILD_CMD_SIMPLE = \
         "clang++ -std=c++14 -o {binary} {compiler_flags} {binary}.cpp"
 
-    def __init__(self, task_node, root_folder, job_file):
+    def __init__(self, task_plan, root_folder, job_file, workspace_root=None,
+                 build_cache=None, style_checker=None, budgets=None,
+                 jobserver=None, prebuilt=None, time_budget=None,
+                 scratch=None, configure_cache=None):
         """Initialize the C++ Task."""
-        super().__init__(task_node, root_folder, job_file)
-        self._compiler_flags = task_node[Tags.COMPILER_FLAGS_TAG]
-        self._build_type = task_node[Tags.BUILD_TYPE_TAG]
+        super().__init__(task_plan, root_folder, job_file, workspace_root,
+                         budgets, time_budget, scratch)
+        self._build_cache = build_cache
+        if not style_checker:
+            style_checker = default_style_checker()
+        self._style_checker = style_checker
+        if not jobserver:
+            jobserver = default_jobserver()
+        self._jobserver = jobserver
+        self._prebuilt = prebuilt
+        self._configure_cache = configure_cache
+        self._compiler_flags = task_plan.compiler_flags
+        self._build_type = task_plan.build_type
+        # The injections the build folder has been built with. Is None if the
+        # state of the build folder is unknown.
+        self._built_injections = None
         if self._build_type == BuildTags.CMAKE:
             # The cmake project will always work from build folder.
             self._cwd = path.join(self._cwd, 'build')
             tools.create_folder_if_needed(self._cwd)
 
     def _build_if_needed(self):
+        if not self._build_cache:
+            return self._build()
+        cmake_args = ''
+        build_folder = None
         if self._build_type == BuildTags.CMAKE:
-            return tools.run_command(CppTask.CMAKE_BUILD_CMD,
-                                     cwd=self._cwd,
-                                     timeout=60)
-        return tools.run_command(
+            # The google tests need the whole configured build folder.
+            cmake_args = self._cmake_args()
+            build_folder = self._cwd
+        cache_key = self._build_cache.key(self._student_task_folder,
+                                          self._binary_name,
+                                          self._build_type,
+                                          self._compiler_flags,
+                                          cmake_args)
+        binary_path = path.join(self._cwd, self._binary_name)
+        build_result = self._build_cache.load(
+            cache_key, binary_path, build_folder, self._student_task_folder)
+        if build_result:
+            if build_folder:
+                self._built_injections = Task._injections(self._task_plan)
+            return build_result
+        build_result = self._build()
+        self._build_cache.store(cache_key, build_result, binary_path,
+                                build_folder, self._student_task_folder)
+        return build_result
+
+    def _build(self):
+        if self._build_type == BuildTags.CMAKE:
+            build_result = self._run_cmake_build()
+            if build_result.succeeded():
+                self._built_injections = Task._injections(self._task_plan)
+            return build_result
+        return self._run_build(
             CppTask.BUILD_CMD_SIMPLE.format(
                 binary=self._binary_name,
-                compiler_flags=self._compiler_flags),
-            cwd=self._cwd)
+                compiler_flags=self._compiler_flags))
+
+    def _run_cmake_build(self):
+        """Configure and build a CMake project, seeding the build folder."""
+        cmake_args = self._cmake_args()
+        if not self._configure_cache:
+            return self._run_build(
+                CppTask.CMAKE_BUILD_CMD.format(cmake_args=cmake_args),
+                timeout=60)
+        configure_key = self._configure_cache.key(self._student_task_folder,
+                                                  cmake_args)
+        self._configure_cache.load(configure_key, self._student_task_folder,
+                                   self._cwd)
+        build_result = self._run_build(
+            CppTask.CMAKE_BUILD_CMD.format(cmake_args=cmake_args),
+            timeout=60)
+        self._configure_cache.store(configure_key, self._student_task_folder,
+                                    self._cwd)
+        return build_result
+
+    def _clear_build_folder(self):
+        """Remove everything from the build folder."""
+        for entry in os.scandir(self._cwd):
+            if entry.is_dir(follow_symlinks=False):
+                rmtree(entry.path)
+            else:
+                os.remove(entry.path)
+
+    def _cmake_args(self):
+        """Get the arguments of cmake, building the dependencies if needed."""
+        if not self._prebuilt:
+            return ''
+        return self._prebuilt.cmake_args()
+
+    def _run_build(self, command, timeout=20):
+        """Run a build command sharing the compile jobs of all builds."""
+        return self._jobserver.run(command, cwd=self._cwd, timeout=timeout)
 
     def _code_style_errors(self):
         """Check if code conforms to Google Style."""
-        command = 'cpplint --counting=detailed ' +\
-            '--filter=-legal,-readability/todo,' +\
-            '-build/include_order,-runtime/threadsafe_fn,' +\
-            '-runtime/arrays' +\
-            ' $( find . -name "*.h" -o -name "*.cpp" | grep -vE "^./build/" )'
-        result = tools.run_command(command, cwd=self._student_task_folder)
-        if result.stderr and "Total errors found" in result.stderr:
-            return result
-        return None
+        return self._style_checker.check(self._workspace.source_folder)
+
+    def _ordered_tests(self):
+        """Group google tests by the folders they inject.
+
+        This way we only need to rebuild the code when the injected folders
+        change. The tests that run the binary go first as they rely on the
+        initial build.
+        """
+        binary_tests = []
+        gtest_groups = {self._built_injections: []}
+        for test in self._tests:
+            if not test.run_google_tests:
+                binary_tests.append(test)
+                continue
+            gtest_groups.setdefault(
+                Task._injections(test), []).append(test)
+        return binary_tests + [
+            test for group in gtest_groups.values()
+            for test in group]
 
-    def _run_test(self, test_node):
-        if test_node[Tags.RUN_GTESTS_TAG]:
+    def _run_google_tests(self, test):
+        """Run google tests rebuilding the code only if needed."""
+        injections = Task._injections(test)
+        limits = dict(test.limits)
+        if injections == self._built_injections:
             return tools.run_command(
-                CppTask.REMAKE_AND_TEST, cwd=self._cwd, timeout=60)
-        input_str = ''
-        if Tags.INPUT_TAG in test_node:
-            input_str = test_node[Tags.INPUT_TAG]
-        run_cmd = "./{binary_name} {args}".format(
-            binary_name=self._binary_name, args=input_str)
-        if self._pipe_through:
-            run_cmd += ' ' + self._pipe_through
-        run_result = tools.run_command(run_cmd, cwd=self._cwd)
-        if not run_result.succeeded():
-            return run_result
-        our_output, error = tools.convert_to(
-            self._output_type, run_result.stdout)
-        if not our_output:
-            # Conversion has failed.
-            run_result.stderr = error
-            return run_result
-        expected_output, error = tools.convert_to(
-            self._output_type, test_node[Tags.EXPECTED_OUTPUT_TAG])
-        if our_output != expected_output:
-            run_result.stderr = OUTPUT_MISMATCH_MESSAGE.format(
-                actual=our_output, input=input_str, expected=expected_output)
-        return run_result
+                CppTask.TEST_CMD, cwd=self._cwd,
+                timeout=self._test_timeout(GOOGLE_TESTS_TIMEOUT),
+                limits=limits)
+        self._built_injections = None
+        with self._budgets.slot(StageBudgets.BUILD):
+            self._clear_build_folder()
+            build_result = self._run_cmake_build()
+        if not build_result.succeeded():
+            return build_result
+        self._built_injections = injections
+        test_result = tools.run_command(
+            CppTask.TEST_CMD, cwd=self._cwd,
+            timeout=self._test_timeout(GOOGLE_TESTS_TIMEOUT),
+            limits=limits)
+        return tools.CmdResult(
+            returncode=test_result.returncode,
+            stdout=(build_result.stdout or '') + (test_result.stdout or ''),
+            stderr=(build_result.stderr or '') + (test_result.stderr or ''),
+            truncated=test_result.truncated,
+            wall_time=test_result.wall_time,
+            cpu_time=test_result.cpu_time,
+            peak_rss_kb=test_result.peak_rss_kb,
+            timed_out=test_result.timed_out)
+
+    def _runs_binary(self, test):
+        return not test.run_google_tests
+
+    def _run_test(self, test):
+        if test.run_google_tests:
+            return self._run_google_tests(test)
+        return super()._run_test(test)
 
 
 class BashTask(Task):
     """Define a Bash Task."""
-    RUN_CMD = "sh {binary_name}.sh {args}"
 
-    def __init__(self, task_node, root_folder, job_file):
+    def __init__(self, task_plan, root_folder, job_file, workspace_root=None,
+                 budgets=None, time_budget=None, scratch=None):
         """Initialize the Task."""
-        super().__init__(task_node, root_folder, job_file)
+        super().__init__(task_plan, root_folder, job_file, workspace_root,
+                         budgets, time_budget, scratch)
 
     def _build_if_needed(self):
         pass  # There is nothing to build in Bash.
-
-    def _run_test(self, test_node):
-        input_str = ''
-        if Tags.INPUT_TAG in test_node:
-            input_str = test_node[Tags.INPUT_TAG]
-        run_cmd = BashTask.RUN_CMD.format(
-            binary_name=self._binary_name, args=input_str)
-        if self._pipe_through:
-            run_cmd += ' ' + self._pipe_through
-        run_result = tools.run_command(run_cmd, cwd=self._cwd)
-        if not run_result.succeeded():
-            return run_result
-        our_output, error = tools.convert_to(
-            self._output_type, run_result.stdout)
-        if not our_output:
-            # Conversion has failed.
-            run_result.stderr = error
-            return run_result
-        expected_output, error = tools.convert_to(
-            self._output_type, test_node[Tags.EXPECTED_OUTPUT_TAG])
-        if our_output != expected_output:
-            run_result.stderr = OUTPUT_MISMATCH_MESSAGE.format(
-                actual=our_output, input=input_str, expected=expected_output)
-        return run_result
@@ -1,3 +1,3 @@
 """These are the tests for the package."""
 
-__all__ = ("test_checker", "test_task", "test_tools")
+__all__ = ("test_build_cache", "test_checker", "test_task", "test_tools")
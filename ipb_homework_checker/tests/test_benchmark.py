@@ -0,0 +1,56 @@
+#!/usr/bin/python3
+"""Test the benchmark of the checker."""
+
+import tempfile
+import unittest
+from os import path
+from shutil import rmtree
+
+from ipb_homework_checker import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    """Test the benchmark of the checker."""
+
+    def setUp(self):
+        """Create a temporary folder."""
+        self._temp_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        rmtree(self._temp_folder)
+
+    def test_generate(self):
+        """Check that every student gets the code of all Tasks."""
+        job_file, student_folders = benchmark.generate(
+            self._temp_folder, homeworks=2, tasks=3, tests=2, students=2,
+            kinds=[benchmark.BASH_KIND, benchmark.GTEST_KIND])
+        self.assertEqual(len(student_folders), 2)
+        with open(job_file) as job:
+            job_text = job.read()
+        self.assertIn('folder: {}\n'.format(student_folders[0]), job_text)
+        self.assertEqual(job_text.count('- name: "Task'), 6)
+        self.assertEqual(job_text.count('run_google_tests: true'), 3 * 2)
+        self.assertNotIn('prebuilt', job_text)
+        for student_folder in student_folders:
+            self.assertTrue(path.exists(path.join(
+                student_folder, 'homework_1', 'task_1', 'main.sh')))
+            self.assertTrue(path.exists(path.join(
+                student_folder, 'homework_1', 'task_2', 'tests',
+                'test_sum.cpp')))
+
+    def test_compare(self):
+        """Check that only the metrics that got worse are regressions."""
+        baseline = {'tests_per_second': 10.0,
+                    'build_mean': 2.0,
+                    'inject_mean': 0.0,
+                    'peak_rss_kb': 1000}
+        metrics = {'tests_per_second': 8.0,
+                   'build_mean': 1.0,
+                   'inject_mean': 0.001,
+                   'peak_rss_kb': 1050}
+        regressions = benchmark.compare(metrics, baseline, tolerance=0.1)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith('tests_per_second'))
+        self.assertEqual(benchmark.compare(metrics, baseline, tolerance=0.5),
+                         [])
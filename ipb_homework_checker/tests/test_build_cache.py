@@ -0,0 +1,97 @@
+#!/usr/bin/python3
+"""Test the build cache."""
+
+import tempfile
+import unittest
+from os import path, remove
+from shutil import copytree, rmtree
+
+from ipb_homework_checker import tools
+from ipb_homework_checker.build_cache import BuildCache
+from ipb_homework_checker.schema_tags import BuildTags
+
+
+class TestBuildCache(unittest.TestCase):
+    """Test the build cache."""
+
+    def setUp(self):
+        """Copy a Task folder to a temporary folder."""
+        self._temp_folder = tempfile.mkdtemp()
+        self._task_folder = path.join(self._temp_folder, 'task')
+        copytree(path.join(path.dirname(__file__),
+                           'data', 'homework', 'homework_1', 'task_4'),
+                 self._task_folder)
+        self._cache = BuildCache(path.join(self._temp_folder, 'cache'))
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        rmtree(self._temp_folder)
+
+    def _key(self, flags='-Wall'):
+        return self._cache.key(
+            self._task_folder, 'main', BuildTags.SIMPLE, flags)
+
+    def test_key(self):
+        """Check that the key only changes when the build inputs change."""
+        key = self._key()
+        self.assertEqual(key, self._key())
+        # The binary itself and the build folder are not inputs of the build.
+        with open(path.join(self._task_folder, 'main'), 'w') as binary:
+            binary.write('binary')
+        tools.create_folder_if_needed(path.join(self._task_folder, 'build'))
+        self.assertEqual(key, self._key())
+        self.assertNotEqual(key, self._key(flags='-Wall -Werror'))
+        with open(path.join(self._task_folder, 'main.cpp'), 'a') as source:
+            source.write('\n')
+        self.assertNotEqual(key, self._key())
+
+    def test_store_and_load(self):
+        """Check that a stored binary and result are restored."""
+        key = self._key()
+        binary_path = path.join(self._task_folder, 'main')
+        self.assertIsNone(self._cache.load(key, binary_path))
+        with open(binary_path, 'w') as binary:
+            binary.write('binary')
+        self._cache.store(key, tools.CmdResult(returncode=0, stdout='built'),
+                          binary_path)
+        remove(binary_path)
+        build_result = self._cache.load(key, binary_path)
+        self.assertTrue(build_result.succeeded())
+        self.assertEqual(build_result.stdout, 'built')
+        self.assertTrue(path.exists(binary_path))
+
+    def test_failed_builds_are_not_stored(self):
+        """Check that a failed build is built again next time."""
+        key = self._key()
+        binary_path = path.join(self._task_folder, 'main')
+        self._cache.store(key, tools.CmdResult(returncode=1, stderr='error'),
+                          binary_path)
+        self.assertIsNone(self._cache.load(key, binary_path))
+
+    def test_build_folder(self):
+        """Check that a build folder is restored for another source folder."""
+        key = self._key()
+        build_folder = path.join(self._task_folder, 'build')
+        tools.create_folder_if_needed(path.join(build_folder, 'tests'))
+        with open(path.join(build_folder, 'Makefile'), 'w') as makefile:
+            makefile.write('cd {}/tests\n'.format(self._task_folder))
+        with open(path.join(build_folder, 'tests', 'main'), 'wb') as binary:
+            binary.write(b'\0' + self._task_folder.encode('utf-8'))
+        self._cache.store(key, tools.CmdResult(returncode=0, stdout='built'),
+                          path.join(build_folder, 'main'),
+                          build_folder, self._task_folder)
+        other_folder = path.join(self._temp_folder, 'other')
+        other_build_folder = path.join(other_folder, 'build')
+        tools.create_folder_if_needed(other_build_folder)
+        build_result = self._cache.load(
+            key, path.join(other_build_folder, 'main'),
+            other_build_folder, other_folder)
+        self.assertEqual(build_result.stdout, 'built')
+        with open(path.join(other_build_folder, 'Makefile')) as makefile:
+            self.assertEqual(makefile.read(),
+                             'cd {}/tests\n'.format(other_folder))
+        # Binary files are never changed.
+        with open(path.join(other_build_folder, 'tests', 'main'),
+                  'rb') as binary:
+            self.assertEqual(binary.read(),
+                             b'\0' + self._task_folder.encode('utf-8'))
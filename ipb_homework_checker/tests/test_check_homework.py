@@ -0,0 +1,48 @@
+#!/usr/bin/python3
+"""Test checking many students from the command line."""
+
+import os
+import tempfile
+import unittest
+from os import path
+from shutil import rmtree
+
+from ipb_homework_checker.check_homework import find_student_folders
+from ipb_homework_checker.check_homework import student_names
+
+
+class TestCheckHomework(unittest.TestCase):
+    """Test checking many students from the command line."""
+
+    def setUp(self):
+        """Create the folders of some students."""
+        self._temp_folder = tempfile.mkdtemp()
+        for student in ['alice', 'bob']:
+            os.makedirs(path.join(self._temp_folder, student, 'repo'))
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        rmtree(self._temp_folder)
+
+    def test_relative_patterns(self):
+        """Check that patterns are relative to the working directory."""
+        cwd = os.getcwd()
+        os.chdir(self._temp_folder)
+        try:
+            student_folders = find_student_folders(['*/repo'])
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(student_folders,
+                         [path.join(self._temp_folder, 'alice', 'repo'),
+                          path.join(self._temp_folder, 'bob', 'repo')])
+
+    def test_unique_names(self):
+        """Check that students in folders of the same name differ."""
+        names = student_names([path.join(self._temp_folder, 'alice'),
+                               path.join(self._temp_folder, 'bob')])
+        self.assertEqual(sorted(names.values()), ['alice', 'bob'])
+        names = student_names([path.join(self._temp_folder, 'alice', 'repo'),
+                               path.join(self._temp_folder, 'bob', 'repo'),
+                               path.join(self._temp_folder, 'alice_repo')])
+        self.assertEqual(sorted(names.values()),
+                         ['alice_repo', 'alice_repo_2', 'bob_repo'])
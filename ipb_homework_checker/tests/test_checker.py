@@ -83,3 +83,123 @@ class TestChecker(unittest.TestCase):
 
         self.assertTrue(results['Homework 3']
                         ['Bash with many folders']['ls'].succeeded())
+
+        timings = checker.timings['Homework 1']['Task 1']
+        self.assertIn(tools.PhaseTimer.BUILD, timings['phases'])
+        self.assertIn(tools.PhaseTimer.TEST, timings['tests']['Test 1'])
+
+    def test_limits(self):
+        """Check that tests run within the limits of the job."""
+        checker = Checker(
+            'ipb_homework_checker/tests/data/homework/limits_job.yml')
+        results = checker.check_homework()
+        for test_name in ['Test 1', 'Test 2']:
+            test_result = results['Homework 1']['Task 1'][test_name]
+            self.assertTrue(test_result.succeeded())
+            self.assertIsNotNone(test_result.cpu_time)
+            self.assertGreater(test_result.peak_rss_kb, 0)
+
+    def test_prebuilt(self):
+        """Check that google tests pass with the prebuilt GoogleTest."""
+        job_file = 'ipb_homework_checker/tests/data/homework/prebuilt_job.yml'
+        prebuilt_results = Checker(job_file).check_homework()
+        task_results = prebuilt_results['Homework 3']['Google Tests']
+        self.assertTrue(task_results['Just build'].succeeded())
+        self.assertTrue(task_results['Inject pass'].succeeded())
+        self.assertFalse(task_results['Inject fail'].succeeded())
+
+    def test_parallel_matches_serial(self):
+        """Check that checking Tasks in parallel gives the same results."""
+        job_file = 'ipb_homework_checker/tests/data/homework/example_job.yml'
+        serial_results = Checker(job_file).check_homework()
+        parallel_results = Checker(job_file, jobs=4).check_homework()
+        self._assert_same_results(serial_results, parallel_results)
+
+    def test_asyncio_matches_serial(self):
+        """Check that the asyncio engine gives the same results."""
+        job_file = 'ipb_homework_checker/tests/data/homework/example_job.yml'
+        serial_results = Checker(job_file).check_homework()
+        asyncio_results = Checker(
+            job_file, jobs=4, engine=Checker.ASYNCIO_ENGINE).check_homework()
+        self._assert_same_results(serial_results, asyncio_results)
+
+    def test_pipeline_matches_serial(self):
+        """Check that the pipeline engine gives the same results."""
+        job_file = 'ipb_homework_checker/tests/data/homework/example_job.yml'
+        serial_results = Checker(job_file).check_homework()
+        pipeline_results = Checker(
+            job_file, jobs=2, engine=Checker.PIPELINE_ENGINE,
+            test_jobs=2).check_homework()
+        self._assert_same_results(serial_results, pipeline_results)
+
+    def test_incremental_matches_full(self):
+        """Check that reusing the stored results gives the same results."""
+        import tempfile
+        from shutil import rmtree
+        job_file = 'ipb_homework_checker/tests/data/homework/example_job.yml'
+        cache_folder = tempfile.mkdtemp()
+        try:
+            full_results = Checker(job_file, cache_folder=cache_folder,
+                                   incremental=True).check_homework()
+            checker = Checker(job_file, cache_folder=cache_folder,
+                              incremental=True)
+            stored_results = checker.check_homework()
+        finally:
+            rmtree(cache_folder)
+        self._assert_same_results(full_results, stored_results)
+        # Nothing was checked again.
+        self.assertEqual(
+            checker.timings['Homework 1']['Task 1']['phases'], {})
+
+    def _assert_same_results(self, serial_results, parallel_results):
+        self.assertEqual(list(serial_results), list(parallel_results))
+        for hw_name, hw_dict in serial_results.items():
+            self.assertEqual(list(hw_dict), list(parallel_results[hw_name]))
+            for task_name, task_dict in hw_dict.items():
+                if task_name == tools.EXPIRED_TAG:
+                    continue
+                parallel_task_dict = parallel_results[hw_name][task_name]
+                self.assertEqual(list(task_dict), list(parallel_task_dict))
+                for test_name, test_result in task_dict.items():
+                    self.assertEqual(
+                        test_result.succeeded(),
+                        parallel_task_dict[test_name].succeeded())
+
+    def test_check_students(self):
+        """Check that many students are checked with one job."""
+        job_file = 'ipb_homework_checker/tests/data/homework/example_job.yml'
+        checker = Checker(job_file, jobs=4)
+        student_folder = tools.expand_if_needed(
+            'ipb_homework_checker/tests/data/homework')
+        missing_folder = tools.expand_if_needed(
+            'ipb_homework_checker/tests/data/missing')
+        results = list(checker.check_students(
+            [student_folder, missing_folder]))
+        self.assertEqual([student_folder, missing_folder],
+                         [folder for folder, _, _ in results])
+        self.assertEqual(len(results[0][1]), 3)
+        self.assertTrue(results[0][1]['Homework 1']
+                        ['Task 1']['Test 1'].succeeded())
+        self.assertIn('Task 1', results[0][2]['Homework 1'])
+        self.assertEqual(results[1][1], {})
+        self.assertEqual(results[1][2], {})
+
+    def test_check_students_window(self):
+        """Check that only a few students are submitted ahead."""
+        job_file = 'ipb_homework_checker/tests/data/homework/example_job.yml'
+        checker = Checker(job_file, jobs=1)
+        missing_folder = tools.expand_if_needed(
+            'ipb_homework_checker/tests/data/missing')
+        pulled = []
+
+        def student_folders():
+            for _ in range(5):
+                pulled.append(missing_folder)
+                yield missing_folder
+
+        checked = checker.check_students(student_folders())
+        next(checked)
+        self.assertEqual(len(pulled), Checker.STUDENTS_AHEAD_PER_JOB)
+        self.assertEqual(len(list(checked)), 4)
+        self.assertEqual(len(pulled), 5)
+        checker.close()
@@ -0,0 +1,97 @@
+#!/usr/bin/python3
+"""Test the cache of configured CMake build folders."""
+
+import tempfile
+import unittest
+from os import path
+from shutil import copytree, rmtree
+
+from ipb_homework_checker import tools
+from ipb_homework_checker.configure_cache import ConfigureCache
+
+CMAKE_BUILD_CMD = "cmake .. && make"
+
+
+class TestConfigureCache(unittest.TestCase):
+    """Test the cache of configured CMake build folders."""
+
+    def setUp(self):
+        """Copy a CMake Task folder for two students."""
+        self._temp_folder = tempfile.mkdtemp()
+        self._task_folders = []
+        for student in ['student_1', 'student_2']:
+            task_folder = path.join(self._temp_folder, student, 'task_1')
+            copytree(path.join(path.dirname(__file__), 'data', 'homework',
+                               'homework_1', 'task_1'),
+                     task_folder)
+            tools.create_folder_if_needed(path.join(task_folder, 'build'))
+            self._task_folders.append(task_folder)
+        self._cache = ConfigureCache(path.join(self._temp_folder, 'cache'))
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        rmtree(self._temp_folder)
+
+    def test_key(self):
+        """Check that only the CMake inputs change the key."""
+        first, second = self._task_folders
+        key = self._cache.key(first, '')
+        self.assertEqual(key, self._cache.key(second, ''))
+        self.assertNotEqual(key, self._cache.key(first, '-DFOO=1'))
+        with open(path.join(first, 'main.cpp'), 'a') as source:
+            source.write('// Changed code.\n')
+        with open(path.join(first, 'build', 'artifact'), 'w') as artifact:
+            artifact.write('artifact')
+        self.assertEqual(key, self._cache.key(first, ''))
+        with open(path.join(first, 'CMakeLists.txt'), 'a') as cmake_lists:
+            cmake_lists.write('# Changed project.\n')
+        self.assertNotEqual(key, self._cache.key(first, ''))
+        with open(path.join(second, 'extra.cpp'), 'w') as source:
+            source.write('// New file.\n')
+        self.assertNotEqual(key, self._cache.key(second, ''))
+
+    def test_seed(self):
+        """Check that a seeded build folder skips the compiler detection."""
+        first, second = self._task_folders
+        key = self._cache.key(first, '')
+        self.assertFalse(self._cache.load(key, first, path.join(first,
+                                                                'build')))
+        result = tools.run_command(CMAKE_BUILD_CMD,
+                                   cwd=path.join(first, 'build'))
+        self.assertTrue(result.succeeded())
+        self.assertIn('compiler identification', result.stdout)
+        self._cache.store(key, first, path.join(first, 'build'))
+        build_folder = path.join(second, 'build')
+        self.assertTrue(self._cache.load(key, second, build_folder))
+        with open(path.join(build_folder, 'CMakeCache.txt')) as cache_file:
+            cache = cache_file.read()
+        self.assertIn(second, cache)
+        self.assertNotIn(first, cache)
+        result = tools.run_command(CMAKE_BUILD_CMD, cwd=build_folder)
+        self.assertTrue(result.succeeded())
+        self.assertNotIn('compiler identification', result.stdout)
+        self.assertTrue(path.exists(path.join(build_folder, 'main')))
+        # A configured build folder is never overwritten.
+        self.assertFalse(self._cache.load(key, second, build_folder))
+
+    def test_not_configured(self):
+        """Check that build folders cmake failed to configure are skipped."""
+        first = self._task_folders[0]
+        with open(path.join(first, 'CMakeLists.txt'), 'a') as cmake_lists:
+            cmake_lists.write('message(FATAL_ERROR "Broken")\n')
+        key = self._cache.key(first, '')
+        result = tools.run_command(CMAKE_BUILD_CMD,
+                                   cwd=path.join(first, 'build'))
+        self.assertFalse(result.succeeded())
+        self._cache.store(key, first, path.join(first, 'build'))
+        self.assertFalse(self._cache.load(
+            key, self._task_folders[1],
+            path.join(self._task_folders[1], 'build')))
+
+    def test_cleanup(self):
+        """Check that a temporary cache is removed along with the cache."""
+        cache = ConfigureCache()
+        folder = cache._folder
+        self.assertTrue(path.exists(folder))
+        del cache
+        self.assertFalse(path.exists(folder))
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+"""Test the checker daemon and its client."""
+
+import os
+import stat
+import tempfile
+import threading
+import unittest
+from os import path
+from shutil import rmtree
+from unittest import mock
+
+from ipb_homework_checker.checker import Checker
+from ipb_homework_checker.daemon import CheckerDaemon, DaemonClient
+from ipb_homework_checker.daemon import DaemonError
+
+JOB_TEMPLATE = """---
+folder: {folder}
+homeworks:
+  - name: "Homework 2"
+    folder: "homework_2"
+    tasks:
+      - name: Task 2
+        language: bash
+        folder: task_2
+        output_type: string
+        binary_name: test_me
+        tests:
+          - name: Test 1
+            expected_output: |
+              Hello World!
+              Another line
+              test_me.sh
+"""
+
+
+class TestDaemon(unittest.TestCase):
+    """Test the checker daemon and its client."""
+
+    def setUp(self):
+        """Start a daemon with a job of a single bash Task."""
+        self._temp_folder = tempfile.mkdtemp()
+        self._code_folder = path.join(path.dirname(__file__), 'data',
+                                      'homework')
+        self._job_file = path.join(self._temp_folder, 'job.yml')
+        with open(self._job_file, 'w') as job:
+            job.write(JOB_TEMPLATE.format(folder=self._code_folder))
+        self._socket_path = path.join(self._temp_folder, 'checker.sock')
+        self._daemon = CheckerDaemon(self._socket_path, [self._job_file])
+        self._thread = threading.Thread(target=self._daemon.serve_forever)
+        self._thread.start()
+
+    def tearDown(self):
+        """Stop the daemon and remove the temporary folder."""
+        self._daemon.shutdown()
+        self._thread.join()
+        self._daemon.server_close()
+        self.assertFalse(path.exists(self._socket_path))
+        rmtree(self._temp_folder)
+
+    def test_check_homework(self):
+        """Check the folder of the job file through the daemon."""
+        client = DaemonClient(self._socket_path, self._job_file)
+        results = client.check_homework()
+        self.assertTrue(
+            results['Homework 2']['Task 2']['Test 1'].succeeded())
+        self.assertIn('Task 2', client.timings['Homework 2'])
+        self.assertEqual(path.normpath(client.checked_code_folder),
+                         path.normpath(self._code_folder))
+
+    def test_check_students(self):
+        """Check that the results of every student are streamed back."""
+        client = DaemonClient(self._socket_path, self._job_file)
+        checked = list(client.check_students([self._code_folder] * 2))
+        self.assertEqual(len(checked), 2)
+        for student_folder, results, _ in checked:
+            self.assertEqual(student_folder, self._code_folder)
+            self.assertTrue(
+                results['Homework 2']['Task 2']['Test 1'].succeeded())
+
+    def test_reload(self):
+        """Check that a job is only loaded again once its file changes."""
+        checker = self._daemon.checker(self._job_file)
+        self.assertIs(checker, self._daemon.checker(self._job_file))
+        self._touch_job_file()
+        with mock.patch.object(Checker, 'close', autospec=True) as close:
+            self.assertIsNot(checker, self._daemon.checker(self._job_file))
+        close.assert_called_once_with(checker)
+
+    def test_reload_in_use(self):
+        """Check that a Checker in use is closed once it is not used."""
+        jobs = self._daemon._jobs
+        with mock.patch.object(Checker, 'close', autospec=True) as close:
+            with jobs.use(self._job_file) as checker:
+                self._touch_job_file()
+                self.assertIsNot(checker, jobs.checker(self._job_file))
+                close.assert_not_called()
+            close.assert_called_once_with(checker)
+
+    def test_socket_permissions(self):
+        """Check that only the user of the daemon may connect."""
+        self.assertEqual(stat.S_IMODE(os.stat(self._socket_path).st_mode),
+                         0o600)
+
+    def test_not_a_socket(self):
+        """Check that the daemon never removes a file that is no socket."""
+        with self.assertRaises(FileExistsError):
+            CheckerDaemon(self._job_file)
+        self.assertTrue(path.isfile(self._job_file))
+
+    def _touch_job_file(self):
+        job_stat = os.stat(self._job_file)
+        os.utime(self._job_file, ns=(job_stat.st_atime_ns,
+                                     job_stat.st_mtime_ns + 1000000000))
+
+    def test_error(self):
+        """Check that failures are reported to the client."""
+        client = DaemonClient(self._socket_path,
+                              path.join(self._temp_folder, 'missing.yml'))
+        with self.assertRaises(DaemonError):
+            client.check_homework()
@@ -0,0 +1,164 @@
+#!/usr/bin/python3
+"""Test distributing the checks between workers."""
+
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import contextmanager
+from os import path
+from shutil import rmtree
+
+from ipb_homework_checker import distributed, tools
+from ipb_homework_checker.protocol import read_message, send_message
+from ipb_homework_checker.tests.test_daemon import JOB_TEMPLATE
+
+TOKEN = 'secret'
+
+
+class SlowJobs:
+    """Checkers of jobs that take a while to check any Task."""
+
+    @contextmanager
+    def use(self, job_file):
+        """Use a Checker of any job."""
+        yield self
+
+    @staticmethod
+    def check_task(checked_code_folder, hw_name, task_name):
+        """Check a Task slowly."""
+        time.sleep(1.5)
+        return {'Test 1': tools.CmdResult.success()}, {}
+
+
+class TestDistributed(unittest.TestCase):
+    """Test distributing the checks between workers."""
+
+    def setUp(self):
+        """Write a job of a single bash Task."""
+        self._temp_folder = tempfile.mkdtemp()
+        self._code_folder = path.join(path.dirname(__file__), 'data',
+                                      'homework')
+        self._job_file = path.join(self._temp_folder, 'job.yml')
+        with open(self._job_file, 'w') as job:
+            job.write(JOB_TEMPLATE.format(folder=self._code_folder))
+        self._threads = []
+
+    def tearDown(self):
+        """Wait for all workers and remove the temporary folder."""
+        for thread in self._threads:
+            thread.join()
+        rmtree(self._temp_folder)
+
+    def _coordinator(self, **kwargs):
+        return distributed.Coordinator(self._job_file, TOKEN,
+                                       ('127.0.0.1', 0), **kwargs)
+
+    def _start_worker(self, coordinator):
+        worker = distributed.Worker(coordinator.address, TOKEN)
+        thread = threading.Thread(target=worker.work)
+        thread.start()
+        self._threads.append(thread)
+
+    def _start_broken_worker(self, coordinator, error=None):
+        """Start a worker that fails the first Task it takes.
+
+        With an error it reports the error and works as usual afterwards,
+        otherwise it goes silent.
+        """
+        def work():
+            with socket.create_connection(coordinator.address) as sock:
+                with sock.makefile('rwb') as stream:
+                    send_message(stream, {distributed.WORKER_KEY: 'broken',
+                                          distributed.TOKEN_KEY: TOKEN})
+                    unit = read_message(stream)
+                    if error is None:
+                        # Wait for the coordinator to close the connection.
+                        read_message(stream)
+                        return
+                    send_message(stream, {
+                        distributed.UNIT_KEY: unit[distributed.UNIT_KEY],
+                        distributed.ERROR_KEY: error})
+            distributed.Worker(coordinator.address, TOKEN).work()
+        thread = threading.Thread(target=work)
+        thread.start()
+        self._threads.append(thread)
+
+    def test_parse_address(self):
+        """Check that the port is optional."""
+        self.assertEqual(distributed.parse_address('host:1234'),
+                         ('host', 1234))
+        self.assertEqual(distributed.parse_address('host'),
+                         ('host', distributed.DEFAULT_PORT))
+        self.assertEqual(distributed.parse_address(':1234'),
+                         (distributed.DEFAULT_HOST, 1234))
+
+    def test_wrong_token(self):
+        """Check that workers without the token get no Tasks."""
+        coordinator = self._coordinator()
+        try:
+            for hello in [{distributed.WORKER_KEY: 'intruder'},
+                          {distributed.WORKER_KEY: 'intruder',
+                           distributed.TOKEN_KEY: 'guess'}]:
+                with socket.create_connection(coordinator.address) as sock:
+                    with sock.makefile('rwb') as stream:
+                        send_message(stream, hello)
+                        self.assertIsNone(read_message(stream))
+        finally:
+            coordinator.close()
+
+    def test_check_students(self):
+        """Check that the Tasks of all students are checked by workers."""
+        coordinator = self._coordinator()
+        try:
+            for _ in range(2):
+                self._start_worker(coordinator)
+            checked = list(coordinator.check_students(
+                [self._code_folder] * 3))
+            results = coordinator.check_homework()
+        finally:
+            coordinator.close()
+        self.assertEqual(len(checked), 3)
+        for student_folder, student_results, timings in checked:
+            self.assertEqual(student_folder, self._code_folder)
+            self.assertTrue(student_results['Homework 2']['Task 2']
+                            ['Test 1'].succeeded())
+            self.assertIn('Task 2', timings['Homework 2'])
+        self.assertTrue(results['Homework 2']['Task 2']['Test 1'].succeeded())
+
+    def test_retry(self):
+        """Check that the Task of a failed worker is handed out again."""
+        coordinator = self._coordinator()
+        try:
+            self._start_broken_worker(coordinator, error='Broken.')
+            results = coordinator.check_homework()
+        finally:
+            coordinator.close()
+        self.assertTrue(results['Homework 2']['Task 2']['Test 1'].succeeded())
+
+    def test_lost_worker(self):
+        """Check that Tasks of silent workers fail after all retries."""
+        coordinator = self._coordinator(retries=0, heartbeat_timeout=0.5)
+        try:
+            self._start_broken_worker(coordinator)
+            results = coordinator.check_homework()
+        finally:
+            coordinator.close()
+        failed = results['Homework 2']['Task 2'][distributed.CHECK_FAILED_TAG]
+        self.assertFalse(failed.succeeded())
+        self.assertIn("worker 'broken@", failed.stderr)
+
+    def test_heartbeats(self):
+        """Check that workers are not lost while they send heartbeats."""
+        coordinator = self._coordinator(retries=0, heartbeat_timeout=0.5)
+        try:
+            worker = distributed.Worker(coordinator.address, TOKEN,
+                                        SlowJobs(), heartbeat_interval=0.1)
+            thread = threading.Thread(target=worker.work)
+            thread.start()
+            self._threads.append(thread)
+            results = coordinator.check_homework()
+        finally:
+            coordinator.close()
+        self.assertTrue(results['Homework 2']['Task 2']['Test 1'].succeeded())
@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+"""Test the jobserver."""
+
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from os import path
+from shutil import rmtree
+
+from ipb_homework_checker import tools
+from ipb_homework_checker.jobserver import JobServer
+
+MAKEFILE = """all: a b c d
+a b c d:
+\t@mkdir running_$@ && ls -d running_* | wc -l > count_$@
+\t@sleep 0.2
+\t@rmdir running_$@
+"""
+SLOW_MAKEFILE = """all: a b c
+a b c:
+\t@sleep 10
+"""
+
+
+class TestJobServer(unittest.TestCase):
+    """Test the jobserver."""
+
+    def setUp(self):
+        """Create folders with a makefile of independent jobs."""
+        self._temp_folder = tempfile.mkdtemp()
+        self._folders = []
+        for i in range(2):
+            folder = path.join(self._temp_folder, str(i))
+            tools.create_folder_if_needed(folder)
+            with open(path.join(folder, 'Makefile'), 'w') as makefile:
+                makefile.write(MAKEFILE)
+            self._folders.append(folder)
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        rmtree(self._temp_folder)
+
+    def _make(self, jobserver, folder):
+        with jobserver.slot() as job_slot:
+            return tools.run_command('make', cwd=folder,
+                                     env=job_slot.env(),
+                                     pass_fds=job_slot.pass_fds)
+
+    def _peak(self, folder):
+        peak = 0
+        for job in 'abcd':
+            with open(path.join(folder, 'count_' + job)) as count_file:
+                peak = max(peak, int(count_file.read()))
+        return peak
+
+    def test_make_uses_tokens(self):
+        """Check that make runs as many jobs as there are tokens."""
+        jobserver = JobServer(jobs=2)
+        self.assertTrue(self._make(jobserver, self._folders[0]).succeeded())
+        self.assertEqual(self._peak(self._folders[0]), 2)
+
+    def test_shared_budget(self):
+        """Check that builds running at the same time share the tokens."""
+        jobserver = JobServer(jobs=1)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(
+                lambda folder: self._make(jobserver, folder), self._folders))
+        for result, folder in zip(results, self._folders):
+            self.assertTrue(result.succeeded())
+            self.assertEqual(self._peak(folder), 1)
+
+    def test_lost_tokens(self):
+        """Check that tokens of a killed build are put back right away."""
+        jobserver = JobServer(jobs=4)
+        slow_folder = path.join(self._temp_folder, 'slow')
+        tools.create_folder_if_needed(slow_folder)
+        with open(path.join(slow_folder, 'Makefile'), 'w') as makefile:
+            makefile.write(SLOW_MAKEFILE)
+        # Another build keeps running all the time. It holds the token of its
+        # first job and a spare one.
+        with jobserver.slot():
+            # The make killed on the timeout never writes its tokens back.
+            result = jobserver.run('make', cwd=slow_folder, timeout=1)
+            self.assertTrue(result.timed_out)
+            self.assertTrue(
+                self._make(jobserver, self._folders[0]).succeeded())
+            self.assertEqual(self._peak(self._folders[0]), 2)
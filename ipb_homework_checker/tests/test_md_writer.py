@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+"""Test the markdown writer."""
+
+import re
+import tempfile
+import unittest
+from os import path
+from shutil import rmtree
+
+from ipb_homework_checker import tools
+from ipb_homework_checker.md_writer import MdWriter
+
+
+class TestMdWriter(unittest.TestCase):
+    """Test the markdown writer."""
+
+    def setUp(self):
+        """Create results with a long error."""
+        self._temp_folder = tempfile.mkdtemp()
+        self._md_file = path.join(self._temp_folder, 'report.md')
+        self._results = {'Homework 1': {'Task 1': {
+            'Test 1': tools.CmdResult.success(),
+            'Test 2': tools.CmdResult(returncode=1,
+                                      stdout='short',
+                                      stderr='error\n' * 100),
+        }}}
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        rmtree(self._temp_folder)
+
+    def _write(self, md_writer):
+        md_writer.update(self._results)
+        md_writer.write_md_file(self._md_file)
+        with open(self._md_file) as md_file:
+            return md_file.read()
+
+    def test_closed_errors(self):
+        """Check that the temporary file with the errors is closed."""
+        md_writer = MdWriter()
+        self._write(md_writer)
+        self.assertTrue(md_writer._errors.closed)
+
+    def test_full_errors(self):
+        """Check that errors are kept in full without a limit."""
+        report = self._write(MdWriter(max_error_size=None))
+        self.assertIn('| Homework 1 | Task 1 | Test 1 | ✔ |', report)
+        self.assertIn('|  |  | Test 2 | ✘ |', report)
+        self.assertEqual(report.count('error\n'), 100)
+        self.assertNotIn('Truncated', report)
+
+    def test_truncated_errors(self):
+        """Check that long errors are cut."""
+        report = self._write(MdWriter(max_error_size=60))
+        self.assertEqual(report.count('error\n'), 10)
+        self.assertIn('*Truncated 540 more characters.*', report)
+        self.assertIn('short', report)
+
+    def test_error_logs(self):
+        """Check that the full output that is cut is linked."""
+        logs_folder = path.join(self._temp_folder, 'report_logs')
+        report = self._write(MdWriter(max_error_size=60,
+                                      logs_folder=logs_folder))
+        log_names = re.findall(r'\[full log\]\(report_logs/([^)]+)\)', report)
+        self.assertEqual(len(log_names), 1)
+        self.assertRegex(log_names[0],
+                         r'^Homework_1_Task_1_Test_2_[0-9a-f]{8}\.stderr')
+        with open(path.join(logs_folder, log_names[0])) as log_file:
+            self.assertEqual(log_file.read(), 'error\n' * 100)
+
+    def test_error_log_names(self):
+        """Check that tests with the same name in a file get own logs."""
+        self._results['Homework 1']['Task 1']['Test_2'] = tools.CmdResult(
+            returncode=1, stderr='other\n' * 100)
+        logs_folder = path.join(self._temp_folder, 'report_logs')
+        report = self._write(MdWriter(max_error_size=60,
+                                      logs_folder=logs_folder))
+        log_names = re.findall(r'\[full log\]\(report_logs/([^)]+)\)', report)
+        self.assertEqual(len(set(log_names)), 2)
+        contents = set()
+        for log_name in log_names:
+            with open(path.join(logs_folder, log_name)) as log_file:
+                contents.add(log_file.read())
+        self.assertEqual(contents, {'error\n' * 100, 'other\n' * 100})
+
+    def test_skipped(self):
+        """Check that skipped tests are marked with the reason."""
+        self._results['Homework 1']['Task 1']['Test 3'] = \
+            tools.CmdResult.skip('no time')
+        report = self._write(MdWriter())
+        self.assertIn('|  |  | Test 3 | ⏭ |', report)
+        self.assertIn('`[Homework 1][Task 1][Test 3]:`\n\n*Skipped: no time*',
+                      report)
@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+"""Test the compilation of plans."""
+
+import unittest
+
+from ipb_homework_checker import plan
+from ipb_homework_checker.schema_tags import Tags, LangTags, OutputTags
+from ipb_homework_checker.schema_tags import BuildTags, LimitTags, PrebuiltTags
+
+
+class TestPlan(unittest.TestCase):
+    """Test the compilation of plans."""
+
+    def test_compile_task(self):
+        """Check that a Task is compiled with everything resolved."""
+        task_node = {
+            Tags.NAME_TAG: 'Task',
+            Tags.LANGUAGE_TAG: LangTags.CPP,
+            Tags.FOLDER_TAG: 'task',
+            Tags.OUTPUT_TYPE_TAG: OutputTags.NUMBER,
+            Tags.BINARY_NAME_TAG: 'sum',
+            Tags.BUILD_TYPE_TAG: BuildTags.SIMPLE,
+            Tags.COMPILER_FLAGS_TAG: '-Wall',
+            Tags.PIPE_TAG: '| head -n 1',
+            Tags.LIMITS_TAG: {LimitTags.CPU_SECONDS: 2,
+                              LimitTags.OPEN_FILES: 16},
+            Tags.TESTS_TAG: [{
+                Tags.NAME_TAG: 'Test',
+                Tags.INPUT_TAG: '2 2',
+                Tags.EXPECTED_OUTPUT_TAG: '4',
+                Tags.RUN_GTESTS_TAG: False,
+                Tags.INJECT_FOLDER_TAG: ['solutions/pass'],
+                Tags.LIMITS_TAG: {LimitTags.CPU_SECONDS: 1},
+            }],
+        }
+        task_plan = plan.compile_task(task_node, '/job/job.yml')
+        self.assertEqual(task_plan.name, 'Task')
+        self.assertFalse(task_plan.stream_output)
+        self.assertIsNone(task_plan.fail_fast)
+        self.assertFalse(task_plan.skip_on_crash)
+        self.assertIsNone(task_plan.time_budget)
+        self.assertEqual(task_plan.inject_folders, ())
+        self.assertEqual(task_plan.all_inject_folders,
+                         ('/job/solutions/pass',))
+        test_plan = task_plan.tests[0]
+        self.assertEqual(test_plan.command, './sum 2 2 | head -n 1')
+        self.assertEqual(test_plan.expected_output, 4.0)
+        self.assertEqual(test_plan.inject_folders,
+                         (('pass', '/job/solutions/pass'),))
+        self.assertEqual(dict(test_plan.limits),
+                         {LimitTags.CPU_SECONDS: 1, LimitTags.OPEN_FILES: 16})
+        with self.assertRaises(AttributeError):
+            test_plan.command = 'rm -rf /'
+        # The plan only changes if the job node changes.
+        self.assertEqual(
+            task_plan.node_hash,
+            plan.compile_task(task_node, '/job/job.yml').node_hash)
+        task_node[Tags.COMPILER_FLAGS_TAG] = '-Wall -Werror'
+        self.assertNotEqual(
+            task_plan.node_hash,
+            plan.compile_task(task_node, '/job/job.yml').node_hash)
+
+    def test_compile_prebuilt(self):
+        """Check that the prebuilt dependencies are resolved."""
+        self.assertIsNone(plan.compile_prebuilt(None, '/job/job.yml'))
+        prebuilt_plan = plan.compile_prebuilt({
+            PrebuiltTags.GTEST_FOLDER: 'gtest',
+            PrebuiltTags.HEADERS: ['vector'],
+            PrebuiltTags.HEADER_FLAGS: '-std=c++14',
+        }, '/job/job.yml')
+        self.assertEqual(prebuilt_plan.gtest_folder, '/job/gtest')
+        self.assertEqual(prebuilt_plan.headers, ('vector',))
+        self.assertEqual(prebuilt_plan.header_flags, '-std=c++14')
@@ -0,0 +1,107 @@
+#!/usr/bin/python3
+"""Test the prebuilt dependencies."""
+
+import tempfile
+import unittest
+from os import path
+from shutil import copytree, rmtree
+
+from ipb_homework_checker import tools
+from ipb_homework_checker.plan import PrebuiltPlan
+from ipb_homework_checker.prebuilt import Prebuilt
+
+
+class TestPrebuilt(unittest.TestCase):
+    """Test the prebuilt dependencies."""
+
+    def setUp(self):
+        """Copy a Task with google tests to a temporary folder."""
+        self._temp_folder = tempfile.mkdtemp()
+        self._task_folder = path.join(self._temp_folder, 'task')
+        copytree(path.join(path.dirname(__file__),
+                           'data', 'homework', 'homework_3', 'cpptests'),
+                 self._task_folder)
+        self._plan = PrebuiltPlan(gtest_folder=path.realpath('/usr/src/gtest'),
+                                  headers=('vector', 'gtest/gtest.h'),
+                                  header_flags='')
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        rmtree(self._temp_folder)
+
+    def test_build_with_prebuilt(self):
+        """Check that a student build uses the prebuilt dependencies."""
+        prebuilt_folder = path.join(self._temp_folder, 'prebuilt')
+        cmake_args = Prebuilt(self._plan, prebuilt_folder).cmake_args()
+        self.assertIn('CMAKE_PROJECT_INCLUDE', cmake_args)
+        build_folder = path.join(self._task_folder, 'build')
+        tools.create_folder_if_needed(build_folder)
+        build_result = tools.run_command(
+            'cmake {} .. && make VERBOSE=1'.format(cmake_args),
+            cwd=build_folder, timeout=60)
+        self.assertTrue(build_result.succeeded())
+        # GoogleTest itself is not built again.
+        self.assertNotIn('gtest-all.cc', build_result.stdout)
+        self.assertIn('-include', build_result.stdout)
+        self.assertTrue(tools.run_command(
+            'ctest', cwd=build_folder).succeeded())
+        # The dependencies are reused from the folder.
+        self.assertEqual(
+            cmake_args, Prebuilt(self._plan, prebuilt_folder).cmake_args())
+
+    def test_many_projects(self):
+        """Check that projects calling project() again still build."""
+        cmake_lists = path.join(self._task_folder, 'CMakeLists.txt')
+        with open(cmake_lists, 'a') as stream:
+            stream.write('project(other_project)\n'
+                         'add_subdirectory(other)\n')
+        copytree(path.join(self._task_folder, 'tests'),
+                 path.join(self._task_folder, 'other'))
+        with open(path.join(self._task_folder, 'other', 'CMakeLists.txt'),
+                  'r') as stream:
+            contents = stream.read()
+        with open(path.join(self._task_folder, 'other', 'CMakeLists.txt'),
+                  'w') as stream:
+            stream.write(contents.replace('my_tests', 'other_tests'))
+        prebuilt_folder = path.join(self._temp_folder, 'prebuilt')
+        cmake_args = Prebuilt(self._plan, prebuilt_folder).cmake_args()
+        build_folder = path.join(self._task_folder, 'build')
+        tools.create_folder_if_needed(build_folder)
+        build_result = tools.run_command(
+            'cmake {} .. && make'.format(cmake_args),
+            cwd=build_folder, timeout=60)
+        self.assertTrue(build_result.succeeded(), build_result.stderr)
+
+    def test_student_subdirectory(self):
+        """Check that the code of a student never gets the prebuilt headers."""
+        student_folder = path.join(self._task_folder, 'student')
+        tools.create_folder_if_needed(student_folder)
+        with open(path.join(student_folder, 'CMakeLists.txt'), 'w') as stream:
+            stream.write('add_library(student student.cpp)\n')
+        # The header is missing, so this only compiles with the headers
+        # precompiled for the google tests.
+        with open(path.join(student_folder, 'student.cpp'), 'w') as stream:
+            stream.write('int Size() { return std::vector<int>{1}.size(); }\n')
+        with open(path.join(self._task_folder, 'CMakeLists.txt'),
+                  'a') as stream:
+            stream.write('add_subdirectory(student)\n')
+        prebuilt_folder = path.join(self._temp_folder, 'prebuilt')
+        cmake_args = Prebuilt(self._plan, prebuilt_folder).cmake_args()
+        build_folder = path.join(self._task_folder, 'build')
+        tools.create_folder_if_needed(build_folder)
+        build_result = tools.run_command(
+            'cmake {} .. && make -k VERBOSE=1'.format(cmake_args),
+            cwd=build_folder, timeout=60)
+        self.assertFalse(build_result.succeeded())
+        self.assertRegex(build_result.stderr,
+                         r'student\.cpp:.*error: .vector. is not a member')
+        # The google tests and the student subdirectory are still built.
+        self.assertTrue(path.exists(
+            path.join(build_folder, 'tests', 'my_tests')))
+        self.assertIn('student.cpp', build_result.stdout)
+
+    def test_failed_build(self):
+        """Check that students build everything if prebuilding fails."""
+        plan = self._plan._replace(
+            gtest_folder=path.join(self._temp_folder, 'missing'))
+        self.assertEqual(Prebuilt(plan).cmake_args(), '')
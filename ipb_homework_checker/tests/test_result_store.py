@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+"""Test the result store."""
+
+import tempfile
+import unittest
+from os import path
+from shutil import copytree, rmtree
+
+from ipb_homework_checker import plan
+from ipb_homework_checker import tools
+from ipb_homework_checker.result_store import ResultStore
+from ipb_homework_checker.schema_tags import Tags, LangTags, OutputTags
+
+
+class TestResultStore(unittest.TestCase):
+    """Test the result store."""
+
+    def setUp(self):
+        """Copy a job folder to a temporary folder."""
+        self._temp_folder = tempfile.mkdtemp()
+        self._job_folder = path.join(self._temp_folder, 'job')
+        copytree(path.join(path.dirname(__file__), 'data', 'homework'),
+                 self._job_folder)
+        self._task_folder = path.join(self._job_folder, 'homework_3',
+                                      'bashtests')
+        self._task_node = {
+            Tags.NAME_TAG: 'Bash',
+            Tags.LANGUAGE_TAG: LangTags.BASH,
+            Tags.FOLDER_TAG: 'bashtests',
+            Tags.OUTPUT_TYPE_TAG: OutputTags.STRING,
+            Tags.BINARY_NAME_TAG: 'ls_me',
+            Tags.BUILD_TYPE_TAG: '',
+            Tags.COMPILER_FLAGS_TAG: '',
+            Tags.PIPE_TAG: '',
+            Tags.TESTS_TAG: [{
+                Tags.NAME_TAG: 'ls',
+                Tags.INJECT_FOLDER_TAG: ['solutions/pass'],
+            }],
+        }
+        self._store = ResultStore(path.join(self._temp_folder, 'store'))
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        rmtree(self._temp_folder)
+
+    def _key(self):
+        task_plan = plan.compile_task(
+            self._task_node, path.join(self._job_folder, 'job.yml'))
+        return ResultStore(path.join(self._temp_folder, 'store')).key(
+            task_plan, self._task_folder)
+
+    def test_key(self):
+        """Check that the key changes with every input of a Task."""
+        key = self._key()
+        self.assertEqual(key, self._key())
+        with open(path.join(self._task_folder, 'ls_me.sh'), 'a') as script:
+            script.write('\n')
+        new_key = self._key()
+        self.assertNotEqual(key, new_key)
+        with open(path.join(self._job_folder, 'solutions', 'pass', 'tests',
+                            'test_dummy.cpp'), 'a') as injected:
+            injected.write('\n')
+        newer_key = self._key()
+        self.assertNotEqual(new_key, newer_key)
+        self._task_node[Tags.TESTS_TAG][0][Tags.NAME_TAG] = 'other'
+        self.assertNotEqual(newer_key, self._key())
+
+    def test_store_and_load(self):
+        """Check that the stored results are restored in the same order."""
+        key = self._key()
+        self.assertIsNone(self._store.load(key))
+        results = {
+            'Test 2': tools.CmdResult(returncode=0, stdout='out'),
+            'Test 1': tools.CmdResult(returncode=1, stderr='error'),
+        }
+        self._store.store(key, results)
+        restored = self._store.load(key)
+        self.assertEqual(list(restored), ['Test 2', 'Test 1'])
+        self.assertTrue(restored['Test 2'].succeeded())
+        self.assertEqual(restored['Test 2'].stdout, 'out')
+        self.assertFalse(restored['Test 1'].succeeded())
+        self.assertEqual(restored['Test 1'].stderr, 'error')
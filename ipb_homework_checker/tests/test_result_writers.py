@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+"""Test the writers of results in machine readable formats."""
+
+import tempfile
+import unittest
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime
+from os import path
+from shutil import rmtree
+
+from ipb_homework_checker import tools
+from ipb_homework_checker.result_writers import JsonWriter, JUnitWriter
+from ipb_homework_checker.result_writers import SqliteWriter
+
+
+class TestResultWriters(unittest.TestCase):
+    """Test the writers of results in machine readable formats."""
+
+    def setUp(self):
+        """Create results of two homeworks, one of them expired."""
+        self._temp_folder = tempfile.mkdtemp()
+        self._results = {
+            'Homework 1': {'Task 1': {
+                'Test 1': tools.CmdResult(returncode=0, stdout='4',
+                                          wall_time=0.5),
+                'Test 2': tools.CmdResult(returncode=1, stdout='5',
+                                          stderr='wrong \x1b[31mresult'),
+            }},
+            'Homework 2': {
+                tools.EXPIRED_TAG: True,
+                'Task 1': {'Test 1': tools.CmdResult.success()},
+            },
+        }
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        rmtree(self._temp_folder)
+
+    def test_json(self):
+        """Check that the results are read back from json."""
+        json_file = path.join(self._temp_folder, 'report.json')
+        writer = JsonWriter()
+        writer.update(self._results)
+        writer.write_file(json_file)
+        results = JsonWriter.read_file(json_file)
+        self.assertTrue(results['Homework 2'][tools.EXPIRED_TAG])
+        for hw_name, task_name, test_name in [
+                ('Homework 1', 'Task 1', 'Test 1'),
+                ('Homework 1', 'Task 1', 'Test 2'),
+                ('Homework 2', 'Task 1', 'Test 1')]:
+            self.assertEqual(
+                results[hw_name][task_name][test_name].to_dict(),
+                self._results[hw_name][task_name][test_name].to_dict())
+
+    def test_junit(self):
+        """Check that every Task is a test suite of its tests."""
+        xml_file = path.join(self._temp_folder, 'report.xml')
+        writer = JUnitWriter()
+        writer.update(self._results)
+        writer.write_file(xml_file)
+        root = ElementTree.parse(xml_file).getroot()
+        suites = root.findall('testsuite')
+        self.assertEqual([suite.get('name') for suite in suites],
+                         ['Homework 1/Task 1', 'Homework 2/Task 1'])
+        self.assertEqual(suites[0].get('tests'), '2')
+        self.assertEqual(suites[0].get('failures'), '1')
+        cases = suites[0].findall('testcase')
+        self.assertEqual(cases[0].get('time'), '0.500')
+        self.assertIsNone(cases[0].find('failure'))
+        self.assertEqual(cases[1].find('failure').text, 'wrong [31mresult')
+        self.assertEqual(cases[1].find('system-out').text, '5')
+        self.assertIsNotNone(suites[1].find('properties'))
+
+    def test_sqlite(self):
+        """Check that the results of many runs are found by any column."""
+        db_file = path.join(self._temp_folder, 'results.db')
+        for day in [1, 2]:
+            writer = SqliteWriter(db_file, run_time=datetime(2019, 4, day))
+            writer.update('student_1', self._results)
+            writer.update('student_2', self._results)
+            writer.close()
+        writer = SqliteWriter(db_file)
+        self.assertEqual(len(writer.find()), 12)
+        rows = writer.find(student='student_1', homework='Homework 1',
+                           task='Task 1', test='Test 2')
+        self.assertEqual([row['run_time'] for row in rows],
+                         ['2019-04-01 00:00:00', '2019-04-02 00:00:00'])
+        self.assertFalse(rows[0]['succeeded'])
+        self.assertEqual(rows[0]['stdout'], '5')
+        rows = writer.find(homework='Homework 2')
+        self.assertTrue(all(row['expired'] for row in rows))
+        with self.assertRaises(ValueError):
+            writer.find(stdout='5')
+        writer.close()
+
+    def test_skipped(self):
+        """Check that skipped tests are marked in every format."""
+        results = {'Homework 1': {'Task 1': {
+            'Test 1': tools.CmdResult.skip('no time')}}}
+        writer = JUnitWriter()
+        writer.update(results)
+        xml_file = path.join(self._temp_folder, 'report.xml')
+        writer.write_file(xml_file)
+        suite = ElementTree.parse(xml_file).getroot().find('testsuite')
+        self.assertEqual(suite.get('skipped'), '1')
+        self.assertEqual(suite.get('failures'), '0')
+        self.assertEqual(suite.find('testcase/skipped').get('message'),
+                         'Skipped: no time')
+        writer = JsonWriter()
+        writer.update(results)
+        json_file = path.join(self._temp_folder, 'report.json')
+        writer.write_file(json_file)
+        self.assertTrue(JsonWriter.read_file(
+            json_file)['Homework 1']['Task 1']['Test 1'].skipped)
+        writer = SqliteWriter(path.join(self._temp_folder, 'results.db'))
+        writer.update('student', results)
+        self.assertTrue(writer.find()[0]['skipped'])
+        writer.close()
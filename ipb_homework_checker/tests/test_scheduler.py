@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+"""Test the stage scheduler."""
+
+import threading
+import time
+import unittest
+
+from ipb_homework_checker.scheduler import StageBudgets, PipelineExecutor
+from ipb_homework_checker.scheduler import TimeBudget
+
+
+class TestScheduler(unittest.TestCase):
+    """Test the stage scheduler."""
+
+    def test_budgets(self):
+        """Check that no budget is exceeded while stages overlap."""
+        lock = threading.Lock()
+        running = {StageBudgets.BUILD: 0, StageBudgets.TEST: 0}
+        peaks = {StageBudgets.BUILD: 0, StageBudgets.TEST: 0}
+        overlaps = []
+
+        def stage(budgets, name):
+            with budgets.slot(name):
+                with lock:
+                    running[name] += 1
+                    peaks[name] = max(peaks[name], running[name])
+                    overlaps.append(all(running.values()))
+                time.sleep(0.05)
+                with lock:
+                    running[name] -= 1
+
+        def build(budgets):
+            stage(budgets, StageBudgets.BUILD)
+            return budgets
+
+        def test(budgets):
+            stage(budgets, StageBudgets.TEST)
+            return True
+
+        with PipelineExecutor(build_jobs=2, test_jobs=1) as executor:
+            futures = [executor.submit(build, test, executor.budgets)
+                       for _ in range(6)]
+            for future in futures:
+                self.assertTrue(future.result())
+        self.assertEqual(peaks[StageBudgets.BUILD], 2)
+        self.assertEqual(peaks[StageBudgets.TEST], 1)
+        # Some Task was tested while another one was built.
+        self.assertTrue(any(overlaps))
+
+    def test_build_while_tests_are_busy(self):
+        """Check that builds go on while all test slots are busy."""
+        tests_done = threading.Event()
+        built = []
+
+        def build(name):
+            built.append(name)
+            return name
+
+        def test(name):
+            tests_done.wait(10)
+            return name
+
+        with PipelineExecutor(build_jobs=1, test_jobs=1) as executor:
+            futures = [executor.submit(build, test, name)
+                       for name in ['first', 'second', 'third']]
+            # The first Task holds the only test slot, the second one waits
+            # for it, yet the third one is built.
+            deadline = time.monotonic() + 5
+            while len(built) < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(built, ['first', 'second', 'third'])
+            self.assertFalse(any(future.done() for future in futures))
+            tests_done.set()
+        self.assertEqual([future.result() for future in futures],
+                         ['first', 'second', 'third'])
+
+    def test_failed_stage(self):
+        """Check that the errors of both stages end up in the future."""
+        def fail(*_):
+            raise ValueError('failed')
+
+        with PipelineExecutor(build_jobs=1, test_jobs=1) as executor:
+            failed_build = executor.submit(fail, str, 'unused')
+            failed_test = executor.submit(str, fail, 'unused')
+        self.assertRaises(ValueError, failed_build.result)
+        self.assertRaises(ValueError, failed_test.result)
+
+    def test_unbounded(self):
+        """Check that stages without a budget run right away."""
+        budgets = StageBudgets()
+        with budgets.slot(StageBudgets.BUILD), \
+                budgets.slot(StageBudgets.BUILD):
+            pass
+
+    def test_time_budget(self):
+        """Check that a time budget is only spent once it is started."""
+        budget = TimeBudget(0.05)
+        time.sleep(0.1)
+        self.assertFalse(budget.spent())
+        self.assertIsNone(budget.remaining())
+        budget.start()
+        self.assertFalse(budget.spent())
+        self.assertGreater(budget.remaining(), 0)
+        time.sleep(0.1)
+        # Starting again does not restart the clock.
+        budget.start()
+        self.assertTrue(budget.spent())
+        self.assertEqual(budget.remaining(), 0)
+        unbounded = TimeBudget()
+        unbounded.start()
+        self.assertFalse(unbounded.spent())
+        self.assertIsNone(unbounded.remaining())
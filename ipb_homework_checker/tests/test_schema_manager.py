@@ -0,0 +1,40 @@
+#!/usr/bin/python3
+"""Test the schema manager."""
+
+import tempfile
+import unittest
+from os import listdir
+from shutil import rmtree
+
+from ipb_homework_checker import tools
+from ipb_homework_checker.schema_manager import SchemaManager
+from ipb_homework_checker.schema_tags import Tags
+
+
+class TestSchemaManager(unittest.TestCase):
+    """Test the schema manager."""
+
+    def setUp(self):
+        """Create a temporary cache folder."""
+        self._cache_folder = tempfile.mkdtemp()
+        self._job_file = tools.expand_if_needed(
+            'ipb_homework_checker/tests/data/homework/example_job.yml')
+
+    def tearDown(self):
+        """Remove the temporary cache folder."""
+        rmtree(self._cache_folder)
+
+    def test_cached_job(self):
+        """Check that a cached job is the same as a validated one."""
+        validated_yaml = SchemaManager(self._job_file).validated_yaml
+        first_yaml = SchemaManager(
+            self._job_file, cache_folder=self._cache_folder).validated_yaml
+        self.assertEqual(len(listdir(self._cache_folder)), 1)
+        cached_yaml = SchemaManager(
+            self._job_file, cache_folder=self._cache_folder).validated_yaml
+        self.assertEqual(len(listdir(self._cache_folder)), 1)
+        self.assertEqual(validated_yaml, first_yaml)
+        self.assertEqual(validated_yaml, cached_yaml)
+        task_node = cached_yaml[Tags.HOMEWORKS_TAG][0][Tags.TASKS_TAG][2]
+        test_node = task_node[Tags.TESTS_TAG][0]
+        self.assertEqual(test_node[Tags.EXPECTED_OUTPUT_TAG], 4)
@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+"""Test the style checker."""
+
+import os
+import tempfile
+import unittest
+from os import path
+from shutil import copytree, rmtree
+
+from ipb_homework_checker.style_checker import StyleChecker
+
+
+class TestStyleChecker(unittest.TestCase):
+    """Test the style checker."""
+
+    def setUp(self):
+        """Copy a Task folder to a temporary folder."""
+        self._temp_folder = tempfile.mkdtemp()
+        self._task_folder = path.join(self._temp_folder, 'task')
+        copytree(path.join(path.dirname(__file__),
+                           'data', 'homework', 'homework_1', 'task_4'),
+                 self._task_folder)
+        self._cache_folder = path.join(self._temp_folder, 'cache')
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        rmtree(self._temp_folder)
+
+    def test_errors(self):
+        """Check that the errors of all files are aggregated."""
+        result = StyleChecker(jobs=2).check(self._task_folder)
+        self.assertIsNotNone(result)
+        self.assertIn("Total errors found", result.stderr)
+        self.assertIn("./main.cpp:", result.stderr)
+
+    def test_cache(self):
+        """Check that cached errors give the same result."""
+        result = StyleChecker(
+            cache_folder=self._cache_folder).check(self._task_folder)
+        cached_result = StyleChecker(
+            cache_folder=self._cache_folder).check(self._task_folder)
+        self.assertEqual(result.stderr, cached_result.stderr)
+        self.assertEqual(result.stdout, cached_result.stdout)
+
+    def test_changed_file(self):
+        """Check that a changed file is linted again."""
+        style_checker = StyleChecker(cache_folder=self._cache_folder)
+        style_checker.check(self._task_folder)
+        with open(path.join(self._task_folder, 'main.cpp'), 'a') as source:
+            source.write('int  x = 0;    \n')
+        result = style_checker.check(self._task_folder)
+        self.assertIn("whitespace/end_of_line", result.stderr)
+
+    def test_shared_headers(self):
+        """Check that headers at the same place in two repositories share."""
+        style_checker = StyleChecker(cache_folder=self._cache_folder)
+        for student in ['student_1', 'student_2']:
+            task_folder = path.join(self._temp_folder, student, 'task')
+            copytree(self._task_folder, task_folder)
+            os.makedirs(path.join(self._temp_folder, student, '.git'))
+            with open(path.join(task_folder, 'foo.h'), 'w') as header:
+                header.write('#ifndef TASK_FOO_H_\n#define TASK_FOO_H_\n'
+                             '#endif  // TASK_FOO_H_\n')
+            style_checker.check(task_folder)
+        self.assertEqual(len(os.listdir(self._cache_folder)), 2)
@@ -1,11 +1,18 @@
 #!/usr/bin/python3
 """Test the checker."""
 
+import tempfile
+import time
 import unittest
 from os import path
+from shutil import rmtree
+from unittest import mock
 
 
+from ipb_homework_checker import tools
+from ipb_homework_checker.build_cache import BuildCache
 from ipb_homework_checker.checker import Checker
+from ipb_homework_checker.scheduler import TimeBudget
 from ipb_homework_checker.tasks import Task
 from ipb_homework_checker.schema_tags import Tags
 
@@ -29,14 +36,16 @@ class TestTask(unittest.TestCase):
         self.assertTrue(path.exists(task._student_task_folder))
         folder_to_inject = 'blah'
         task._inject_folder(folder_to_inject, folder_to_inject)
-        self.assertTrue(path.isdir(task._backup_folder))
         self.assertTrue(path.exists(
             path.join(task._student_task_folder, folder_to_inject, 'blah.cpp')))
+        # The student folder itself is never changed.
+        self.assertFalse(path.exists(
+            path.join(current_folder, folder_to_inject)))
         task._revert_injections(folder_to_inject)
         self.assertFalse(path.isdir(
-            path.join(task._backup_folder, folder_to_inject)))
-        self.assertFalse(path.exists(
-            path.join(task._backup_folder, folder_to_inject, 'blah.cpp')))
+            path.join(task._student_task_folder, folder_to_inject)))
+        task.cleanup()
+        self.assertFalse(path.exists(task._student_task_folder))
 
     def test_injecting_existing(self):
         """Check that we can inject folders that are now present yet."""
@@ -52,21 +61,175 @@ class TestTask(unittest.TestCase):
                                    student_hw_folder=current_folder,
                                    job_file=checker._job_file_path)
         self.assertTrue(path.exists(task._student_task_folder))
-        folder_to_inject = 'tests'
-        task._inject_folder(folder_to_inject, folder_to_inject)
-        self.assertTrue(path.isdir(task._backup_folder))
+        # Replace the existing tests folder by the blah folder.
+        folder_to_replace = 'tests'
+        task._inject_folder(folder_to_replace, 'blah')
+        self.assertTrue(path.exists(path.join(task._student_task_folder,
+                                              folder_to_replace,
+                                              'blah.cpp')))
+        self.assertFalse(path.exists(path.join(task._student_task_folder,
+                                               folder_to_replace,
+                                               'CMakeLists.txt')))
+        # The student folder itself is never changed.
+        self.assertFalse(path.exists(path.join(current_folder,
+                                               folder_to_replace,
+                                               'blah.cpp')))
+        task._revert_injections(folder_to_replace)
         self.assertTrue(path.exists(path.join(task._student_task_folder,
-                                              folder_to_inject,
+                                              folder_to_replace,
                                               'CMakeLists.txt')))
         self.assertTrue(path.exists(path.join(task._student_task_folder,
-                                              folder_to_inject,
+                                              folder_to_replace,
                                               'test_dummy.cpp')))
-        task._revert_injections(folder_to_inject)
-        self.assertFalse(path.isdir(
-            path.join(task._backup_folder, folder_to_inject)))
-        self.assertFalse(path.exists(path.join(task._backup_folder,
-                                               folder_to_inject,
-                                               'CMakeLists.txt')))
-        self.assertFalse(path.exists(path.join(task._backup_folder,
-                                               folder_to_inject,
-                                               'test_dummy.cpp')))
+        self.assertFalse(path.exists(path.join(task._student_task_folder,
+                                               folder_to_replace,
+                                               'blah.cpp')))
+        task.cleanup()
+
+    def test_google_tests_grouped_by_injections(self):
+        """Check that google tests with same injections run one by one."""
+        checker = Checker(
+            'ipb_homework_checker/tests/data/homework/example_job.yml')
+        homework_node = checker._base_node[Tags.HOMEWORKS_TAG][2]
+        current_folder = path.join(
+            checker._checked_code_folder, homework_node[Tags.FOLDER_TAG])
+        task_node = dict(homework_node[Tags.TASKS_TAG][0])
+        pass_node, fail_node = task_node[Tags.TESTS_TAG][1:]
+        task_node[Tags.TESTS_TAG] = task_node[Tags.TESTS_TAG] + [
+            dict(pass_node, name='Inject pass again')]
+        task = Task.from_yaml_node(task_node=task_node,
+                                   student_hw_folder=current_folder,
+                                   job_file=checker._job_file_path)
+        task._built_injections = ()
+        ordered_names = [test.name for test in task._ordered_tests()]
+        self.assertEqual(ordered_names, ['Just build',
+                                         'Inject pass',
+                                         'Inject pass again',
+                                         'Inject fail'])
+        task.cleanup()
+
+    def test_google_tests_timeout_after_rebuild(self):
+        """Check that a hanging google test after a rebuild is reported."""
+        checker = Checker(
+            'ipb_homework_checker/tests/data/homework/example_job.yml')
+        homework_node = checker._base_node[Tags.HOMEWORKS_TAG][2]
+        current_folder = path.join(
+            checker._checked_code_folder, homework_node[Tags.FOLDER_TAG])
+        task = Task.from_yaml_node(task_node=homework_node[Tags.TASKS_TAG][0],
+                                   student_hw_folder=current_folder,
+                                   job_file=checker._job_file_path)
+        timeout_result = tools.CmdResult(returncode=1, stderr='Timeout',
+                                         timed_out=True)
+        try:
+            with mock.patch.object(task, '_run_cmake_build',
+                                   return_value=tools.CmdResult(
+                                       returncode=0, stdout='built')), \
+                    mock.patch.object(tools, 'run_command',
+                                      return_value=timeout_result):
+                result = task._run_google_tests(task._tests[0])
+        finally:
+            task.cleanup()
+        self.assertFalse(result.succeeded())
+        self.assertTrue(result.timed_out)
+        self.assertEqual(result.stdout, 'built')
+        self.assertEqual(result.stderr, 'Timeout')
+
+    def test_google_tests_on_cache_hit(self):
+        """Check that google tests pass on a build restored from cache."""
+        checker = Checker(
+            'ipb_homework_checker/tests/data/homework/example_job.yml')
+        homework_node = checker._base_node[Tags.HOMEWORKS_TAG][2]
+        current_folder = path.join(
+            checker._checked_code_folder, homework_node[Tags.FOLDER_TAG])
+        cache_folder = tempfile.mkdtemp()
+        self.addCleanup(rmtree, cache_folder)
+        build_cache = BuildCache(cache_folder)
+
+        def check():
+            task = Task.from_yaml_node(
+                task_node=homework_node[Tags.TASKS_TAG][0],
+                student_hw_folder=current_folder,
+                job_file=checker._job_file_path,
+                build_cache=build_cache)
+            try:
+                with mock.patch.object(task, '_run_cmake_build',
+                                       wraps=task._run_cmake_build) as build:
+                    return task.check_all_tests(), build.call_count
+            finally:
+                task.cleanup()
+
+        results, build_count = check()
+        self.assertTrue(results['Just build'].succeeded())
+        self.assertEqual(build_count, 3)
+        results, build_count = check()
+        self.assertTrue(results['Just build'].succeeded(),
+                        results['Just build'].stderr)
+        self.assertTrue(results['Inject pass'].succeeded())
+        self.assertFalse(results['Inject fail'].succeeded())
+        # Only the tests that inject other folders build the code again.
+        self.assertEqual(build_count, 2)
+
+    def _bash_task(self, time_budget=None, **policies):
+        """Create a Task with three tests that fail and the given policies."""
+        checker = Checker(
+            'ipb_homework_checker/tests/data/homework/example_job.yml')
+        homework_node = checker._base_node[Tags.HOMEWORKS_TAG][1]
+        current_folder = path.join(
+            checker._checked_code_folder, homework_node[Tags.FOLDER_TAG])
+        task_node = dict(homework_node[Tags.TASKS_TAG][1], **policies)
+        task_node[Tags.TESTS_TAG] = [
+            {Tags.NAME_TAG: 'Test {}'.format(number),
+             Tags.EXPECTED_OUTPUT_TAG: 'wrong'}
+            for number in range(1, 4)]
+        return Task.from_yaml_node(task_node=task_node,
+                                   student_hw_folder=current_folder,
+                                   job_file=checker._job_file_path,
+                                   time_budget=time_budget)
+
+    def _check(self, task):
+        try:
+            results = task.check_all_tests()
+        finally:
+            task.cleanup()
+        return [results['Test {}'.format(number)] for number in range(1, 4)]
+
+    def test_fail_fast(self):
+        """Check that the tests after the allowed failures are skipped."""
+        results = self._check(self._bash_task(**{Tags.FAIL_FAST_TAG: 2}))
+        self.assertEqual([result.skipped for result in results],
+                         [False, False, True])
+        self.assertFalse(results[0].succeeded())
+        self.assertFalse(results[2].succeeded())
+        self.assertEqual(results[2].stderr,
+                         'Skipped: 2 tests have failed before')
+
+    def test_skip_on_crash(self):
+        """Check that the tests of a crashed binary are skipped."""
+        crash = {Tags.PIPE_TAG: '; kill -SEGV $$'}
+        results = self._check(self._bash_task(**crash))
+        self.assertTrue(all(result.crashed() for result in results))
+        results = self._check(self._bash_task(
+            **dict(crash, **{Tags.SKIP_ON_CRASH_TAG: True})))
+        self.assertEqual([result.skipped for result in results],
+                         [False, True, True])
+        self.assertTrue(results[0].crashed())
+
+    def test_time_budgets(self):
+        """Check that no tests start once a time budget is spent."""
+        results = self._check(self._bash_task(**{Tags.TIME_BUDGET_TAG: 0}))
+        self.assertTrue(all(result.skipped for result in results))
+        results = self._check(self._bash_task(time_budget=TimeBudget(0)))
+        self.assertTrue(all(result.skipped for result in results))
+        self.assertEqual(results[0].stderr,
+                         'Skipped: the time budget of 0 seconds is spent')
+        results = self._check(self._bash_task(time_budget=TimeBudget(60)))
+        self.assertFalse(any(result.skipped for result in results))
+
+    def test_time_budget_stops_test(self):
+        """Check that a running test stops once the time budget is spent."""
+        start = time.monotonic()
+        results = self._check(self._bash_task(
+            time_budget=TimeBudget(1), **{Tags.PIPE_TAG: '; sleep 30'}))
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertTrue(results[0].timed_out)
+        self.assertTrue(all(result.skipped for result in results[1:]))
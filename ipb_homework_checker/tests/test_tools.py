@@ -1,8 +1,10 @@
 #!/usr/bin/python3
 """Test the tools."""
 
+import tempfile
 import unittest
 from os import path
+from shutil import rmtree
 
 from ipb_homework_checker import tools
 from ipb_homework_checker.schema_tags import OutputTags
@@ -46,6 +48,20 @@ class TestTools(unittest.TestCase):
         self.assertEqual(
             cmd_result.stderr,
             "Timeout: command 'sleep 10' ran longer than 1 seconds")
+        self.assertTrue(cmd_result.timed_out)
+        self.assertTrue(cmd_result.crashed())
+
+    def test_skipped_and_crashed(self):
+        """Test that skipped and crashed commands are told apart."""
+        cmd_result = tools.CmdResult.skip('no time')
+        self.assertFalse(cmd_result.succeeded())
+        self.assertTrue(cmd_result.skipped)
+        self.assertFalse(cmd_result.crashed())
+        self.assertEqual(cmd_result.stderr, 'Skipped: no time')
+        self.assertTrue(tools.CmdResult.from_dict(
+            cmd_result.to_dict()).skipped)
+        self.assertTrue(tools.run_command('kill -SEGV $$').crashed())
+        self.assertFalse(tools.run_command('exit 1').crashed())
 
     def test_git_url(self):
         """Test that we can break an endless loop."""
@@ -71,13 +87,120 @@ class TestTools(unittest.TestCase):
         path_to_data = path.join(path.dirname(__file__), 'data')
         path_to_file = path.join(path_to_data, 'endless.cpp')
         cmd_build = "c++ -o endless -O0 " + path_to_file
-        cmd_result = tools.run_command(cmd_build)
+        build_folder = tempfile.mkdtemp()
+        self.addCleanup(rmtree, build_folder)
+        cmd_result = tools.run_command(cmd_build, cwd=build_folder)
         print(cmd_result.stderr)
         self.assertTrue(cmd_result.succeeded())
         start = timer()
-        cmd_result = tools.run_command("./endless", timeout=2)
+        cmd_result = tools.run_command("./endless", cwd=build_folder,
+                                       timeout=2)
         self.assertFalse(cmd_result.succeeded())
         self.assertLess(timer() - start, 5)
         self.assertEqual(
             cmd_result.stderr,
             "Timeout: command './endless' ran longer than 2 seconds")
+
+    def test_output_limit(self):
+        """Test that we stop a command that prints too much."""
+        from time import monotonic as timer
+        start = timer()
+        cmd_result = tools.run_command("yes", max_output_bytes=1000)
+        self.assertLess(timer() - start, 5)
+        self.assertFalse(cmd_result.succeeded())
+        self.assertTrue(cmd_result.truncated)
+        self.assertEqual(len(cmd_result.stdout), 1000)
+        self.assertEqual(
+            cmd_result.stderr,
+            "Output limit: command 'yes' printed more than 1000 bytes to "
+            "stdout")
+        cmd_result = tools.run_command("echo hello", max_output_bytes=1000)
+        self.assertTrue(cmd_result.succeeded())
+        self.assertFalse(cmd_result.truncated)
+        self.assertEqual(cmd_result.stdout, "hello\n")
+
+    def test_output_mismatch(self):
+        """Test that we stop a command as soon as its output diverges."""
+        from time import monotonic as timer
+        comparator = tools.OutputComparator(OutputTags.STRING, 'hello')
+        start = timer()
+        cmd_result = tools.run_command("echo hell; sleep 0.1; yes",
+                                       comparator=comparator)
+        self.assertLess(timer() - start, 5)
+        self.assertFalse(cmd_result.succeeded())
+        self.assertTrue(cmd_result.stdout.startswith("hell\n"))
+        self.assertIn("Output mismatch: command", cmd_result.stderr)
+        # Too much trailing whitespace is stopped too.
+        comparator = tools.OutputComparator(OutputTags.STRING, 'hello',
+                                            slack_bytes=100)
+        cmd_result = tools.run_command("echo hello; yes ''",
+                                       comparator=comparator)
+        self.assertFalse(cmd_result.succeeded())
+        comparator = tools.OutputComparator(OutputTags.STRING, 'hello world')
+        cmd_result = tools.run_command(
+            "echo; printf '  hello'; sleep 0.1; echo ' world'",
+            comparator=comparator)
+        self.assertTrue(cmd_result.succeeded())
+        comparator = tools.OutputComparator(OutputTags.NUMBER, 4.0)
+        cmd_result = tools.run_command("echo 4", comparator=comparator)
+        self.assertTrue(cmd_result.succeeded())
+
+    def test_output_mismatch_async(self):
+        """Test that we stop an awaited command as its output diverges."""
+        import asyncio
+        from time import monotonic as timer
+        comparator = tools.OutputComparator(OutputTags.STRING, 'hello')
+        start = timer()
+        loop = asyncio.new_event_loop()
+        try:
+            cmd_result = loop.run_until_complete(tools.run_command_async(
+                "yes", comparator=comparator))
+        finally:
+            loop.close()
+        self.assertLess(timer() - start, 5)
+        self.assertFalse(cmd_result.succeeded())
+        self.assertIn("Output mismatch: command 'yes'", cmd_result.stderr)
+
+    def test_run_command_async(self):
+        """Test that many commands can be awaited at the same time."""
+        import asyncio
+        from time import monotonic as timer
+
+        async def run_all():
+            return await asyncio.gather(
+                *[tools.run_command_async("sleep 1 && echo hello")
+                  for _ in range(20)],
+                tools.run_command_async("sleep 10", timeout=1))
+
+        start = timer()
+        loop = asyncio.new_event_loop()
+        try:
+            cmd_results = loop.run_until_complete(run_all())
+        finally:
+            loop.close()
+        self.assertLess(timer() - start, 5)
+        for cmd_result in cmd_results[:-1]:
+            self.assertTrue(cmd_result.succeeded())
+            self.assertEqual(cmd_result.stdout, "hello\n")
+        self.assertFalse(cmd_results[-1].succeeded())
+        self.assertEqual(
+            cmd_results[-1].stderr,
+            "Timeout: command 'sleep 10' ran longer than 1 seconds")
+
+    def test_resource_limits(self):
+        """Test that the limits are applied and the usage is measured."""
+        from ipb_homework_checker.schema_tags import LimitTags
+        cmd_result = tools.run_command("ulimit -n",
+                                       limits={LimitTags.OPEN_FILES: 32})
+        self.assertTrue(cmd_result.succeeded())
+        self.assertEqual(cmd_result.stdout, "32\n")
+        self.assertIsNotNone(cmd_result.cpu_time)
+        self.assertGreater(cmd_result.peak_rss_kb, 0)
+        self.assertLess(cmd_result.wall_time, 5)
+        cmd_result = tools.run_command("while true; do :; done",
+                                       limits={LimitTags.CPU_SECONDS: 1})
+        self.assertFalse(cmd_result.succeeded())
+        self.assertIn(
+            "CPU limit: command 'while true; do :; done' used more than 1 "
+            "CPU seconds", cmd_result.stderr)
+        self.assertGreater(cmd_result.cpu_time, 0.5)
@@ -0,0 +1,115 @@
+#!/usr/bin/python3
+"""Test the workspaces of Tasks."""
+
+import os
+import tempfile
+import unittest
+from os import path
+from shutil import copytree, rmtree
+from unittest import mock
+
+from ipb_homework_checker import workspace as workspace_module
+from ipb_homework_checker.workspace import ScratchSpace, Workspace, link_file
+
+
+class TestWorkspace(unittest.TestCase):
+    """Test the workspaces of Tasks."""
+
+    def setUp(self):
+        """Copy a Task folder and create a scratch folder."""
+        self._temp_folder = tempfile.mkdtemp()
+        self._task_folder = path.join(self._temp_folder, 'task_1')
+        copytree(path.join(path.dirname(__file__), 'data', 'homework',
+                           'homework_1', 'task_1'),
+                 self._task_folder)
+        self._scratch_folder = path.join(self._temp_folder, 'scratch')
+        os.makedirs(self._scratch_folder)
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        rmtree(self._temp_folder)
+
+    def test_scratch_space(self):
+        """Check that workspaces in the scratch folder are counted."""
+        scratch = ScratchSpace(self._scratch_folder)
+        workspace = scratch.create_workspace(self._task_folder)
+        self.assertTrue(workspace.folder.startswith(self._scratch_folder))
+        self.assertTrue(path.exists(path.join(workspace.folder, 'main.cpp')))
+        self.assertGreater(scratch.used_bytes, 0)
+        with open(path.join(workspace.folder, 'artifact'), 'wb') as artifact:
+            artifact.write(b'0' * 100000)
+        used_bytes = scratch.used_bytes
+        scratch.measure(workspace)
+        self.assertGreaterEqual(scratch.used_bytes, used_bytes + 100000)
+        scratch.release(workspace)
+        self.assertFalse(path.exists(workspace.folder))
+        self.assertEqual(scratch.used_bytes, 0)
+        self.assertGreaterEqual(scratch.peak_bytes, 100000)
+        # The student folder is never changed.
+        self.assertFalse(path.exists(path.join(self._task_folder,
+                                               'artifact')))
+
+    def test_private_files(self):
+        """Check that writing to the workspace never changes the originals."""
+        inject_folder = path.join(self._temp_folder, 'inject')
+        os.makedirs(inject_folder)
+        with open(path.join(inject_folder, 'test.cpp'), 'w') as injected:
+            injected.write('// Test.\n')
+        workspace = Workspace(self._task_folder, self._scratch_folder)
+        with open(path.join(self._task_folder, 'main.cpp')) as source:
+            code = source.read()
+        with open(path.join(workspace.folder, 'main.cpp'), 'w') as source:
+            source.write('// Changed code.\n')
+        workspace.inject(inject_folder, 'tests')
+        with open(path.join(workspace.folder, 'tests', 'test.cpp'),
+                  'a') as injected:
+            injected.write('// Changed test.\n')
+        with open(path.join(self._task_folder, 'main.cpp')) as source:
+            self.assertEqual(source.read(), code)
+        with open(path.join(inject_folder, 'test.cpp')) as injected:
+            self.assertEqual(injected.read(), '// Test.\n')
+        workspace.cleanup()
+
+    def test_copy_without_reflinks(self):
+        """Check that files are copied where reflinks are not supported."""
+        source = path.join(self._task_folder, 'main.cpp')
+        with open(source) as stream:
+            code = stream.read()
+        destinations = [path.join(self._scratch_folder, name)
+                        for name in ['first.cpp', 'second.cpp']]
+        unsupported = OSError('Not supported')
+        with mock.patch.object(workspace_module, '_reflink',
+                               side_effect=unsupported) as reflink, \
+                mock.patch.object(workspace_module, '_unsupported_devices',
+                                  set()):
+            for destination in destinations:
+                link_file(source, destination)
+        # Reflinks are not tried again between the same devices.
+        self.assertEqual(reflink.call_count, 1)
+        for destination in destinations:
+            self.assertNotEqual(os.stat(source).st_ino,
+                                os.stat(destination).st_ino)
+            with open(destination) as stream:
+                self.assertEqual(stream.read(), code)
+            with open(destination, 'w') as stream:
+                stream.write('// Changed code.\n')
+        with open(source) as stream:
+            self.assertEqual(stream.read(), code)
+
+    def test_full_scratch_space(self):
+        """Check that workspaces fall back to the disk once it is full."""
+        scratch = ScratchSpace(self._scratch_folder, max_bytes=1)
+        first = scratch.create_workspace(self._task_folder)
+        second = scratch.create_workspace(self._task_folder)
+        self.assertTrue(first.folder.startswith(self._scratch_folder))
+        self.assertFalse(second.folder.startswith(self._scratch_folder))
+        scratch.release(second)
+        scratch.release(first)
+        self.assertFalse(path.exists(second.folder))
+
+    def test_cleanup(self):
+        """Check that the scratch folder is removed with the ScratchSpace."""
+        scratch = ScratchSpace(self._scratch_folder)
+        scratch.create_workspace(self._task_folder)
+        del scratch
+        self.assertEqual(os.listdir(self._scratch_folder), [])
@@ -6,8 +6,10 @@ import tempfile
 import subprocess
 import logging
 import datetime
+import resource
+from contextlib import contextmanager
 
-from .schema_tags import OutputTags
+from .schema_tags import OutputTags, LimitTags
 
 PKG_NAME = "ipb_homework_checker"
 PROJECT_ROOT_FOLDER = path.abspath(path.dirname(path.dirname(__file__)))
@@ -16,6 +18,22 @@ MAX_DATE_STR = datetime.datetime.max.strftime(DATE_PATTERN)
 
 EXPIRED_TAG = "expired"
 
+# Maximum number of bytes kept from every output stream of a command.
+MAX_OUTPUT_BYTES = 10 * 1024 * 1024
+
+# Number of bytes the output of a streamed test may exceed the expected
+# output by before the test is stopped.
+OUTPUT_SLACK_BYTES = 1024
+
+SKIPPED_TEMPLATE = "Skipped: {reason}"
+
+# Names of the resource module limits along with the scale of the values.
+RLIMITS = {
+    LimitTags.CPU_SECONDS: ('RLIMIT_CPU', 1),
+    LimitTags.ADDRESS_SPACE_MB: ('RLIMIT_AS', 1024 * 1024),
+    LimitTags.OPEN_FILES: ('RLIMIT_NOFILE', 1),
+}
+
 log = logging.getLogger("GHC")
 
 
@@ -62,6 +80,38 @@ def convert_to(output_type, value):
     return result, "OK"
 
 
+def hash_folder(folder, ignored_names=()):
+    """Compute a hash of all the contents of a folder.
+
+    Args:
+        folder (str): folder to hash
+        ignored_names (list): names of files and folders to skip on top level
+
+    Returns:
+        str: hex digest that only changes if the folder contents change
+    """
+    import hashlib
+    import os
+    hasher = hashlib.sha256()
+    for root, dirs, files in os.walk(folder):
+        rel_root = path.relpath(root, folder)
+        if rel_root == path.curdir:
+            dirs[:] = [d for d in dirs if d not in ignored_names]
+            files = [f for f in files if f not in ignored_names]
+        dirs.sort()
+        for file_name in sorted(files):
+            file_path = path.join(root, file_name)
+            hasher.update(path.join(rel_root, file_name).encode('utf-8'))
+            if path.islink(file_path):
+                hasher.update(os.readlink(file_path).encode('utf-8'))
+                continue
+            hasher.update(b'x' if os.access(file_path, os.X_OK) else b'-')
+            with open(file_path, 'rb') as file:
+                for chunk in iter(lambda: file.read(1 << 16), b''):
+                    hasher.update(chunk)
+    return hasher.hexdigest()
+
+
 def parse_git_url(git_url):
     """Parse the git url.
 
@@ -83,16 +133,63 @@ def parse_git_url(git_url):
     return domain, user, project
 
 
+class PhaseTimer:
+    """Accumulate the seconds spent in every phase of checking a Task.
+
+    The time of every phase is added to the Task totals and, if the phase
+    belongs to a single test, to the totals of that test too.
+    """
+    INJECT = 'inject'
+    BUILD = 'build'
+    TEST = 'test'
+    STYLE = 'style'
+    REVERT = 'revert'
+    ALL = [INJECT, BUILD, TEST, STYLE, REVERT]
+
+    def __init__(self):
+        """Start with no time spent."""
+        self._phases = {}
+        self._tests = {}
+
+    @contextmanager
+    def measure(self, phase, test_name=None):
+        """Measure the time spent within this context in a phase."""
+        from time import monotonic
+        start = monotonic()
+        try:
+            yield
+        finally:
+            elapsed = monotonic() - start
+            self._phases[phase] = self._phases.get(phase, 0.0) + elapsed
+            if test_name is not None:
+                test_phases = self._tests.setdefault(test_name, {})
+                test_phases[phase] = test_phases.get(phase, 0.0) + elapsed
+
+    def to_dict(self):
+        """Convert to a dict that can be stored as json."""
+        return {'phases': dict(self._phases),
+                'tests': {test_name: dict(test_phases)
+                          for test_name, test_phases in self._tests.items()}}
+
+
 class CmdResult:
     """A small container for command result."""
     SUCCESS = 0
     FAILURE = 13
 
-    def __init__(self, returncode=None, stdout=None, stderr=None):
+    def __init__(self, returncode=None, stdout=None, stderr=None,
+                 truncated=False, wall_time=None, cpu_time=None,
+                 peak_rss_kb=None, skipped=False, timed_out=False):
         """Initialize either stdout of stderr."""
         self._returncode = returncode
         self._stdout = stdout
         self._stderr = stderr
+        self._truncated = truncated
+        self._wall_time = wall_time
+        self._cpu_time = cpu_time
+        self._peak_rss_kb = peak_rss_kb
+        self._skipped = skipped
+        self._timed_out = timed_out
 
     def succeeded(self):
         """Check if the command succeeded."""
@@ -102,6 +199,15 @@ class CmdResult:
             return False
         return True
 
+    def crashed(self):
+        """Check if the command was killed by a signal or ran for too long."""
+        if self._timed_out:
+            return True
+        if self._returncode is None:
+            return False
+        # The shell reports a command killed by a signal as 128 + signal.
+        return self._returncode < 0 or 128 < self._returncode <= 128 + 64
+
     @property
     def returncode(self):
         """Get returncode."""
@@ -122,11 +228,72 @@ class CmdResult:
         self._returncode = None  # We can't rely on returncode anymore
         self._stderr = value
 
+    @property
+    def truncated(self):
+        """Check if the command was stopped for printing too much."""
+        return self._truncated
+
+    @property
+    def wall_time(self):
+        """Get the seconds the command ran for, None if not measured."""
+        return self._wall_time
+
+    @property
+    def cpu_time(self):
+        """Get the user and system CPU seconds used by the command."""
+        return self._cpu_time
+
+    @property
+    def peak_rss_kb(self):
+        """Get the peak resident memory of the command in kilobytes."""
+        return self._peak_rss_kb
+
+    @property
+    def skipped(self):
+        """Check if the command was not run at all."""
+        return self._skipped
+
+    @property
+    def timed_out(self):
+        """Check if the command was stopped for running too long."""
+        return self._timed_out
+
     @staticmethod
     def success():
         """Return a cmd result that is a success."""
         return CmdResult(stdout="Success!")
 
+    @staticmethod
+    def skip(reason):
+        """Return a cmd result of a command that was not run."""
+        return CmdResult(stderr=SKIPPED_TEMPLATE.format(reason=reason),
+                         skipped=True)
+
+    def to_dict(self):
+        """Convert to a dict that can be stored as json."""
+        return {'returncode': self._returncode,
+                'stdout': self._stdout,
+                'stderr': self._stderr,
+                'truncated': self._truncated,
+                'wall_time': self._wall_time,
+                'cpu_time': self._cpu_time,
+                'peak_rss_kb': self._peak_rss_kb,
+                'skipped': self._skipped,
+                'timed_out': self._timed_out}
+
+    @staticmethod
+    def from_dict(cmd_dict):
+        """Create a cmd result from a dict produced by to_dict."""
+        return CmdResult(returncode=cmd_dict['returncode'],
+                         stdout=cmd_dict['stdout'],
+                         stderr=cmd_dict['stderr'],
+                         truncated=cmd_dict.get('truncated', False),
+                         wall_time=cmd_dict.get('wall_time'),
+                         cpu_time=cmd_dict.get('cpu_time'),
+                         peak_rss_kb=cmd_dict.get('peak_rss_kb'),
+                         skipped=cmd_dict.get('skipped', False),
+                         timed_out=cmd_dict.get('timed_out', False))
+
     def __repr__(self):
         """Representatin of command result."""
         stdout = self.stdout
@@ -138,11 +305,102 @@ class CmdResult:
         return stdout.strip()
 
 
-def run_command(command, shell=True, cwd=path.curdir, env=environ, timeout=20):
+class OutputLimitExceeded(Exception):
+    """Raised when a command prints more than allowed to a stream."""
+
+    def __init__(self, cmd, max_output_bytes, stream_name, output, stderr,
+                 usage=None):
+        """Store the output captured before the command was stopped."""
+        super().__init__(cmd, max_output_bytes, stream_name)
+        self.cmd = cmd
+        self.max_output_bytes = max_output_bytes
+        self.stream_name = stream_name
+        self.output = output
+        self.stderr = stderr
+        self.usage = usage or {}
+
+
+class OutputComparator:
+    """Compare the output of a command to the expected one while it runs.
+
+    The output is fed in chunks as it is read. Strings are compared as they
+    arrive, so that the comparator reports a mismatch as soon as the output
+    diverges. Numbers can only be compared once complete, so only the length
+    of their output is checked.
+    """
+
+    def __init__(self, output_type, expected_output,
+                 slack_bytes=OUTPUT_SLACK_BYTES):
+        """Initialize the comparator.
+
+        Args:
+            output_type (str): one of OutputTags
+            expected_output (str|float): expected output converted to the
+                output type as by convert_to
+            slack_bytes (int): number of bytes the output may be longer than
+                the expected output
+        """
+        expected_bytes = str(expected_output).encode('utf-8')
+        self._max_size = len(expected_bytes) + slack_bytes
+        self._expected = None
+        if output_type == OutputTags.STRING:
+            self._expected = expected_bytes
+        self._size = 0
+        self._matched = 0
+        self._started = False
+
+    def diverged(self, chunk):
+        """Feed the next chunk of the output.
+
+        The output is expected to match after stripping the whitespace around
+        it, just as convert_to does.
+
+        Returns:
+            bool: True if the output can no longer match the expected one
+        """
+        self._size += len(chunk)
+        if self._size > self._max_size:
+            return True
+        if self._expected is None:
+            return False
+        if not self._started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                return False
+            self._started = True
+        expected = self._expected[self._matched:self._matched + len(chunk)]
+        if chunk[:len(expected)] != expected:
+            return True
+        self._matched += len(expected)
+        # Only whitespace may follow the expected output.
+        return bool(chunk[len(expected):].strip())
+
+
+class OutputMismatch(Exception):
+    """Raised when a command prints output that differs from the expected."""
+
+    def __init__(self, cmd, output, stderr, usage=None):
+        """Store the output captured before the command was stopped."""
+        super().__init__(cmd)
+        self.cmd = cmd
+        self.output = output
+        self.stderr = stderr
+        self.usage = usage or {}
+
+
+def run_command(command, shell=True, cwd=path.curdir, env=environ, timeout=20,
+                max_output_bytes=MAX_OUTPUT_BYTES, limits=None, pass_fds=(),
+                comparator=None):
     """Run a generic command in a subprocess.
 
     Args:
         command (str): command to run
+        max_output_bytes (int): stop the command once it prints more bytes
+            than this to stdout or stderr
+        limits (dict): resource limits of the command keyed by LimitTags
+        pass_fds (tuple): file descriptors the command inherits
+        comparator (OutputComparator): stop the command as soon as its stdout
+            diverges from the expected output
     Returns:
         str: raw command output
     """
@@ -151,33 +409,235 @@ def run_command(command, shell=True, cwd=path.curdir, env=environ, timeout=20):
         if shell and isinstance(command, list):
             command = subprocess.list2cmdline(command)
             log.debug("running command: \n%s", command)
-        process = __run_subprocess(command,
-                                   stdout=subprocess.PIPE,
-                                   stderr=subprocess.PIPE,
-                                   shell=shell,
-                                   cwd=cwd,
-                                   env=env,
-                                   startupinfo=startupinfo,
-                                   timeout=timeout)
-        return CmdResult(returncode=process.returncode,
-                         stdout=process.stdout.decode('utf-8'),
-                         stderr=process.stderr.decode('utf-8'))
+        process, usage = __run_subprocess(command,
+                                          stdout=subprocess.PIPE,
+                                          stderr=subprocess.PIPE,
+                                          shell=shell,
+                                          cwd=cwd,
+                                          env=env,
+                                          startupinfo=startupinfo,
+                                          timeout=timeout,
+                                          max_output_bytes=max_output_bytes,
+                                          limits=limits,
+                                          pass_fds=pass_fds,
+                                          comparator=comparator)
+        return __result(command, process.returncode, process.stdout,
+                        process.stderr, usage, limits)
     except subprocess.CalledProcessError as e:
-        output_text = e.output.decode("utf-8")
+        output_text = __decode(e.output)
         log.error("command '%s' finished with code: %s", e.cmd, e.returncode)
         log.debug("command output: \n%s", output_text)
         return CmdResult(returncode=e.returncode, stderr=output_text)
     except subprocess.TimeoutExpired as e:
-        output_text = "Timeout: command '{}' ran longer than {} seconds".format(
-            e.cmd.strip(), e.timeout)
+        return __timeout_result(e.cmd, e.timeout, getattr(e, 'usage', {}))
+    except OutputLimitExceeded as e:
+        return __output_limit_result(e)
+    except OutputMismatch as e:
+        return __output_mismatch_result(e)
+
+
+async def run_command_async(command, cwd=path.curdir, env=environ, timeout=20,
+                            max_output_bytes=MAX_OUTPUT_BYTES, limits=None,
+                            comparator=None):
+    """Run a shell command in a subprocess without blocking the event loop.
+
+    Behaves just like run_command(...) but many commands can be awaited at the
+    same time from a single thread. The output is read when the event loop
+    reports that it is ready and the process is reaped by this function, so
+    that its resource usage can be measured.
+
+    Args:
+        command (str): command to run
+        max_output_bytes (int): stop the command once it prints more bytes
+            than this to stdout or stderr
+        limits (dict): resource limits of the command keyed by LimitTags
+        comparator (OutputComparator): stop the command as soon as its stdout
+            diverges from the expected output
+    Returns:
+        CmdResult: result of the command
+    """
+    import asyncio
+    import os
+    import signal
+    from time import monotonic
+    if isinstance(command, list):
+        command = subprocess.list2cmdline(command)
+    loop = asyncio.get_event_loop()
+    start = monotonic()
+    process = subprocess.Popen(command,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE,
+                               shell=True,
+                               cwd=cwd,
+                               env=env,
+                               start_new_session=True,
+                               preexec_fn=__limits_setter(limits))
+    outputs = {'stdout': bytearray(), 'stderr': bytearray()}
+
+    def on_readable(stream_name, stream, finished):
+        try:
+            chunk = os.read(stream.fileno(), 1 << 16)
+        except BlockingIOError:
+            return
+        if finished.done():
+            return
+        if not chunk:
+            loop.remove_reader(stream.fileno())
+            finished.set_result(None)
+            return
+        output = outputs[stream_name]
+        output += chunk
+        if max_output_bytes is not None and len(output) > max_output_bytes:
+            del output[max_output_bytes:]
+            loop.remove_reader(stream.fileno())
+            finished.set_exception(OutputLimitExceeded(
+                command, max_output_bytes, stream_name,
+                bytes(outputs['stdout']), bytes(outputs['stderr'])))
+            return
+        if stream_name == 'stdout' and comparator \
+                and comparator.diverged(chunk):
+            loop.remove_reader(stream.fileno())
+            finished.set_exception(OutputMismatch(
+                command, bytes(outputs['stdout']), bytes(outputs['stderr'])))
+
+    readers = []
+    for stream_name, stream in [('stdout', process.stdout),
+                                ('stderr', process.stderr)]:
+        os.set_blocking(stream.fileno(), False)
+        finished = loop.create_future()
+        loop.add_reader(stream.fileno(), on_readable,
+                        stream_name, stream, finished)
+        readers.append(finished)
+
+    async def finish():
+        await asyncio.gather(*readers)
+        return await __wait_async(process, start)
+
+    try:
+        usage = await asyncio.wait_for(finish(), timeout)
+    except asyncio.TimeoutError:
+        os_signal = signal.SIGINT
+        result = None
+    except (OutputLimitExceeded, OutputMismatch) as e:
+        os_signal = signal.SIGKILL
+        result = e
+    else:
+        return __result(command, process.returncode,
+                        bytes(outputs['stdout']), bytes(outputs['stderr']),
+                        usage, limits)
+    finally:
+        for stream in [process.stdout, process.stderr]:
+            loop.remove_reader(stream.fileno())
+            stream.close()
+    __kill(process, os_signal)
+    usage = await __wait_async(process, start)
+    if result is None:
+        return __timeout_result(command, timeout, usage)
+    result.usage = usage
+    if isinstance(result, OutputMismatch):
+        return __output_mismatch_result(result)
+    return __output_limit_result(result)
+
+
+def __set_limits(limits):
+    """Apply the resource limits.
+
+    This runs in the child process right before the command is executed, so
+    it must not import anything or take any locks. The limits are inherited
+    by every process the command starts.
+    """
+    for tag, value in limits.items():
+        name, scale = RLIMITS[tag]
+        limit = int(value * scale)
+        hard_limit = limit
+        if tag == LimitTags.CPU_SECONDS:
+            # Send SIGXCPU at the soft limit, so that we can tell why the
+            # command has stopped. SIGKILL follows at the hard limit.
+            hard_limit += 1
+        resource.setrlimit(getattr(resource, name), (limit, hard_limit))
+
+
+def __limits_setter(limits):
+    """Get the function that applies the limits in a child, if any."""
+    if not limits:
+        return None
+    from functools import partial
+    return partial(__set_limits, limits)
+
+
+def __result(command, returncode, stdout, stderr, usage, limits):
+    """Create a result of a command that has finished on its own."""
+    stderr = __decode(stderr)
+    import signal
+    cpu_limit = (limits or {}).get(LimitTags.CPU_SECONDS)
+    # The shell reports a command killed by a signal as 128 + signal.
+    cpu_limit_codes = [-signal.SIGXCPU, 128 + signal.SIGXCPU]
+    if cpu_limit is not None and (returncode in cpu_limit_codes
+                                  or usage['cpu_time'] > cpu_limit):
+        output_text = "CPU limit: command '{}' used more than {} " \
+            "CPU seconds".format(command.strip(), cpu_limit)
         log.error(output_text)
-        return CmdResult(returncode=1, stderr=output_text)
+        stderr = stderr + '\n' + output_text if stderr else output_text
+    return CmdResult(returncode=returncode,
+                     stdout=__decode(stdout),
+                     stderr=stderr,
+                     **usage)
+
+
+def __decode(output):
+    """Decode the output of a command that might be cut at any byte."""
+    if output is None:
+        return None
+    return output.decode('utf-8', errors='replace')
+
+
+def __timeout_result(command, timeout, usage):
+    """Create a result of a command that ran for too long."""
+    # A timeout capped by a time budget is no round number of seconds.
+    output_text = "Timeout: command '{}' ran longer than {:g} seconds".format(
+        command.strip(), round(timeout, 1))
+    log.error(output_text)
+    return CmdResult(returncode=1, stderr=output_text, timed_out=True,
+                     **usage)
+
+
+def __output_limit_result(error):
+    """Create a result of a command that printed too much."""
+    output_text = "Output limit: command '{}' printed more than {} " \
+        "bytes to {}".format(error.cmd.strip(), error.max_output_bytes,
+                             error.stream_name)
+    log.error(output_text)
+    stderr = __decode(error.stderr)
+    if stderr:
+        output_text = stderr + '\n' + output_text
+    return CmdResult(returncode=1,
+                     stdout=__decode(error.output),
+                     stderr=output_text,
+                     truncated=True,
+                     **error.usage)
+
+
+def __output_mismatch_result(error):
+    """Create a result of a command whose output diverged from the expected."""
+    output_text = "Output mismatch: command '{}' was stopped as its output " \
+        "diverged from the expected output".format(error.cmd.strip())
+    log.debug(output_text)
+    stderr = __decode(error.stderr)
+    if stderr:
+        output_text = stderr + '\n' + output_text
+    return CmdResult(returncode=1,
+                     stdout=__decode(error.output),
+                     stderr=output_text,
+                     **error.usage)
 
 
 def __run_subprocess(command,
                      input=None,
                      timeout=None,
                      check=False,
+                     max_output_bytes=None,
+                     limits=None,
+                     comparator=None,
                      **kwargs):
     """Run a command as a subprocess.
 
@@ -190,26 +650,195 @@ def __run_subprocess(command,
     kill the whole process tree which allows to use the timeout even when using
     shell=True. The reason I don't want to stop using shell=True here is the
     convenience of piping arguments from one function to another.
+
+    Unlike subprocess.run(...) the output is read in chunks and the whole
+    process tree is killed as soon as a stream gets longer than
+    max_output_bytes, so the memory used here is bounded. It is also killed as
+    soon as its stdout diverges from the expected output if a comparator is
+    given. The process is reaped here to measure the resources it has used.
+
+    Returns:
+        (CompletedProcess, dict): the finished process along with the usage of
+            resources as keyword arguments of CmdResult
     """
     if input is not None:
         if 'stdin' in kwargs:
             raise ValueError('stdin and input arguments may not both be used.')
         kwargs['stdin'] = subprocess.PIPE
-    import os
     import signal
+    from time import monotonic
     from subprocess import Popen, TimeoutExpired, CalledProcessError
     from subprocess import CompletedProcess
-    with Popen(command, preexec_fn=os.setsid, **kwargs) as process:
+    start = monotonic()
+    deadline = None if timeout is None else start + timeout
+    # The command runs in a new session, so that we can kill its whole group
+    # of processes.
+    with Popen(command, start_new_session=True,
+               preexec_fn=__limits_setter(limits), **kwargs) as process:
         try:
-            stdout, stderr = process.communicate(input, timeout=timeout)
-        except TimeoutExpired:
+            stdout, stderr = __capture(process, input, deadline,
+                                       max_output_bytes, comparator)
+            usage = __wait(process, start, deadline)
+        except TimeoutExpired as e:
             # Kill the whole group of processes.
-            os.killpg(process.pid, signal.SIGINT)
-            stdout, stderr = process.communicate()
-            raise TimeoutExpired(process.args, timeout, output=stdout,
-                                 stderr=stderr)
+            usage = __kill_group(process, signal.SIGINT, start)
+            error = TimeoutExpired(process.args, timeout, output=e.output,
+                                   stderr=e.stderr)
+            error.usage = usage
+            raise error
+        except OutputLimitExceeded as e:
+            usage = __kill_group(process, signal.SIGKILL, start)
+            raise OutputLimitExceeded(process.args, max_output_bytes,
+                                      e.stream_name, e.output, e.stderr,
+                                      usage)
+        except OutputMismatch as e:
+            usage = __kill_group(process, signal.SIGKILL, start)
+            raise OutputMismatch(process.args, e.output, e.stderr, usage)
         retcode = process.poll()
         if check and retcode:
             raise CalledProcessError(retcode, process.args,
                                      output=stdout, stderr=stderr)
-    return CompletedProcess(process.args, retcode, stdout, stderr)
+    return CompletedProcess(process.args, retcode, stdout, stderr), usage
+
+
+def __kill(process, signal_number):
+    """Kill the process group of a process."""
+    import os
+    try:
+        os.killpg(process.pid, signal_number)
+    except ProcessLookupError:
+        pass  # The group has already finished.
+
+
+def __kill_group(process, signal_number, start):
+    """Kill the process group and reap it without reading any output."""
+    import os
+    __kill(process, signal_number)
+    # Closing our ends of the pipes stops anyone who is still writing.
+    for stream in [process.stdin, process.stdout, process.stderr]:
+        if stream:
+            stream.close()
+    _, status, rusage = os.wait4(process.pid, 0)
+    return __reaped(process, status, rusage, start)
+
+
+def __reaped(process, status, rusage, start):
+    """Store the exit status of a reaped process and measure its usage.
+
+    Returns:
+        dict: the usage of resources as keyword arguments of CmdResult
+    """
+    import os
+    from time import monotonic
+    if os.WIFSIGNALED(status):
+        process.returncode = -os.WTERMSIG(status)
+    else:
+        process.returncode = os.WEXITSTATUS(status)
+    return {'wall_time': monotonic() - start,
+            'cpu_time': rusage.ru_utime + rusage.ru_stime,
+            'peak_rss_kb': rusage.ru_maxrss}
+
+
+def __wait(process, start, deadline):
+    """Wait for a process until the deadline and reap it."""
+    import os
+    from time import monotonic, sleep
+    from subprocess import TimeoutExpired
+    delay = 0.0005
+    while True:
+        pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+        if pid:
+            return __reaped(process, status, rusage, start)
+        if deadline is not None:
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                raise TimeoutExpired(process.args, None)
+            delay = min(delay, remaining)
+        sleep(delay)
+        delay = min(2 * delay, 0.05)
+
+
+async def __wait_async(process, start):
+    """Wait for a process without blocking the event loop and reap it."""
+    import asyncio
+    import os
+    delay = 0.0005
+    while True:
+        pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+        if pid:
+            return __reaped(process, status, rusage, start)
+        await asyncio.sleep(delay)
+        delay = min(2 * delay, 0.05)
+
+
+def __capture(process, input, deadline, max_output_bytes, comparator=None):
+    """Read the output of a process in chunks until it closes its streams.
+
+    Returns:
+        (bytes, bytes): stdout and stderr of the process, None if not piped
+    """
+    import os
+    import selectors
+    from time import monotonic
+    from subprocess import TimeoutExpired
+    chunk_size = 1 << 16
+    outputs = {}
+    with selectors.DefaultSelector() as selector:
+        if process.stdin:
+            if input:
+                selector.register(process.stdin, selectors.EVENT_WRITE)
+            else:
+                process.stdin.close()
+        for name, stream in [('stdout', process.stdout),
+                             ('stderr', process.stderr)]:
+            if stream:
+                outputs[name] = bytearray()
+                selector.register(stream, selectors.EVENT_READ, name)
+        input_view = memoryview(input) if input else None
+        input_offset = 0
+        while selector.get_map():
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    raise TimeoutExpired(process.args, None,
+                                         output=__get(outputs, 'stdout'),
+                                         stderr=__get(outputs, 'stderr'))
+            for key, _ in selector.select(remaining):
+                if key.fileobj is process.stdin:
+                    chunk = input_view[input_offset:input_offset + chunk_size]
+                    try:
+                        input_offset += os.write(key.fd, chunk)
+                    except BrokenPipeError:
+                        input_offset = len(input_view)
+                    if input_offset >= len(input_view):
+                        selector.unregister(key.fileobj)
+                        key.fileobj.close()
+                    continue
+                chunk = os.read(key.fd, chunk_size)
+                if not chunk:
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                    continue
+                output = outputs[key.data]
+                output += chunk
+                if max_output_bytes is not None \
+                        and len(output) > max_output_bytes:
+                    del output[max_output_bytes:]
+                    raise OutputLimitExceeded(process.args, max_output_bytes,
+                                              key.data,
+                                              __get(outputs, 'stdout'),
+                                              __get(outputs, 'stderr'))
+                if key.data == 'stdout' and comparator \
+                        and comparator.diverged(chunk):
+                    raise OutputMismatch(process.args,
+                                         __get(outputs, 'stdout'),
+                                         __get(outputs, 'stderr'))
+    return __get(outputs, 'stdout'), __get(outputs, 'stderr')
+
+
+def __get(outputs, name):
+    """Get the captured bytes of a stream if it was captured."""
+    if name not in outputs:
+        return None
+    return bytes(outputs[name])
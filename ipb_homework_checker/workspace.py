@@ -0,0 +1,244 @@
+"""Private working copies of student Task folders.
+
+A workspace is a link farm: every file in it shares its contents with the
+original file through a copy-on-write reflink whenever the file system
+supports this, such as btrfs or xfs. Creating a workspace or injecting a
+folder into it then costs time proportional to the number of files and not to
+their size. On other file systems, such as ext4 or tmpfs, every file is
+copied.
+
+Hard links are never used, as writing to a hard linked file in place changes
+the original file too, and builds and tests may write to any file of their
+workspace.
+
+Workspaces may live in a ScratchSpace on a RAM-backed file system, such as
+/dev/shm, to avoid the disk latency of the many small files builds touch.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+import weakref
+from os import path
+from shutil import copy2, copystat, rmtree
+
+from . import tools
+
+log = logging.getLogger("GHC")
+
+# Folders that the checker itself creates inside of a Task folder. These never
+# belong to the student code and must not leak into a fresh workspace.
+IGNORED_FOLDERS = ['build', '.backup']
+
+FICLONE = 0x40049409  # Taken from linux/fs.h.
+
+# Pairs of devices between which reflinks have failed. We don't try them again.
+_unsupported_devices = set()
+
+# Keep this many bytes of a scratch file system free for the commands that run
+# in the workspaces.
+MIN_FREE_SCRATCH_BYTES = 64 * 1024 * 1024
+
+
+def _reflink(source, destination):
+    """Create a copy-on-write clone of a file."""
+    import fcntl
+    with open(source, 'rb') as source_file, \
+            open(destination, 'wb') as destination_file:
+        fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+    copystat(source, destination)
+
+
+def link_file(source, destination):
+    """Make destination a private copy of source, sharing contents if possible.
+
+    Writing to destination never changes source.
+    """
+    devices = (os.stat(source).st_dev,
+               os.stat(path.dirname(destination)).st_dev)
+    if devices not in _unsupported_devices:
+        try:
+            _reflink(source, destination)
+            return
+        except (OSError, ImportError):
+            _unsupported_devices.add(devices)
+            if path.lexists(destination):
+                os.remove(destination)
+    copy2(source, destination)
+
+
+def link_tree(source_folder, destination_folder, ignored_names=()):
+    """Recreate a folder as a link farm.
+
+    Args:
+        source_folder (str): folder to link from
+        destination_folder (str): folder to create, must not exist
+        ignored_names (list): names of files and folders to skip on top level
+    """
+    for root, dirs, files in os.walk(source_folder):
+        rel_root = path.relpath(root, source_folder)
+        if rel_root == path.curdir:
+            dirs[:] = [d for d in dirs if d not in ignored_names]
+            files = [f for f in files if f not in ignored_names]
+        target_root = path.normpath(path.join(destination_folder, rel_root))
+        os.makedirs(target_root)
+        # Symbolic links to folders are recreated but never followed.
+        for name in [d for d in dirs if path.islink(path.join(root, d))]:
+            dirs.remove(name)
+            files.append(name)
+        for name in files:
+            source = path.join(root, name)
+            destination = path.join(target_root, name)
+            if path.islink(source):
+                os.symlink(os.readlink(source), destination)
+            else:
+                link_file(source, destination)
+
+
+class Workspace:
+    """A private copy of a student Task folder.
+
+    Tasks that run at the same time must not see each other's injected
+    folders or build artifacts, so every one of them works in its own
+    workspace. The original student folder is never changed.
+    """
+
+    def __init__(self, source_folder, root_folder):
+        """Link the source folder into a new folder within root folder."""
+        self._source_folder = path.normpath(source_folder)
+        self._root_folder = tempfile.mkdtemp(prefix='workspace_',
+                                             dir=root_folder)
+        self._folder = path.join(self._root_folder,
+                                 path.basename(self._source_folder))
+        log.debug("Linking '%s' to workspace '%s'",
+                  self._source_folder, self._folder)
+        link_tree(self._source_folder, self._folder, IGNORED_FOLDERS)
+
+    @property
+    def folder(self):
+        """Get the folder to work in."""
+        return self._folder
+
+    @property
+    def source_folder(self):
+        """Get the original student folder."""
+        return self._source_folder
+
+    def inject(self, inject_folder, dest_folder):
+        """Replace a folder of the workspace by another folder."""
+        full_path_to = path.join(self._folder, dest_folder)
+        Workspace.__remove(full_path_to)
+        link_tree(inject_folder, full_path_to)
+
+    def revert(self, dest_folder):
+        """Bring back the original contents of a folder of the workspace."""
+        full_path_to = path.join(self._folder, dest_folder)
+        Workspace.__remove(full_path_to)
+        original = path.join(self._source_folder, dest_folder)
+        if path.islink(original):
+            os.symlink(os.readlink(original), full_path_to)
+        elif path.isdir(original):
+            link_tree(original, full_path_to)
+        elif path.exists(original):
+            link_file(original, full_path_to)
+
+    def cleanup(self):
+        """Remove the workspace with all its contents."""
+        rmtree(self._root_folder, ignore_errors=True)
+
+    def size(self):
+        """Get the number of bytes the files of the workspace take."""
+        size = 0
+        for root, _, files in os.walk(self._root_folder):
+            for name in files:
+                try:
+                    stat = os.lstat(path.join(root, name))
+                except FileNotFoundError:
+                    continue  # The file was removed while walking.
+                size += stat.st_blocks * 512
+        return size
+
+    @staticmethod
+    def __remove(file_path):
+        if path.isdir(file_path) and not path.islink(file_path):
+            rmtree(file_path)
+        elif path.lexists(file_path):
+            os.remove(file_path)
+
+
+class ScratchSpace:
+    """Workspaces in a scratch folder, meant to be on a RAM-backed file system.
+
+    The sources are copied into the scratch folder, as links do not cross
+    file systems, and all builds and tests write there too. The student
+    folders and the disk are never touched. Only the results of the commands
+    leave the workspaces.
+
+    The bytes taken by the live workspaces are counted. New workspaces fall
+    back to the disk once the scratch folder is full, that is once the count
+    exceeds max_bytes or the file system has less than MIN_FREE_SCRATCH_BYTES
+    free. Everything in the scratch folder is removed once the ScratchSpace is
+    garbage collected or the interpreter exits.
+    """
+
+    def __init__(self, folder, max_bytes=None):
+        """Create a private folder within the scratch folder.
+
+        Args:
+            folder (str): scratch folder, such as /dev/shm
+            max_bytes (int): number of bytes the workspaces may take in the
+                scratch folder at once, None to use all free space
+        """
+        self._folder = tempfile.mkdtemp(prefix='ghc_scratch_', dir=folder)
+        weakref.finalize(self, rmtree, self._folder, True)
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sizes = {}
+        self._peak_bytes = 0
+
+    @property
+    def used_bytes(self):
+        """Get the number of bytes the live workspaces take."""
+        with self._lock:
+            return sum(self._sizes.values())
+
+    @property
+    def peak_bytes(self):
+        """Get the largest number of bytes the workspaces took at once."""
+        return self._peak_bytes
+
+    def create_workspace(self, source_folder):
+        """Create a workspace in the scratch folder if it is not full.
+
+        Returns:
+            Workspace: workspace to release once it is not needed
+        """
+        if not self.__has_room():
+            log.debug("Scratch folder '%s' is full, using the disk for '%s'",
+                      self._folder, source_folder)
+            return Workspace(source_folder, tools.get_temp_dir())
+        workspace = Workspace(source_folder, self._folder)
+        self.measure(workspace)
+        return workspace
+
+    def measure(self, workspace):
+        """Count the bytes a workspace takes now, such as after a build."""
+        if workspace.folder.startswith(self._folder + os.sep):
+            size = workspace.size()
+            with self._lock:
+                self._sizes[workspace] = size
+                self._peak_bytes = max(self._peak_bytes,
+                                       sum(self._sizes.values()))
+
+    def release(self, workspace):
+        """Remove a workspace created by this ScratchSpace."""
+        workspace.cleanup()
+        with self._lock:
+            self._sizes.pop(workspace, None)
+
+    def __has_room(self):
+        stat = os.statvfs(self._folder)
+        if stat.f_bavail * stat.f_frsize < MIN_FREE_SCRATCH_BYTES:
+            return False
+        return self._max_bytes is None or self.used_bytes < self._max_bytes
@@ -66,6 +66,7 @@ setup(
         'console_scripts': [
             'check_homework = ipb_homework_checker.check_homework:main',
             'print_repo_name = ipb_homework_checker.print_repo_name:main',
+            'benchmark_checker = ipb_homework_checker.benchmark:main',
         ],
     },
     cmdclass={'install': PermissiveInstall},